@@ -30,6 +30,37 @@ ALPHA_VANTAGE_API_KEY       = config('ALPHA_VANTAGE_API_KEY')
 ALPHA_VANTAGE_BASE_URL      = config('ALPHA_VANTAGE_BASE_URL')
 ALPHA_VANTAGE_FUNCTION      = config('ALPHA_VANTAGE_FUNCTION')
 ALPHA_VANTAGE_OUTPUTSIZE    = config('ALPHA_VANTAGE_OUTPUTSIZE')
+ALPHA_VANTAGE_CONNECT_TIMEOUT = config('ALPHA_VANTAGE_CONNECT_TIMEOUT', default=5, cast=float)  # seconds
+ALPHA_VANTAGE_READ_TIMEOUT  = config('ALPHA_VANTAGE_READ_TIMEOUT', default=30, cast=float)  # seconds
+ALPHA_VANTAGE_MAX_RETRIES   = config('ALPHA_VANTAGE_MAX_RETRIES', default=3, cast=int)
+ALPHA_VANTAGE_BACKOFF       = config('ALPHA_VANTAGE_BACKOFF', default=1.0, cast=float)  # first retry delay in seconds, doubled on each retry
+ALPHA_VANTAGE_POOL_SIZE     = config('ALPHA_VANTAGE_POOL_SIZE', default=10, cast=int)
+ALPHA_VANTAGE_CACHE_TTL     = config('ALPHA_VANTAGE_CACHE_TTL', default=900, cast=int)  # seconds, 0 disables the cache
+ALPHA_VANTAGE_CACHE_DIR     = config('ALPHA_VANTAGE_CACHE_DIR', default='')  # empty keeps the cache in memory only
+ALPHA_VANTAGE_CACHE_MAX_ENTRIES = config('ALPHA_VANTAGE_CACHE_MAX_ENTRIES', default=32, cast=int)
+ALPHA_VANTAGE_MAX_CONCURRENCY = config('ALPHA_VANTAGE_MAX_CONCURRENCY', default=4, cast=int)  # requests in flight during bulk fetches
+ALPHA_VANTAGE_RATE_LIMIT    = config('ALPHA_VANTAGE_RATE_LIMIT', default=5, cast=float)  # requests per minute during bulk fetches
+ALPHA_VANTAGE_RATE_BURST    = config('ALPHA_VANTAGE_RATE_BURST', default=1, cast=int)  # requests sent at once before the rate limit applies
+
+# Stocks app
+STOCKS_INGEST_BATCH_SIZE    = config('STOCKS_INGEST_BATCH_SIZE', default=1000, cast=int)
+STOCKS_BACKTEST_WORKERS     = config('STOCKS_BACKTEST_WORKERS', default=0, cast=int)  # 0 uses one process per CPU
+STOCKS_MODEL_CACHE_BYTES    = config('STOCKS_MODEL_CACHE_BYTES', default=64 * 1024 * 1024, cast=int)
+STOCKS_MODEL_HOT_RELOAD     = config('STOCKS_MODEL_HOT_RELOAD', default=True, cast=bool)
+STOCKS_MODEL_DIR            = config('STOCKS_MODEL_DIR', default=str(BASE_DIR / 'stocks' / 'ML_models'))  # model registry, where `train_models` writes; set it outside the source tree in deployments
+STOCKS_PREDICTION_MAX_AGE_DAYS = config('STOCKS_PREDICTION_MAX_AGE_DAYS', default=3, cast=int)
+STOCKS_PRICE_BACKEND        = config('STOCKS_PRICE_BACKEND', default='database')  # 'database' or 'columnar'
+STOCKS_PRICE_STORE_DIR      = config('STOCKS_PRICE_STORE_DIR', default=str(BASE_DIR / 'price_store'))  # memory-mapped files of the columnar backend
+STOCKS_RESULT_CACHE         = 'backtests'  # cache alias of the backtest results
+STOCKS_ARTIFACT_DIR         = config('STOCKS_ARTIFACT_DIR', default=str(BASE_DIR / 'artifacts'))  # content-addressed report PDFs
+STOCKS_REPORT_WORKERS       = config('STOCKS_REPORT_WORKERS', default=2, cast=int)  # report worker threads per process, 0 leaves the jobs to `run_report_worker`
+STOCKS_REPORT_JOB_TIMEOUT   = config('STOCKS_REPORT_JOB_TIMEOUT', default=300, cast=int)  # seconds after which a running job is considered lost and requeued
+STOCKS_REPORT_POLL_INTERVAL = config('STOCKS_REPORT_POLL_INTERVAL', default=30, cast=float)  # seconds between scans of the queue by the report worker threads, 0 to only scan on submit
+STOCKS_METRICS_DIR          = config('STOCKS_METRICS_DIR', default='')  # shared by the worker processes to aggregate the /metrics, empty keeps them per process
+STOCKS_STRATEGY_STATES      = config('STOCKS_STRATEGY_STATES', default='1000:50:200')  # 'initial_investment:short:long' entries whose strategy states are persisted
+STOCKS_PROFILING            = config('STOCKS_PROFILING', default=False, cast=bool)  # profile the requests sending the X-Stocks-Profile header
+STOCKS_PROFILE_DIR          = config('STOCKS_PROFILE_DIR', default=str(BASE_DIR / 'profiles'))  # cProfile, flamegraph and allocation files of the profiled requests
+STOCKS_PROFILE_TOKEN_MAX_AGE = config('STOCKS_PROFILE_TOKEN_MAX_AGE', default=3600, cast=int)  # seconds a `profile_token` is accepted
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
@@ -50,11 +81,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'stocks.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'stocks.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -97,6 +130,24 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# With several worker processes, use a shared backend for the backtest results (e.g. FileBasedCache)
+# so that ingestion in one process invalidates the results cached by the others.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'backtests': {
+        'BACKEND': config('STOCKS_RESULT_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('STOCKS_RESULT_CACHE_LOCATION', default='stocks-backtests'),
+        'TIMEOUT': config('STOCKS_RESULT_CACHE_TIMEOUT', default=3600, cast=int),  # seconds
+        'OPTIONS': {'MAX_ENTRIES': config('STOCKS_RESULT_CACHE_MAX_ENTRIES', default=1000, cast=int)},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
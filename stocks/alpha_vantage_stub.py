@@ -0,0 +1,214 @@
+# stocks/alpha_vantage_stub.py
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from .market_data import TIME_SERIES_KEY
+from .synthetic import BUSINESS_DAYS_PER_YEAR, alpha_vantage_payload, gbm_ohlcv
+
+# Local stand-in for the Alpha Vantage API, answering TIME_SERIES_DAILY queries from synthetic or
+# recorded data, with configurable latency, errors and rate limits. Point ALPHA_VANTAGE_BASE_URL
+# at its `url` to fetch, load test or run the tests offline.
+
+# Number of days of an outputsize=compact response, as served by Alpha Vantage
+COMPACT_DAYS = 100
+
+# The notice Alpha Vantage sends with HTTP 200 to over-limit requests
+RATE_LIMIT_NOTE = (
+    'Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute '
+    'and 500 calls per day.'
+)
+# The message of Alpha Vantage to queries it cannot answer, such as unknown symbols
+INVALID_CALL_MESSAGE = 'Invalid API call. Please retry or visit the documentation for TIME_SERIES_DAILY.'
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing their connections early are expected, other errors are reported
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class AlphaVantageStub:
+    """
+    HTTP server answering Alpha Vantage 'TIME_SERIES_DAILY' queries.
+
+    - Symbols are served from `data_dir` when set, one recorded response per '<SYMBOL>.json' file
+      (a whole Alpha Vantage response, or only its 'Time Series (Daily)' dictionary); other symbols
+      get Alpha Vantage's 'Error Message' payload. Without `data_dir`, every symbol is served
+      `years` of seeded synthetic prices, see `synthetic.gbm_ohlcv`.
+    - Each response is delayed by `latency` seconds plus a uniform random delay of up to `jitter` seconds.
+    - A fraction `error_rate` of the requests is answered with HTTP 503.
+    - Requests beyond `rate_limit` per minute get the rate limit notice of Alpha Vantage: with
+      HTTP 200 and a 'Note' payload like the real API, or with HTTP 429 and a 'Retry-After'
+      header when `rate_limit_status` is 429.
+
+    The server runs in a daemon thread once started; `stats` counts the answered requests.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, data_dir=None, years=2, seed=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, rate_limit=None, rate_limit_status=200):
+        self.data_dir = data_dir
+        self.years = years
+        self.seed = seed
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rate_limit_status = rate_limit_status
+        self.stats = {'requests': 0, 'served': 0, 'errors': 0, 'rate_limited': 0, 'not_found': 0}
+
+        self._random = random.Random(seed)
+        self._request_times = deque()
+        self._payloads = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                status, payload, headers = stub.respond(url.path, parse_qs(url.query))
+                body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client stopped reading, as the streaming parser does once it has its days
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = StubHTTPServer((host, port), Handler)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/query'
+
+    def start(self):
+        """
+        Serves requests in a daemon thread, returning the stub.
+        """
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, path, query):
+        """
+        Returns the (status, payload, headers) of a request, payload being a JSON-serializable
+        object or encoded bytes.
+        """
+        with self._lock:
+            self.stats['requests'] += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+            limited = self._over_rate_limit()
+        if delay:
+            time.sleep(delay)
+
+        if failed:
+            self._count('errors')
+            return 503, {'error': 'Service temporarily unavailable.'}, {}
+        if limited:
+            self._count('rate_limited')
+            if self.rate_limit_status == 429:
+                return 429, {'Note': RATE_LIMIT_NOTE}, {'Retry-After': '60'}
+            return 200, {'Note': RATE_LIMIT_NOTE}, {}
+
+        function = query.get('function', [''])[0]
+        symbol = query.get('symbol', [''])[0]
+        outputsize = query.get('outputsize', ['compact'])[0]
+        if path != '/query' or function != 'TIME_SERIES_DAILY' or not symbol:
+            self._count('not_found')
+            return 200, {'Error Message': INVALID_CALL_MESSAGE}, {}
+
+        payload = self.payload(symbol, outputsize)
+        if payload is None:
+            self._count('not_found')
+            return 200, {'Error Message': INVALID_CALL_MESSAGE}, {}
+        self._count('served')
+        return 200, payload, {}
+
+    def payload(self, symbol, outputsize='compact'):
+        """
+        Returns the encoded response of a symbol, newest day first, or None when it has no data.
+        """
+        key = (symbol, outputsize)
+        with self._lock:
+            payload = self._payloads.get(key)
+        if payload is not None:
+            return payload
+
+        time_series = self._recorded(symbol) if self.data_dir else alpha_vantage_payload(
+            gbm_ohlcv(symbol, int(round(self.years * BUSINESS_DAYS_PER_YEAR)), self.seed)
+        )
+        if time_series is None:
+            return None
+        days = sorted(time_series, reverse=True)
+        if outputsize == 'compact':
+            days = days[:COMPACT_DAYS]
+
+        payload = json.dumps({
+            'Meta Data': {
+                '1. Information': 'Daily Prices (open, high, low, close) and Volumes',
+                '2. Symbol': symbol,
+                '3. Last Refreshed': days[0] if days else '',
+                '4. Output Size': 'Full size' if outputsize == 'full' else 'Compact',
+                '5. Time Zone': 'US/Eastern',
+            },
+            TIME_SERIES_KEY: {day: time_series[day] for day in days},
+        }, indent=4).encode()
+        with self._lock:
+            self._payloads[key] = payload
+        return payload
+
+    def _recorded(self, symbol):
+        # The recorded time series of a symbol, or None
+        try:
+            with open(os.path.join(self.data_dir, f'{symbol}.json')) as recorded_file:
+                recorded = json.load(recorded_file)
+        except FileNotFoundError:
+            return None
+        return recorded.get(TIME_SERIES_KEY, recorded)
+
+    def _over_rate_limit(self):
+        # Whether a request exceeds the rate limit over the last minute, the lock being held
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        while self._request_times and self._request_times[0] <= now - 60:
+            self._request_times.popleft()
+        if len(self._request_times) >= self.rate_limit:
+            return True
+        self._request_times.append(now)
+        return False
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
@@ -1,7 +1,19 @@
- # stocks/apps.py
+# stocks/apps.py
 from django.apps import AppConfig
+from django.core.signals import request_started
 
 class StocksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stocks'
 
+    def ready(self):
+        request_started.connect(start_report_workers, dispatch_uid='stocks.start_report_workers')
+
+
+def start_report_workers(**kwargs):
+    # Starts the report worker pool at the first request of the process, so the jobs already
+    # queued run without waiting for a new submission; management commands never start it
+    from .report_jobs import get_worker_pool
+
+    get_worker_pool()
+    request_started.disconnect(dispatch_uid='stocks.start_report_workers')
@@ -0,0 +1,90 @@
+# stocks/artifacts.py
+import hashlib
+import os
+import re
+import threading
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ArtifactStore:
+    """
+    Content-addressed file store of generated documents.
+
+    An artifact is stored under the SHA-256 digest of its bytes, as <digest[:2]>/<digest>, so
+    identical documents are stored once and a stored file never changes. Files are written to a
+    temporary file and renamed, so readers never see a partial artifact.
+    """
+
+    def __init__(self, store_dir=None):
+        self.store_dir = str(store_dir or settings.STOCKS_ARTIFACT_DIR)
+
+    def path(self, digest):
+        if not DIGEST_PATTERN.match(digest):
+            raise ValueError(f"Invalid artifact digest '{digest}'.")
+        return os.path.join(self.store_dir, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, content):
+        """
+        Stores bytes and returns their digest.
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temporary_path, 'wb') as file:
+                file.write(content)
+            os.replace(temporary_path, path)
+        return digest
+
+    def open(self, digest):
+        """
+        Returns the artifact opened for binary reading, raising FileNotFoundError when missing.
+        """
+        return open(self.path(digest), 'rb')
+
+    def digests(self):
+        """
+        Returns the set of the digests in the store.
+        """
+        if not os.path.isdir(self.store_dir):
+            return set()
+        return {
+            file
+            for prefix in os.listdir(self.store_dir) if os.path.isdir(os.path.join(self.store_dir, prefix))
+            for file in os.listdir(os.path.join(self.store_dir, prefix)) if DIGEST_PATTERN.match(file)
+        }
+
+    def delete(self, digest):
+        try:
+            os.remove(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+
+_store = None
+
+
+def get_artifact_store():
+    """
+    Returns the artifact store shared by the process.
+    """
+    global _store
+    if _store is None:
+        _store = ArtifactStore()
+    return _store
+
+
+@receiver(setting_changed)
+def reset_artifact_store(setting, **kwargs):
+    # Tests overriding the artifact directory get a store built from it
+    global _store
+    if setting == 'STOCKS_ARTIFACT_DIR':
+        _store = None
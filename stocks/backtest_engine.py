@@ -0,0 +1,152 @@
+# stocks/backtest_engine.py
+import numpy as np
+
+# Default parameters of the moving average strategy
+MOVING_AVERAGE_SHORT = 50  # 50-day moving average
+MOVING_AVERAGE_LONG = 200  # 200-day moving average
+
+
+def moving_average(closes, window, prefix_sum=None):
+    """
+    Computes the moving average used by the backtest for every day of a price series.
+
+    Inputs:
+    - closes: 1-D NumPy array of closing prices ordered by date.
+    - window: The moving average window in days.
+    - prefix_sum: Optional cumulative sum of `closes` with a leading zero, so several windows can share it.
+
+    Outputs:
+    - Returns a 1-D NumPy array with one moving average value per day.
+
+    The values mirror the running sums of the reference loop in `compute_backtest_reference`:
+    - Before the window is full, the average is taken over every close seen so far.
+    - Once the window is full, the oldest close is dropped one day early, so the sum covers
+      the last `window - 1` closes and is divided by `window`.
+    """
+    if prefix_sum is None:
+        prefix_sum = np.concatenate(([0.0], np.cumsum(closes)))
+
+    n = len(closes)
+    index = np.arange(n)
+    averages = prefix_sum[1:] / (index + 1)
+
+    if n >= window:
+        full = index[window - 1:]
+        averages[window - 1:] = (prefix_sum[full + 1] - prefix_sum[full - window + 2]) / window
+
+    return averages
+
+
+def position_states(buy_signal, sell_signal):
+    """
+    Resolves the buy/sell state machine of the strategy without a Python loop.
+
+    Inputs:
+    - buy_signal: Boolean array, True on days where the buy condition holds.
+    - sell_signal: Boolean array of the same shape, True on days where the sell condition holds.
+      Both arrays may carry leading axes to resolve several parameter sets at once.
+
+    Outputs:
+    - Returns a boolean array, True on days where the strategy holds the stock after trading.
+
+    The strategy starts in cash. A day with only a buy signal always ends invested and a day
+    with only a sell signal always ends in cash. A day with both signals flips the position,
+    since the buy branch fires when in cash and the sell branch fires when invested.
+    """
+    forced = buy_signal ^ sell_signal
+    toggle = buy_signal & sell_signal
+
+    # Parity of the days with both signals seen so far
+    toggled = np.bitwise_xor.accumulate(toggle, axis=-1)
+
+    # On forced days, the position matches the buy signal, which gives the parity to apply to the
+    # following days. The day index is encoded above that bit, so a running maximum forward-fills
+    # the bit of the last forced day.
+    index = np.arange(2, 2 * buy_signal.shape[-1] + 2, 2, dtype=np.int32)
+    encoded = np.where(forced, index + (buy_signal ^ toggled), 0)
+    last_forced = np.maximum.accumulate(encoded, axis=-1) & 1
+
+    return toggled ^ last_forced.astype(bool)
+
+
+def run_backtest(closes, initial_investment=1000, ma_short=None, ma_long=None):
+    """
+    Runs the moving average strategy over a price series using array operations.
+
+    Inputs:
+    - closes: 1-D NumPy array of closing prices ordered by date.
+    - initial_investment: The initial amount of money to invest in the backtest (default: 1000).
+    - ma_short: Moving average used by the buy condition (default: 50-day moving average of `closes`).
+    - ma_long: Moving average used by the sell condition (default: 200-day moving average of `closes`).
+      Both may carry leading axes to evaluate several parameter sets in one call.
+
+    Outputs:
+    - Returns a dictionary containing:
+      - 'total_return': The total return in percent.
+      - 'Max_Drawdown': The maximum drawdown as a fraction of the peak portfolio value.
+      - 'total_trades': The total number of buy and sell trades.
+      - 'portfolio_values': NumPy array of the portfolio value for every day.
+      Each entry has the leading shape of `ma_short`/`ma_long` when those are multi-dimensional.
+
+    The strategy is the one of `compute_backtest_reference`:
+    - Buy when the stock price falls below the short moving average.
+    - Sell when the stock price rises above the long moving average.
+    - An open position is valued at the last close of the series.
+    """
+    closes = np.ascontiguousarray(closes, dtype=np.float64)
+    if ma_short is None:
+        ma_short = moving_average(closes, MOVING_AVERAGE_SHORT)
+    if ma_long is None:
+        ma_long = moving_average(closes, MOVING_AVERAGE_LONG)
+
+    return run_signals(closes, closes < ma_short, closes > ma_long, initial_investment)
+
+
+def run_signals(closes, buy_signal, sell_signal, initial_investment=1000):
+    """
+    Trades a price series on precomputed buy and sell signals using array operations.
+
+    Inputs:
+    - closes: 1-D NumPy array of closing prices ordered by date.
+    - buy_signal: Boolean array, True on days where the strategy wants to be invested.
+    - sell_signal: Boolean array, True on days where the strategy wants to be in cash.
+      Both may carry leading axes to evaluate several parameter sets in one call.
+    - initial_investment: The initial amount of money to invest in the backtest (default: 1000).
+
+    Outputs:
+    - Returns the dictionary of `run_backtest`.
+
+    A buy signal buys with all the cash when in cash, a sell signal sells the whole position when
+    invested, see `position_states`. This is the trading part of every strategy of `strategies`.
+    """
+    if initial_investment == 0:
+        raise ValueError('The initial investment must be greater than zero.')
+
+    closes = np.ascontiguousarray(closes, dtype=np.float64)
+    shape = np.broadcast_shapes(buy_signal.shape, sell_signal.shape)
+
+    holding = position_states(np.broadcast_to(buy_signal, shape), np.broadcast_to(sell_signal, shape))
+
+    previous = np.zeros(shape, dtype=bool)
+    previous[..., 1:] = holding[..., :-1]
+    bought = holding & ~previous
+    sold = previous & ~holding
+
+    # Units are the shares owned while invested and the cash otherwise
+    factors = np.where(bought, 1.0 / closes, np.where(sold, closes, 1.0))
+    units = initial_investment * np.cumprod(factors, axis=-1)
+    portfolio_values = np.where(holding, units * closes[-1], units)
+
+    peak_values = np.maximum.accumulate(portfolio_values, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdowns = (peak_values - portfolio_values) / peak_values
+    max_drawdown = np.maximum(np.nanmax(drawdowns, axis=-1), 0.0)
+
+    total_return = (portfolio_values[..., -1] - initial_investment) / initial_investment * 100
+
+    return {
+        'total_return': total_return,
+        'Max_Drawdown': max_drawdown,
+        'total_trades': np.count_nonzero(bought | sold, axis=-1),
+        'portfolio_values': portfolio_values,
+    }
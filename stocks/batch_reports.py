@@ -0,0 +1,141 @@
+# stocks/batch_reports.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from django.conf import settings
+import numpy as np
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table
+from .metrics import pool_map, stage
+from .prices import load_prices_many, load_universe
+from .reports import TABLE_STYLE, draw_backtest_page, portfolio_chart, stock_chart
+from .strategies import DEFAULT_STRATEGY, get_strategy, run_strategy, strategy_columns
+
+# Rows of the summary table per page
+SUMMARY_ROWS_PER_PAGE = 30
+
+
+def render_symbol_page(symbol, dates, prices, initial_investment, strategy, params):
+    """
+    Backtests one symbol and renders its charts. Database-free entry point for worker processes.
+
+    Outputs:
+    - Returns a dictionary with the symbol, its 'compute_data' metrics and the PNG bytes of its
+      'portfolio_chart' and 'stock_chart'.
+    """
+    result = run_strategy(prices, initial_investment, strategy, params)
+    date_labels = np.asarray(dates, dtype='datetime64[D]').astype(str).tolist()
+    return {
+        'symbol': symbol,
+        'compute_data': {
+            'total_return': float(result['total_return']),
+            'Max_Drawdown': float(result['Max_Drawdown']),
+            'total_trades': int(result['total_trades']),
+        },
+        'portfolio_chart': portfolio_chart(symbol, result['portfolio_values']),
+        'stock_chart': stock_chart(symbol, date_labels, prices['close']),
+    }
+
+
+def render_symbol_pages(tasks, max_workers=None):
+    """
+    Runs `render_symbol_page` for each tuple of arguments of `tasks`, fanned out across worker processes.
+
+    Inputs:
+    - tasks: List of argument tuples of `render_symbol_page`.
+    - max_workers: Number of worker processes (default: settings.STOCKS_BACKTEST_WORKERS,
+      0 meaning one per CPU).
+
+    Outputs:
+    - Returns the list of pages, in the order of `tasks`.
+    """
+    max_workers = max_workers or settings.STOCKS_BACKTEST_WORKERS or os.cpu_count() or 1
+    max_workers = min(max_workers, len(tasks))
+
+    if max_workers <= 1:
+        return [render_symbol_page(*task) for task in tasks]
+
+    chunksize = max(1, len(tasks) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return pool_map(executor, render_symbol_page, *zip(*tasks), chunksize=chunksize)
+
+
+def draw_summary_pages(pdf_canvas, pages, title):
+    """
+    Draws the table ranking the symbols by total return, over as many pages as needed.
+    """
+    rows = [
+        [rank, page['symbol'], f"{page['compute_data']['total_return']:.2f}%",
+         f"{page['compute_data']['Max_Drawdown'] * 100:.2f}%", page['compute_data']['total_trades']]
+        for rank, page in enumerate(pages, start=1)
+    ]
+    for first in range(0, len(rows), SUMMARY_ROWS_PER_PAGE):
+        pdf_canvas.drawString(50, 740, title)
+        table = Table([['Rank', 'Symbol', 'Total Return', 'Max Drawdown', 'Total Trades']] + rows[first:first + SUMMARY_ROWS_PER_PAGE], colWidths=[50, 100, 100, 100, 100])
+        table.setStyle(TABLE_STYLE)
+        _, height = table.wrapOn(pdf_canvas, 500, 700)
+        table.drawOn(pdf_canvas, 50, 720 - height)
+        pdf_canvas.showPage()
+
+
+def build_batch_report(symbols=None, initial_investment=1000, start=None, end=None, strategy=DEFAULT_STRATEGY, params=None, max_workers=None):
+    """
+    Renders the backtest reports of several stock symbols as one multi-page PDF document.
+
+    Inputs:
+    - symbols: List of stock symbols (default: every symbol stored in the StockData table).
+    - initial_investment: The initial amount of money invested in each symbol (default: 1000).
+    - start: Optional first date of the backtests (inclusive).
+    - end: Optional last date of the backtests (inclusive).
+    - strategy: Name of a registered strategy (default: 'moving_average').
+    - params: Optional parameters of the strategy, overriding its defaults.
+    - max_workers: Number of worker processes used to run the backtests and render the charts.
+
+    Outputs:
+    - Returns a dictionary containing:
+      - 'pdf': The PDF document as bytes. It opens with a summary table ranking the symbols by total
+        return, followed by the report page of each symbol, in the same order and bookmarked.
+      - 'summary': The ranked list of the symbols with their total return, maximum drawdown and
+        number of trades.
+      - 'missing_symbols': The requested symbols without data, left out of the document.
+    - Returns a dictionary with an 'error' key when none of the symbols has data.
+
+    The prices of every symbol are read with one query. The workers only receive the price arrays,
+    and return the metrics and chart images, which are then assembled into the document in one pass.
+    """
+    if symbols is None:
+        symbols = load_universe()
+    if len(set(symbols)) != len(symbols):
+        raise ValueError('Each symbol can only appear once.')
+    params = get_strategy(strategy).resolve_params(params)
+
+    prices = load_prices_many(symbols, strategy_columns([strategy]), start, end)
+    held = [symbol for symbol in symbols if symbol in prices]
+    if not held:
+        return {
+            'error': 'No data available for the specified symbols.'
+        }
+
+    pages = render_symbol_pages(
+        [(symbol, *prices[symbol], initial_investment, strategy, params) for symbol in held],
+        max_workers,
+    )
+    pages.sort(key=lambda page: page['compute_data']['total_return'], reverse=True)
+
+    with stage('pdf_assembly'):
+        pdf_buf = BytesIO()
+        pdf_canvas = canvas.Canvas(pdf_buf, pagesize=letter, invariant=True)
+        draw_summary_pages(pdf_canvas, pages, f'Backtest Summary: {strategy}, {len(pages)} symbols, initial investment {initial_investment}')
+        for page in pages:
+            pdf_canvas.bookmarkPage(page['symbol'])
+            pdf_canvas.addOutlineEntry(page['symbol'], page['symbol'])
+            draw_backtest_page(pdf_canvas, page['symbol'], page['compute_data'], page['portfolio_chart'], page['stock_chart'])
+            pdf_canvas.showPage()
+        pdf_canvas.save()
+
+    return {
+        'pdf': pdf_buf.getvalue(),
+        'summary': [{'rank': rank, 'symbol': page['symbol'], **page['compute_data']} for rank, page in enumerate(pages, start=1)],
+        'missing_symbols': [symbol for symbol in symbols if symbol not in prices],
+    }
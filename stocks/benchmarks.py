@@ -0,0 +1,266 @@
+# stocks/benchmarks.py
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+import django
+import numpy as np
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from .controller import compute_backtest
+from .ingestion import ingest_rows
+from .models import StockData
+from .model_registry import DEFAULT_MODEL
+from .prediction import forecast_many, predict_many
+from .result_cache import get_cache
+from .synthetic import synthetic_market, synthetic_symbols
+from .views import generate_backtest_report
+
+# Benchmarks of the main code paths on synthetic data, see the `benchmark` management command.
+# Each benchmark is registered under its name with a function receiving the generated market
+# ({symbol: ohlcv}) and its size in years, and returning the callable that is timed.
+BENCHMARKS = {}
+
+# Sizes measured by default, as (symbols, years): the current data volume, 10× more symbols,
+# and 10× more data
+DEFAULT_SIZES = ((1, 2), (10, 2), (10, 10))
+
+# Relative increase of the time or peak memory of a case considered a regression
+DEFAULT_THRESHOLD = 0.25
+
+
+def benchmark(name, empty_table=False):
+    """
+    Decorator registering a benchmark. With `empty_table`, the StockData table is emptied
+    before each run instead of holding the generated market.
+    """
+    def register(function):
+        function.empty_table = empty_table
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+def market_rows(ohlcv):
+    # The rows of `ingest_rows`
+    return zip(
+        ohlcv['date'].tolist(), ohlcv['open'].tolist(), ohlcv['high'].tolist(),
+        ohlcv['low'].tolist(), ohlcv['close'].tolist(), ohlcv['volume'].tolist(),
+    )
+
+
+def load_market(market, years):
+    """
+    Replaces the StockData table with the generated market.
+    """
+    StockData.objects.all().delete()
+    for symbol, ohlcv in market.items():
+        ingest_rows(symbol, market_rows(ohlcv), cutoff_days=int(years * 366) + 7)
+
+
+@benchmark('ingestion', empty_table=True)
+def ingestion_benchmark(market, years):
+    # Every symbol ingested into an empty table, as by `fetch_universe`
+    def run():
+        for symbol, ohlcv in market.items():
+            ingest_rows(symbol, market_rows(ohlcv), cutoff_days=int(years * 366) + 7)
+    return run
+
+
+@benchmark('backtest')
+def backtest_benchmark(market, years):
+    # The default backtest of every symbol
+    def run():
+        for symbol in market:
+            compute_backtest(symbol, 1000)
+    return run
+
+
+@benchmark('report')
+def report_benchmark(market, years):
+    # The PDF report view of the first symbol, its backtest not cached
+    symbol = next(iter(market))
+    request = RequestFactory().get(f'/generatebacktestreport/{symbol}/1000/')
+
+    def run():
+        get_cache().clear()
+        response = generate_backtest_report(request, symbol, 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'The report failed: {response.content.decode()}')
+    return run
+
+
+@benchmark('prediction')
+def prediction_benchmark(market, years):
+    # The next close of every symbol, and their 5 day forecast, with the default model
+    symbols = list(market)
+
+    def run():
+        predict_many(symbols, refresh=False)
+        forecast_many(symbols, 5, DEFAULT_MODEL, refresh=False)
+    return run
+
+
+def measure(run, repeat=3, reset=None):
+    """
+    Measures a benchmark.
+
+    Inputs:
+    - run: The callable measured.
+    - repeat: Number of timed runs, after one warm-up run (default: 3).
+    - reset: Optional callable run before each run, outside the measures.
+
+    Outputs:
+    - Returns a dictionary of the 'seconds' of the fastest run, the 'median_seconds' of the
+      runs, and the number of SQL 'queries' and the 'peak_bytes' of the memory allocated by
+      Python and NumPy during one more run, traced separately so the tracing does not slow the
+      timed runs.
+    """
+    timings = []
+    for index in range(repeat + 1):
+        if reset:
+            reset()
+        start = time.perf_counter()
+        run()
+        if index:
+            timings.append(time.perf_counter() - start)
+
+    if reset:
+        reset()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'seconds': min(timings),
+        'median_seconds': statistics.median(timings),
+        'queries': len(queries),
+        'peak_bytes': peak_bytes,
+    }
+
+
+def parse_size(value):
+    """
+    Parses a benchmark size written as '<symbols>x<years>', such as '10x2'.
+    """
+    symbols, _, years = value.partition('x')
+    try:
+        size = int(symbols), float(years)
+    except ValueError:
+        raise ValueError(f"Invalid size '{value}', expected '<symbols>x<years>'.")
+    if size[0] < 1 or size[1] <= 0:
+        raise ValueError(f"Invalid size '{value}', expected at least one symbol and a positive number of years.")
+    return size
+
+
+def case_name(name, symbols, years):
+    return f'{name}[{symbols}x{years:g}]'
+
+
+def run_benchmarks(names=None, sizes=DEFAULT_SIZES, repeat=3, seed=0, progress=None):
+    """
+    Runs benchmarks on synthetic markets of several sizes, in the current database.
+
+    Inputs:
+    - names: Names of the benchmarks run (default: every registered benchmark).
+    - sizes: List of (symbols, years) sizes of the generated markets (default: DEFAULT_SIZES).
+    - repeat: Number of timed runs per case (default: 3).
+    - seed: Seed of the synthetic market data (default: 0).
+    - progress: Optional callable receiving the name and measures of each case when done.
+
+    Outputs:
+    - Returns a dictionary with the 'environment' of the run, its 'seed', and the 'cases' mapping
+      each '<benchmark>[<symbols>x<years>]' case to the measures of `measure`, with its size and
+      number of 'rows'.
+
+    The StockData table is replaced by each generated market, so this is meant to run in a test
+    database, as done by the `benchmark` command.
+    """
+    names = list(BENCHMARKS) if names is None else names
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark '{name}', expected one of {', '.join(BENCHMARKS)}.")
+
+    cases = {}
+    for symbols, years in sizes:
+        market = synthetic_market(synthetic_symbols(symbols), years, seed)
+        rows = sum(len(ohlcv['close']) for ohlcv in market.values())
+        load_market(market, years)
+
+        for name in names:
+            function = BENCHMARKS[name]
+            reset = (lambda: StockData.objects.all().delete()) if function.empty_table else None
+            measures = measure(function(market, years), repeat, reset)
+            if function.empty_table:
+                load_market(market, years)
+
+            case = case_name(name, symbols, years)
+            cases[case] = {'benchmark': name, 'symbols': symbols, 'years': years, 'rows': rows, **measures}
+            if progress:
+                progress(case, cases[case])
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'machine': platform.machine(),
+        },
+        'seed': seed,
+        'cases': cases,
+    }
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares benchmark results with a baseline.
+
+    Inputs:
+    - results, baseline: Dictionaries returned by `run_benchmarks`.
+    - threshold: Relative increase of the time or peak memory of a case considered a regression
+      (default: 0.25). Any increase of the number of queries is a regression.
+
+    Outputs:
+    - Returns the list of the regressions, as messages. Cases missing from the baseline are not compared.
+    """
+    regressions = []
+    for case, measures in results['cases'].items():
+        reference = baseline.get('cases', {}).get(case)
+        if reference is None:
+            continue
+        if measures['seconds'] > reference['seconds'] * (1 + threshold):
+            regressions.append(f"{case}: {measures['seconds']:.4f}s, baseline {reference['seconds']:.4f}s")
+        if measures['queries'] > reference['queries']:
+            regressions.append(f"{case}: {measures['queries']} queries, baseline {reference['queries']}")
+        if measures['peak_bytes'] > reference['peak_bytes'] * (1 + threshold):
+            regressions.append(f"{case}: peak memory {measures['peak_bytes']} bytes, baseline {reference['peak_bytes']}")
+    return regressions
+
+
+def read_results(path):
+    """
+    Reads benchmark results from a JSON file, returning None when the file does not exist.
+    """
+    try:
+        with open(path) as results_file:
+            return json.load(results_file)
+    except FileNotFoundError:
+        return None
+
+
+def write_results(results, path):
+    """
+    Writes benchmark results to a JSON file, creating its directory.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
+        results_file.write('\n')
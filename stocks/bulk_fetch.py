@@ -0,0 +1,136 @@
+# stocks/bulk_fetch.py
+import asyncio
+import time
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .ingestion import ingest_rows, ingest_start_date
+from .market_data import RETRY_STATUSES, RateLimitError, backoff_delay
+from .metrics import stage
+from .streaming import TimeSeriesStreamParser
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket limiting the rate of requests sent to the provider.
+
+    Tokens are refilled continuously at `rate_per_minute` and up to `capacity`, and each request
+    takes one token, waiting for it when the bucket is empty.
+    """
+
+    def __init__(self, rate_per_minute, capacity=1, clock=time.monotonic):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated_at = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+async def fetch_time_series_rows(client, symbol, bucket, stop_before, outputsize, max_retries, backoff):
+    """
+    Fetches the daily rows of a stock symbol with an asyncio HTTP client.
+
+    The response is parsed while it is read and closed at the first day older than `stop_before`,
+    see `streaming.TimeSeriesStreamParser`. Every attempt waits for a token of the bucket. Failed
+    and rate limited requests are retried with exponential backoff, like the synchronous client.
+    """
+    params = {
+        'function': settings.ALPHA_VANTAGE_FUNCTION,
+        'symbol': symbol,
+        'outputsize': outputsize,
+        'apikey': settings.ALPHA_VANTAGE_API_KEY,
+    }
+    for attempt in range(max_retries + 1):
+        last_attempt = attempt >= max_retries
+        await bucket.acquire()
+        try:
+            # Rate limit waits are left out of the upstream fetch time
+            with stage('upstream_fetch'):
+                async with client.stream('GET', settings.ALPHA_VANTAGE_BASE_URL, params=params) as response:
+                    if response.status_code in RETRY_STATUSES and not last_attempt:
+                        delay = backoff_delay(backoff, attempt, response.headers.get('Retry-After'))
+                    else:
+                        response.raise_for_status()  # Raise an exception for HTTP errors
+
+                        parser = TimeSeriesStreamParser(stop_before)
+                        rows = []
+                        async for chunk in response.aiter_bytes():
+                            rows.extend(parser.feed(chunk))
+                            if parser.finished:
+                                break
+                        parser.close()
+                        return rows
+
+        except (httpx.TransportError, RateLimitError):
+            if last_attempt:
+                raise
+            delay = backoff_delay(backoff, attempt)
+
+        await asyncio.sleep(delay)
+
+
+async def fetch_universe(symbols, max_concurrency=None, rate_per_minute=None, outputsize=None, on_result=None):
+    """
+    Fetches and ingests the daily time series of many stock symbols concurrently.
+
+    Inputs:
+    - symbols: List of stock symbols to refresh.
+    - max_concurrency: Maximum number of requests in flight (default: settings.ALPHA_VANTAGE_MAX_CONCURRENCY).
+    - rate_per_minute: Maximum number of requests sent per minute (default: settings.ALPHA_VANTAGE_RATE_LIMIT).
+    - outputsize: Alpha Vantage output size (default: settings.ALPHA_VANTAGE_OUTPUTSIZE).
+    - on_result: Optional callable receiving (symbol, result) as each symbol completes.
+
+    Outputs:
+    - Returns a dictionary mapping each symbol to the counts of `ingest_rows`, or to a
+      dictionary with an 'error' key when the symbol could not be refreshed.
+
+    Each response is parsed while it is read, up to the latest stored day of the symbol, and the
+    rows are ingested as soon as it ends, while the other requests are still in flight. The run is
+    bounded by the provider's rate limit rather than by serial latency.
+    """
+    max_concurrency = max_concurrency or settings.ALPHA_VANTAGE_MAX_CONCURRENCY
+    rate_per_minute = rate_per_minute or settings.ALPHA_VANTAGE_RATE_LIMIT
+    outputsize = outputsize or settings.ALPHA_VANTAGE_OUTPUTSIZE
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    bucket = TokenBucket(rate_per_minute, settings.ALPHA_VANTAGE_RATE_BURST)
+    start_date = sync_to_async(ingest_start_date, thread_sensitive=True)
+    ingest = sync_to_async(ingest_rows, thread_sensitive=True)
+
+    timeout = httpx.Timeout(settings.ALPHA_VANTAGE_READ_TIMEOUT, connect=settings.ALPHA_VANTAGE_CONNECT_TIMEOUT)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+
+        async def refresh(symbol):
+            try:
+                stop_before = await start_date(symbol)
+                async with semaphore:
+                    rows = await fetch_time_series_rows(
+                        client, symbol, bucket, stop_before, outputsize,
+                        settings.ALPHA_VANTAGE_MAX_RETRIES, settings.ALPHA_VANTAGE_BACKOFF,
+                    )
+                result = await ingest(symbol, rows)
+            except Exception as err:
+                result = {'error': f'{type(err).__name__}: {err}'}
+
+            if on_result is not None:
+                on_result(symbol, result)
+            return symbol, result
+
+        return dict(await asyncio.gather(*(refresh(symbol) for symbol in symbols)))
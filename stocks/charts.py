@@ -0,0 +1,123 @@
+# stocks/charts.py
+import threading
+from io import BytesIO
+import numpy as np
+from .metrics import stage
+
+# Line charts of the reports, rendered with the object-oriented Agg API: every figure is owned by
+# its caller, so charts can be rendered by several threads at once, unlike with pyplot. Series are
+# downsampled to the pixel width of the chart before plotting, since a chart cannot show more than
+# a few points per pixel column anyway. Matplotlib is imported by the first chart built, so the
+# processes which draw no chart never load it.
+
+CHART_WIDTH = 640  # pixels
+CHART_HEIGHT = 480
+CHART_DPI = 100
+
+# Labels of the charts, by kind
+CHARTS = {
+    'portfolio': {'xlabel': 'Time', 'ylabel': 'Portfolio Value ($)', 'label': 'Portfolio Value'},
+    'stock': {'xlabel': 'Date', 'ylabel': 'Stock Price ($)', 'label': 'Stock Price'},
+}
+
+
+def downsample_minmax(values, buckets):
+    """
+    Returns the sorted indices of the points to keep to draw a series on `buckets` pixel columns.
+
+    The series is cut into `buckets` consecutive buckets, each keeping its first, last, minimum
+    and maximum points, so the line drawn from the kept points covers the same pixels as the
+    line of the full series. Short series are kept whole.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    count = len(values)
+    if count <= 4 * buckets:
+        return np.arange(count)
+
+    starts = np.linspace(0, count, buckets + 1).astype(np.int64)[:-1]
+    ends = np.append(starts[1:], count) - 1
+    bucket = np.repeat(np.arange(buckets), np.diff(np.append(starts, count)))
+    positions = np.arange(count)
+
+    # First position of each bucket's extremes; NaN buckets keep only their ends
+    with np.errstate(invalid='ignore'):
+        lowest = np.minimum.reduceat(values, starts)
+        highest = np.maximum.reduceat(values, starts)
+    minimums = np.minimum.reduceat(np.where(values == lowest[bucket], positions, count), starts)
+    maximums = np.minimum.reduceat(np.where(values == highest[bucket], positions, count), starts)
+
+    kept = np.unique(np.concatenate((starts, ends, minimums, maximums)))
+    return kept[kept < count]
+
+
+class ChartTemplate:
+    """
+    A line chart figure built once and redrawn with the data of each chart.
+
+    Building a figure, its axes and labels costs about as much as drawing it, so a template keeps
+    them and only replaces the line data, title and ticks. A template is not thread-safe: use one
+    per thread, see `render_chart`.
+    """
+
+    def __init__(self, xlabel, ylabel, label, width=CHART_WIDTH, height=CHART_HEIGHT, dpi=CHART_DPI):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.width = width
+        self.figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.subplots()
+        (self.line,) = self.axes.plot([], [], label=label)
+        self.axes.set_xlabel(xlabel)
+        self.axes.set_ylabel(ylabel)
+        self.axes.legend(loc='upper left')
+        # Fixed margins fitting rotated date labels, instead of a tight layout computed per chart
+        self.figure.subplots_adjust(left=0.13, right=0.97, top=0.93, bottom=0.2)
+
+    def render(self, values, title, x_labels=None):
+        """
+        Returns the PNG bytes of the chart of `values`, at positions 0 to len(values) - 1.
+
+        Inputs:
+        - values: The series to plot.
+        - title: The title of the chart.
+        - x_labels: Optional labels of the positions (e.g. dates), about 20 of which are shown.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        kept = downsample_minmax(values, self.width)
+        self.line.set_data(kept, values[kept])
+        self.axes.set_title(title)
+        self.axes.relim()
+        self.axes.autoscale_view()
+
+        if x_labels is not None:
+            ticks = np.arange(0, len(values), max(1, len(values) // 20))  # Show fewer date labels
+            self.axes.set_xticks(ticks, [x_labels[tick] for tick in ticks], rotation=45, ha='right')
+
+        buffer = BytesIO()
+        self.figure.savefig(buffer, format='png')
+        return buffer.getvalue()
+
+
+_templates = threading.local()
+
+
+@stage('chart_render')
+def render_chart(kind, values, title, x_labels=None, reuse=True):
+    """
+    Renders a chart of the reports as PNG bytes.
+
+    Inputs:
+    - kind: The kind of chart, a key of CHARTS.
+    - values, title, x_labels: The arguments of `ChartTemplate.render`.
+    - reuse: Whether to redraw the template of the current thread instead of building a figure.
+    """
+    if not reuse:
+        return ChartTemplate(**CHARTS[kind]).render(values, title, x_labels)
+
+    templates = getattr(_templates, 'charts', None)
+    if templates is None:
+        templates = _templates.charts = {}
+    if kind not in templates:
+        templates[kind] = ChartTemplate(**CHARTS[kind])
+    return templates[kind].render(values, title, x_labels)
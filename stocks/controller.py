@@ -1,5 +1,9 @@
+from .metrics import stage
 from .models import StockData
+from .prices import load_close_prices, load_close_prices_many, load_prices, load_universe
+from .strategies import DEFAULT_STRATEGY, get_strategy, run_strategies, strategy_columns
 from datetime import datetime, timedelta
+import numpy as np
 
 def reset_dataBase_with_new_data (data , symbol) :
     """
@@ -58,8 +62,94 @@ def reset_dataBase_with_new_data (data , symbol) :
     
     return filtered_data
 
-def compute_backtest(symbol='AAPL', initial_investment=1000):
+@stage('backtest_compute')
+def compute_backtests(symbol='AAPL', initial_investment=1000, start=None, end=None, strategies=((DEFAULT_STRATEGY, None),)):
     """
+    Computes the backtests of several strategies on a stock symbol, sharing their indicators.
+
+    Inputs:
+    - symbol: The stock symbol for which the backtests are executed (default: 'AAPL').
+    - initial_investment: The initial amount of money invested by each strategy (default: 1000).
+    - start: Optional first date of the backtests (inclusive).
+    - end: Optional last date of the backtests (inclusive).
+    - strategies: List of (name, params) pairs of registered strategies, params overriding the
+      strategy's defaults (default: the moving average strategy).
+
+    Outputs:
+    - Returns a dictionary containing:
+      - 'strategies': For each strategy, its name, resolved parameters and 'compute_data', as in
+        `compute_backtest_reference`.
+      - 'stock_data': A list of dictionaries containing the stock's date and closing price.
+
+    Only the price columns the strategies need are read, with one query, and every indicator is
+    computed once over the whole series, see `strategies.run_strategies`.
+    """
+    resolved = [(name, get_strategy(name).resolve_params(params)) for name, params in strategies]
+    dates, prices = load_prices(symbol, strategy_columns(name for name, _ in resolved), start, end)
+    # Exception handling for empty data
+    if len(prices['close']) == 0:
+        return {
+            'error': 'No data available for the specified symbol.'
+        }
+
+    results = run_strategies(prices, resolved, initial_investment)
+
+    return {
+        'strategies': [
+            {
+                'strategy': name,
+                'params': params,
+                'compute_data': {
+                    'total_return': float(result['total_return']),
+                    'Max_Drawdown': float(result['Max_Drawdown']),
+                    'total_trades': int(result['total_trades']),
+                    'portfolio_values': result['portfolio_values'].tolist(),
+                },
+            }
+            for (name, params), result in zip(resolved, results)
+        ],
+        'stock_data': [
+            {'date': date, 'close_price': close_price}
+            for date, close_price in zip(np.asarray(dates, dtype='datetime64[D]').astype(str).tolist(), prices['close'].tolist())
+        ]
+    }
+
+def compute_backtest(symbol='AAPL', initial_investment=1000, start=None, end=None, strategy=DEFAULT_STRATEGY, params=None):
+    """
+    Computes the backtest for a given stock symbol using historical data and a trading strategy.
+
+    Inputs:
+    - symbol: The stock symbol for which the backtest is executed (default: 'AAPL').
+    - initial_investment: The initial amount of money to invest in the backtest (default: 1000).
+    - start: Optional first date of the backtest (inclusive).
+    - end: Optional last date of the backtest (inclusive).
+    - strategy: Name of a registered strategy (default: 'moving_average', the basic moving average strategy).
+    - params: Optional parameters of the strategy, overriding its defaults.
+
+    Outputs:
+    - Returns the same dictionary as `compute_backtest_reference`, with the 'strategy' name and
+      its resolved 'params'.
+
+    The prices are read with one query and the strategy is evaluated with the vectorized engine
+    in `backtest_engine`, instead of walking the queryset day by day.
+    """
+    backtests = compute_backtests(symbol, initial_investment, start, end, [(strategy, params)])
+    if 'error' in backtests:
+        return backtests
+
+    backtest = backtests['strategies'][0]
+    return {
+        'strategy': backtest['strategy'],
+        'params': backtest['params'],
+        'compute_data': backtest['compute_data'],
+        'stock_data': backtests['stock_data'],
+    }
+
+def compute_backtest_reference(symbol='AAPL', initial_investment=1000):
+    """
+    Reference implementation of `compute_backtest`, walking the queryset one day at a time.
+    It is kept to check the vectorized engine against.
+
     Computes the backtest for a given stock symbol using historical data and a basic moving average strategy.
 
     Inputs:
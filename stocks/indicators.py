@@ -0,0 +1,144 @@
+# stocks/indicators.py
+import numpy as np
+from .backtest_engine import moving_average
+
+# Registry of the vectorized indicators, by name. Every indicator is computed over the full price
+# arrays of a symbol at once, from a dictionary of float64 columns ('open', 'high', 'low',
+# 'close', 'volume').
+INDICATORS = {}
+
+
+def register_indicator(name):
+    """
+    Decorator registering a function as the indicator `name`.
+    """
+    def register(function):
+        INDICATORS[name] = function
+        return function
+    return register
+
+
+def _window(window):
+    if int(window) != window or window < 1:
+        raise ValueError(f'Invalid window {window}, expected a positive integer.')
+    return int(window)
+
+
+def _smooth(values, alpha):
+    # Exponential smoothing y[i] = alpha * x[i] + (1 - alpha) * y[i - 1], seeded with the first value
+    if len(values) == 0:
+        return values.copy()
+    # scipy.signal takes about a second to import, so only the processes smoothing prices load it
+    from scipy.signal import lfilter
+    smoothed, _ = lfilter([alpha], [1, alpha - 1], values, zi=[(1 - alpha) * values[0]])
+    return smoothed
+
+
+def _rolling_mean(values, window):
+    # Mean of the last `window` values, NaN until the window is full
+    prefix_sum = np.concatenate(([0.0], np.cumsum(values)))
+    means = np.full(len(values), np.nan)
+    if len(values) >= window:
+        means[window - 1:] = (prefix_sum[window:] - prefix_sum[:len(values) - window + 1]) / window
+    return means
+
+
+@register_indicator('moving_average')
+def moving_average_indicator(prices, window):
+    """
+    Moving average of the closes as computed by the original backtest, see `backtest_engine.moving_average`.
+    """
+    return moving_average(prices['close'], _window(window))
+
+
+@register_indicator('sma')
+def sma(prices, window, column='close'):
+    """
+    Simple moving average of a price column, NaN until the window is full.
+    """
+    return _rolling_mean(prices[column], _window(window))
+
+
+@register_indicator('ema')
+def ema(prices, window, column='close'):
+    """
+    Exponential moving average of a price column, with the smoothing factor 2 / (window + 1).
+    """
+    return _smooth(prices[column], 2 / (_window(window) + 1))
+
+
+@register_indicator('rsi')
+def rsi(prices, window=14):
+    """
+    Relative strength index of the closes with Wilder's smoothing, NaN during the first `window` days.
+    """
+    window = _window(window)
+    changes = np.diff(prices['close'], prepend=prices['close'][:1])
+    average_gain = _smooth(np.maximum(changes, 0), 1 / window)
+    average_loss = _smooth(np.maximum(-changes, 0), 1 / window)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = 100 - 100 / (1 + average_gain / average_loss)
+    values[average_loss == 0] = 100.0
+    values[(average_loss == 0) & (average_gain == 0)] = 50.0
+    values[:window] = np.nan
+    return values
+
+
+@register_indicator('bollinger')
+def bollinger(prices, window=20, width=2.0):
+    """
+    Bollinger bands of the closes, returned as a (middle, upper, lower) tuple of arrays.
+
+    The middle band is the simple moving average and the bands are `width` standard deviations away.
+    """
+    window = _window(window)
+    middle = _rolling_mean(prices['close'], window)
+    variance = np.maximum(_rolling_mean(prices['close'] ** 2, window) - middle ** 2, 0)
+    deviation = width * np.sqrt(variance)
+    return middle, middle + deviation, middle - deviation
+
+
+@register_indicator('atr')
+def atr(prices, window=14):
+    """
+    Average true range with Wilder's smoothing, NaN until the window is full.
+    """
+    window = _window(window)
+    high, low, close = prices['high'], prices['low'], prices['close']
+    previous_close = np.concatenate((close[:1], close[:-1]))
+    true_range = np.maximum(high - low, np.maximum(np.abs(high - previous_close), np.abs(low - previous_close)))
+    true_range[:1] = high[:1] - low[:1]
+
+    values = _smooth(true_range, 1 / window)
+    values[:window - 1] = np.nan
+    return values
+
+
+@register_indicator('obv')
+def obv(prices):
+    """
+    On-balance volume: the running sum of the volume, added on up days and subtracted on down days.
+    """
+    return np.cumsum(np.sign(np.diff(prices['close'], prepend=prices['close'][:1])) * prices['volume'])
+
+
+class IndicatorSet:
+    """
+    Indicators of one price series, each computed once per (name, parameters) and then shared by
+    every strategy of a run.
+    """
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.computed = 0
+        self._values = {}
+
+    def get(self, name, **params):
+        if name not in INDICATORS:
+            raise ValueError(f"Unknown indicator '{name}'.")
+        key = (name, tuple(sorted(params.items())))
+        if key not in self._values:
+            self._values[key] = INDICATORS[name](self.prices, **params)
+            self.computed += 1
+        return self._values[key]
@@ -0,0 +1,171 @@
+# stocks/ingestion.py
+import logging
+from datetime import datetime, timedelta
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from .metrics import stage
+from .models import StockData
+from .price_store import columnar_backend, get_store
+from .prices import latest_date
+from .result_cache import bump_data_version
+from .strategy_state import advance_symbol_states
+
+# Only the last two years of data are stored
+INGEST_CUTOFF_DAYS = 730
+
+# Fields refreshed when a stored day is ingested again
+UPDATE_FIELDS = ['open_price', 'high_price', 'low_price', 'close_price', 'volume']
+
+logger = logging.getLogger(__name__)
+
+
+def parse_daily_row(date, daily_data):
+    """
+    Converts one day of an Alpha Vantage time series into a typed row.
+
+    Inputs:
+    - date: The day as a 'YYYY-MM-DD' string.
+    - daily_data: Dictionary with the '1. open', '2. high', '3. low', '4. close' and '5. volume' values.
+
+    Outputs:
+    - Returns a tuple (date, open_price, high_price, low_price, close_price, volume) with a
+      datetime.date, floats and an int. Raises KeyError, TypeError or ValueError on invalid data.
+    """
+    return (
+        datetime.strptime(date, '%Y-%m-%d').date(),
+        float(daily_data['1. open']),
+        float(daily_data['2. high']),
+        float(daily_data['3. low']),
+        float(daily_data['4. close']),
+        int(float(daily_data['5. volume'])),
+    )
+
+
+def parse_time_series(data):
+    """
+    Converts an Alpha Vantage 'Time Series (Daily)' dictionary into typed rows.
+
+    Inputs:
+    - data: Dictionary with dates as keys and daily data (open, high, low, close, volume) as values.
+
+    Outputs:
+    - Yields the rows of `parse_daily_row`. Days that cannot be parsed are logged and dropped.
+    """
+    for date, daily_data in data.items():
+        try:
+            yield parse_daily_row(date, daily_data)
+        except (KeyError, TypeError, ValueError) as parse_err:
+            logger.warning('Parsing error occurred while processing date %s: %s', date, parse_err)
+
+
+def ingest_start_date(symbol, cutoff_days=INGEST_CUTOFF_DAYS):
+    """
+    Returns the first date `ingest_rows` would store for a stock symbol.
+
+    It is the latest date already stored for the symbol, or the cutoff date when the symbol has no
+    recent data, so a fetch can stop reading the provider's response at that date.
+    """
+    cutoff_date = (datetime.now() - timedelta(days=cutoff_days)).date()
+    stored_date = latest_date(symbol)
+    return max(cutoff_date, stored_date) if stored_date else cutoff_date
+
+
+def _write_batch(batch):
+    StockData.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=['symbol', 'date'],
+        update_fields=UPDATE_FIELDS,
+    )
+
+
+@stage('db_ingest')
+def ingest_rows(symbol, rows, batch_size=None, cutoff_days=INGEST_CUTOFF_DAYS):
+    """
+    Upserts the new daily rows of a stock symbol into the StockData table.
+
+    Inputs:
+    - symbol: The stock symbol the rows belong to.
+    - rows: Iterable of (date, open_price, high_price, low_price, close_price, volume) tuples, in any order.
+    - batch_size: Number of rows written per statement (default: settings.STOCKS_INGEST_BATCH_SIZE).
+    - cutoff_days: Rows older than this many days are not stored (default: 730, approximately 2 years).
+
+    Outputs:
+    - Returns a dictionary with the number of 'inserted', 'updated' and 'skipped' rows.
+
+    Only rows on or after the latest date already stored for the symbol are written; the latest
+    stored day is refreshed since it may have been ingested before the market closed. Rows are
+    written with `bulk_create(update_conflicts=True)` on the ('symbol', 'date') unique key, inside
+    a single transaction. `rows` is read `batch_size` rows at a time, each batch written before the
+    next is read, so only one batch is held in memory. Since it is read inside the transaction,
+    callers pass rows already downloaded, as `fetch_data` and `bulk_fetch` do, rather than a
+    network stream that would hold the transaction open. Other symbols are left untouched. The data version of the symbol is bumped in the transaction,
+    invalidating its cached backtests as the rows commit. After the commit, with the columnar
+    price backend the symbol's file of the price store is rewritten and the version bumped again,
+    and its strategy states are advanced over the new days.
+    """
+    batch_size = batch_size or settings.STOCKS_INGEST_BATCH_SIZE
+    cutoff_date = (datetime.now() - timedelta(days=cutoff_days)).date()
+    counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+    rows = iter(rows)
+
+    with transaction.atomic():
+        stored_date = latest_date(symbol)
+
+        while chunk := list(islice(rows, batch_size)):
+            batch = []
+            for date, open_price, high_price, low_price, close_price, volume in chunk:
+                # Skip data older than the cutoff or already stored
+                if date < cutoff_date or (stored_date is not None and date < stored_date):
+                    counts['skipped'] += 1
+                    continue
+
+                if date == stored_date:
+                    counts['updated'] += 1
+                else:
+                    counts['inserted'] += 1
+
+                batch.append(StockData(
+                    symbol=symbol,
+                    date=date,
+                    open_price=open_price,
+                    high_price=high_price,
+                    low_price=low_price,
+                    close_price=close_price,
+                    volume=volume,
+                ))
+            if batch:
+                _write_batch(batch)
+
+        if counts['inserted'] or counts['updated']:
+            # Cached backtests of the symbol are stale once the rows are committed
+            bump_data_version(symbol)
+            if columnar_backend():
+                def sync_store():
+                    # Rewrite the symbol's file once the rows are committed, then bump the version
+                    # again: a backtest cached meanwhile from the old file is never read
+                    get_store().sync(symbol)
+                    bump_data_version(symbol)
+
+                transaction.on_commit(sync_store)
+            # Live strategy states only read the new rows
+            transaction.on_commit(lambda: advance_symbol_states(symbol))
+
+    return counts
+
+
+def ingest_time_series(data, symbol, batch_size=None, cutoff_days=INGEST_CUTOFF_DAYS):
+    """
+    Ingests an Alpha Vantage 'Time Series (Daily)' dictionary for a stock symbol.
+
+    Inputs:
+    - data: Dictionary with dates as keys and daily data (open, high, low, close, volume) as values.
+    - symbol: The stock symbol the data belongs to.
+    - batch_size: Number of rows written per statement (default: settings.STOCKS_INGEST_BATCH_SIZE).
+    - cutoff_days: Rows older than this many days are not stored (default: 730, approximately 2 years).
+
+    Outputs:
+    - Returns the counts of `ingest_rows`.
+    """
+    return ingest_rows(symbol, parse_time_series(data), batch_size, cutoff_days)
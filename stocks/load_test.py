@@ -0,0 +1,123 @@
+# stocks/load_test.py
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+# Load-test driver firing concurrent HTTP requests at a running instance of the service, see the
+# `load_test` management command. Run the service against `alpha_vantage_stub.AlphaVantageStub`
+# to measure it under a given upstream latency, error rate and rate limit.
+
+# Paths of the endpoints under test
+ENDPOINTS = {
+    'fetch': '/fetch/{symbol}/',
+    'backtest': '/backtest/{symbol}/{initial_investment}/',
+    'report': '/generatebacktestreport/{symbol}/{initial_investment}/',
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def load_targets(endpoints=tuple(ENDPOINTS), symbols=('AAPL',), initial_investment=1000):
+    """
+    Returns the (endpoint, path) pairs requested by a load test: every endpoint on every symbol.
+    """
+    targets = []
+    for name in endpoints:
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}', expected one of {', '.join(ENDPOINTS)}.")
+        targets += [(name, ENDPOINTS[name].format(symbol=symbol, initial_investment=initial_investment)) for symbol in symbols]
+    return targets
+
+
+def latency_summary(latencies, errors, elapsed):
+    """
+    Summarizes the latencies in seconds of the requests of a load test.
+
+    Outputs:
+    - Returns a dictionary with the number of 'requests' and 'errors', the 'throughput' in
+      requests per second over `elapsed` seconds, and the 'mean_ms', 'p50_ms', 'p95_ms',
+      'p99_ms' and 'max_ms' latencies in milliseconds.
+    """
+    summary = {'requests': len(latencies), 'errors': errors, 'throughput': len(latencies) / elapsed if elapsed else 0.0}
+    if latencies:
+        milliseconds = np.asarray(latencies) * 1000
+        summary['mean_ms'] = float(milliseconds.mean())
+        summary.update({f'p{percentile}_ms': float(value) for percentile, value in zip(PERCENTILES, np.percentile(milliseconds, PERCENTILES))})
+        summary['max_ms'] = float(milliseconds.max())
+    return summary
+
+
+def run_load_test(base_url, targets, total_requests=100, duration=None, concurrency=8, timeout=60):
+    """
+    Sends concurrent GET requests to a running service and measures their latency.
+
+    Inputs:
+    - base_url: The root URL of the service, such as 'http://127.0.0.1:8000'.
+    - targets: List of (endpoint, path) pairs, requested in turn, see `load_targets`.
+    - total_requests: Number of requests sent (default: 100), ignored when `duration` is set.
+    - duration: Optional number of seconds during which requests are sent.
+    - concurrency: Number of requests in flight (default: 8), one pooled session per worker thread.
+    - timeout: Timeout in seconds of each request (default: 60).
+
+    Outputs:
+    - Returns a dictionary with the 'concurrency', the 'elapsed' seconds, the `latency_summary`
+      of 'all' the requests and of each endpoint in 'endpoints', and the count of each status
+      code in 'statuses' ('error' for requests without response). Responses with a status of
+      400 or more are errors.
+    """
+    base_url = base_url.rstrip('/')
+    workload = itertools.cycle(targets)
+    sent = itertools.count()
+    deadline = time.monotonic() + duration if duration else None
+    lock = threading.Lock()
+    records = []
+
+    def next_target():
+        with lock:
+            if deadline is not None:
+                return next(workload) if time.monotonic() < deadline else None
+            return next(workload) if next(sent) < total_requests else None
+
+    def worker():
+        with requests.Session() as session:
+            while (target := next_target()) is not None:
+                name, path = target
+                start = time.perf_counter()
+                try:
+                    response = session.get(base_url + path, timeout=timeout)
+                    response.content  # read the whole body
+                    status = response.status_code
+                except requests.exceptions.RequestException:
+                    status = 'error'
+                records.append((name, status, time.perf_counter() - start))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    def failed(status):
+        return status == 'error' or status >= 400
+
+    statuses = {}
+    for _, status, _ in records:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    return {
+        'concurrency': concurrency,
+        'elapsed': elapsed,
+        'all': latency_summary([seconds for _, _, seconds in records], sum(failed(status) for _, status, _ in records), elapsed),
+        'endpoints': {
+            name: latency_summary(
+                [seconds for endpoint, _, seconds in records if endpoint == name],
+                sum(failed(status) for endpoint, status, _ in records if endpoint == name),
+                elapsed,
+            )
+            for name in dict.fromkeys(name for name, _ in targets)
+        },
+        'statuses': statuses,
+    }
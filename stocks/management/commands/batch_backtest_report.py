@@ -0,0 +1,44 @@
+# stocks/management/commands/batch_backtest_report.py
+from django.core.management.base import BaseCommand, CommandError
+from stocks.batch_reports import build_batch_report
+from stocks.prices import parse_date
+from stocks.strategies import DEFAULT_STRATEGY
+
+
+class Command(BaseCommand):
+    help = 'Writes the backtest reports of several stock symbols to one multi-page PDF document.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Stock symbols of the report (default: every stored symbol).')
+        parser.add_argument('--output', default='batch_backtest_report.pdf', help='Path of the PDF document (default: batch_backtest_report.pdf).')
+        parser.add_argument('--investment', type=int, default=1000, help='Initial investment per symbol (default: 1000).')
+        parser.add_argument('--start', help="First date of the backtests, as 'YYYY-MM-DD'.")
+        parser.add_argument('--end', help="Last date of the backtests, as 'YYYY-MM-DD'.")
+        parser.add_argument('--strategy', default=DEFAULT_STRATEGY, help=f'Name of the strategy (default: {DEFAULT_STRATEGY}).')
+        parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE', help='Strategy parameter, may be repeated.')
+        parser.add_argument('--workers', type=int, help='Number of worker processes (default: settings.STOCKS_BACKTEST_WORKERS).')
+
+    def handle(self, *args, **options):
+        try:
+            params = dict(param.split('=', 1) for param in options['param'])
+            result = build_batch_report(
+                options['symbols'] or None,
+                options['investment'],
+                parse_date(options['start']),
+                parse_date(options['end']),
+                options['strategy'],
+                params,
+                options['workers'],
+            )
+        except ValueError as value_err:
+            raise CommandError(f'Invalid backtest parameters: {value_err}')
+
+        if 'error' in result:
+            raise CommandError(result['error'])
+
+        with open(options['output'], 'wb') as file:
+            file.write(result['pdf'])
+
+        for symbol in result['missing_symbols']:
+            self.stdout.write(self.style.WARNING(f'{symbol}: no data, left out of the report'))
+        self.stdout.write(self.style.SUCCESS(f"Wrote the report of {len(result['summary'])} symbols to {options['output']}."))
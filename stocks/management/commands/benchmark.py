@@ -0,0 +1,76 @@
+# stocks/management/commands/benchmark.py
+import os
+import tempfile
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from stocks.benchmarks import (
+    BENCHMARKS, DEFAULT_SIZES, DEFAULT_THRESHOLD, compare_results, parse_size, read_results, run_benchmarks, write_results,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Times ingestion, backtests, reports and predictions on seeded synthetic markets of several sizes, '
+        'with their SQL query counts and peak memory, and fails on regressions against a JSON baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('benchmarks', nargs='*', help=f"Benchmarks to run (default: {' '.join(BENCHMARKS)}).")
+        parser.add_argument('--sizes', nargs='+', default=[f'{symbols}x{years}' for symbols, years in DEFAULT_SIZES], help="Market sizes as '<symbols>x<years>' (default: 1x2 10x2 10x10).")
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case (default: 3).')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic market data (default: 0).')
+        parser.add_argument('--baseline', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json'), help='JSON baseline file (default: benchmarks/baseline.json).')
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help=f'Relative slowdown or memory increase failing the run (default: {DEFAULT_THRESHOLD}).')
+        parser.add_argument('--save', action='store_true', help='Write the results as the new baseline instead of comparing them.')
+        parser.add_argument('--output', help='Also write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [parse_size(size) for size in options['sizes']]
+        except ValueError as value_err:
+            raise CommandError(str(value_err))
+
+        self.stdout.write(f"{'Case':<24} {'Rows':>8} {'Seconds':>9} {'Median':>9} {'Queries':>8} {'Peak MiB':>9}")
+
+        def progress(case, measures):
+            self.stdout.write(
+                f"{case:<24} {measures['rows']:>8} {measures['seconds']:>9.4f} {measures['median_seconds']:>9.4f} "
+                f"{measures['queries']:>8} {measures['peak_bytes'] / 2 ** 20:>9.1f}"
+            )
+
+        # The benchmarks replace the stored data: run them in a throwaway test database, with
+        # the price store and the report artifacts in a temporary directory
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory() as scratch_dir, override_settings(
+                STOCKS_PRICE_STORE_DIR=os.path.join(scratch_dir, 'price_store'),
+                STOCKS_ARTIFACT_DIR=os.path.join(scratch_dir, 'artifacts'),
+                STOCKS_REPORT_WORKERS=0,
+            ):
+                results = run_benchmarks(options['benchmarks'] or None, sizes, options['repeat'], options['seed'], progress)
+        except ValueError as value_err:
+            raise CommandError(str(value_err))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['output']:
+            write_results(results, options['output'])
+        if options['save']:
+            write_results(results, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}"))
+            return
+
+        baseline = read_results(options['baseline'])
+        if baseline is None:
+            self.stdout.write(self.style.WARNING(f"No baseline at {options['baseline']}, run with --save to create it."))
+            return
+        if baseline.get('environment') != results['environment']:
+            self.stdout.write(self.style.WARNING('The baseline was recorded in another environment, the timings may not compare.'))
+
+        regressions = compare_results(results, baseline, options['threshold'])
+        if regressions:
+            raise CommandError('Performance regressions:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"No regression against {options['baseline']} (threshold {options['threshold']:.0%})."))
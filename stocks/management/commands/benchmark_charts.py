@@ -0,0 +1,73 @@
+# stocks/management/commands/benchmark_charts.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import numpy as np
+from django.core.management.base import BaseCommand
+from stocks.charts import render_chart
+
+
+def render_pyplot(values, dates):
+    """
+    The stock chart as rendered by the report view before `charts`: pyplot, every point, dates as categories.
+    """
+    from matplotlib import pyplot as plt
+
+    plt.figure()
+    plt.plot(dates, values, label='Stock Price')
+    plt.xlabel('Date')
+    plt.ylabel('Stock Price ($)')
+    plt.title('Stock Data for BENCH')
+    plt.legend()
+    plt.xticks(ticks=range(0, len(dates), max(1, len(dates) // 20)), rotation=45)
+    plt.tight_layout()
+    buffer = BytesIO()
+    plt.savefig(buffer, format='png')
+    plt.close()
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Compares the render time and PNG size of the report charts with the former pyplot rendering.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, nargs='+', default=[250, 2500, 10000], help='Series lengths (default: 250 2500 10000).')
+        parser.add_argument('--repeat', type=int, default=10, help='Renders per measure (default: 10).')
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4], help='Thread counts of the throughput measure (default: 1 2 4).')
+
+    def measure(self, render, repeat):
+        render()  # warm up fonts and caches
+        start = time.perf_counter()
+        for _ in range(repeat):
+            size = len(render())
+        return (time.perf_counter() - start) / repeat * 1000, size
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        repeat = options['repeat']
+
+        self.stdout.write(f"{'Points':>8} {'Renderer':<18} {'ms/chart':>9} {'PNG bytes':>10}")
+        for points in options['points']:
+            values = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, points)))
+            dates = (np.datetime64('2000-01-01') + np.arange(points)).astype(str).tolist()
+            renderers = {
+                'pyplot': lambda: render_pyplot(values, dates),
+                'agg': lambda: render_chart('stock', values, 'Stock Data for BENCH', dates, reuse=False),
+                'agg + template': lambda: render_chart('stock', values, 'Stock Data for BENCH', dates),
+            }
+            for name, render in renderers.items():
+                milliseconds, size = self.measure(render, repeat)
+                self.stdout.write(f'{points:>8} {name:<18} {milliseconds:>9.1f} {size:>10}')
+
+        points = max(options['points'])
+        values = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, points)))
+        dates = (np.datetime64('2000-01-01') + np.arange(points)).astype(str).tolist()
+        self.stdout.write(f"\n{'Threads':>8} {'charts/s':>9} (agg + template, {points} points)")
+        for threads in options['threads']:
+            renders = repeat * threads
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                list(executor.map(lambda _: render_chart('stock', values, 'Stock Data for BENCH', dates), range(threads)))
+                start = time.perf_counter()
+                list(executor.map(lambda _: render_chart('stock', values, 'Stock Data for BENCH', dates), range(renders)))
+                elapsed = time.perf_counter() - start
+            self.stdout.write(f'{threads:>8} {renders / elapsed:>9.1f}')
@@ -0,0 +1,46 @@
+# stocks/management/commands/benchmark_startup.py
+import json
+from django.core.management.base import BaseCommand, CommandError
+from stocks.startup import HEAVY_MODULES, measure_startup
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the cold start time and resident memory of fresh worker processes, and fails when '
+        'the plotting, PDF or ML stacks are imported at startup.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Processes started (default: 5).')
+        parser.add_argument('--settings-module', help='Django settings of the processes (default: the current settings).')
+        parser.add_argument('--max-seconds', type=float, help='Median startup time failing the run, in seconds.')
+        parser.add_argument('--max-rss', type=float, help='Median peak resident memory failing the run, in MiB.')
+        parser.add_argument('--output', help='Also write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        try:
+            results = measure_startup(options['repeat'], options['settings_module'])
+        except (RuntimeError, ValueError) as err:
+            raise CommandError(str(err))
+
+        for key, label in (('wall_seconds', 'Process start (s)'), ('seconds', 'Service load (s)')):
+            spread = results[key]
+            self.stdout.write(f"{label:<22} min {spread['min']:.3f}  median {spread['median']:.3f}  max {spread['max']:.3f}")
+        self.stdout.write(f"{'Peak RSS (MiB)':<22} {results['max_rss'] / 2 ** 20:.1f}")
+        for name, seconds in results['first_use'].items():
+            self.stdout.write(f"{'First use of ' + name:<40} {seconds:.3f}s")
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+
+        failures = []
+        if results['heavy_modules']:
+            failures.append(f"Imported at startup: {', '.join(results['heavy_modules'])} (expected none of {', '.join(HEAVY_MODULES)}).")
+        if options['max_seconds'] is not None and results['wall_seconds']['median'] > options['max_seconds']:
+            failures.append(f"Median startup of {results['wall_seconds']['median']:.3f}s over {options['max_seconds']}s.")
+        if options['max_rss'] is not None and results['max_rss'] / 2 ** 20 > options['max_rss']:
+            failures.append(f"Median peak RSS of {results['max_rss'] / 2 ** 20:.1f} MiB over {options['max_rss']} MiB.")
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('No heavy dependency imported at startup.'))
@@ -0,0 +1,29 @@
+# stocks/management/commands/build_price_store.py
+from django.core.management.base import BaseCommand
+from stocks.price_store import get_store
+from stocks.prices import load_universe
+
+
+class Command(BaseCommand):
+    help = 'Writes the memory-mapped price files of the columnar backend from the StockData table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Stock symbols to write (default: every stored symbol).')
+        parser.add_argument('--prune', action='store_true', help='Remove the files of symbols no longer stored.')
+
+    def handle(self, *args, **options):
+        store = get_store()
+        symbols = options['symbols'] or load_universe()
+
+        for symbol in symbols:
+            store.sync(symbol)
+            self.stdout.write(f'{symbol}: written')
+
+        if options['prune']:
+            stored_symbols = set(load_universe())
+            for symbol in store.symbols():
+                if symbol not in stored_symbols:
+                    store.delete(symbol)
+                    self.stdout.write(f'{symbol}: removed')
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(symbols)} symbols to {store.store_dir}.'))
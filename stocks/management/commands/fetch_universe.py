@@ -0,0 +1,38 @@
+# stocks/management/commands/fetch_universe.py
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from stocks.bulk_fetch import fetch_universe
+from stocks.prices import load_universe
+
+
+class Command(BaseCommand):
+    help = 'Fetches and stores the daily data of many stock symbols concurrently, within the provider rate limit.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Stock symbols to fetch (default: every stored symbol).')
+        parser.add_argument('--file', help='File listing one stock symbol per line.')
+        parser.add_argument('--concurrency', type=int, help='Maximum number of requests in flight (default: settings.ALPHA_VANTAGE_MAX_CONCURRENCY).')
+        parser.add_argument('--rate', type=float, help='Maximum number of requests per minute (default: settings.ALPHA_VANTAGE_RATE_LIMIT).')
+        parser.add_argument('--outputsize', choices=['compact', 'full'], help='Alpha Vantage output size (default: settings.ALPHA_VANTAGE_OUTPUTSIZE).')
+
+    def handle(self, *args, **options):
+        symbols = list(options['symbols'])
+        if options['file']:
+            with open(options['file'], 'r') as file:
+                symbols += [line.strip() for line in file if line.strip() and not line.startswith('#')]
+        symbols = list(dict.fromkeys(symbols)) or load_universe()
+        if not symbols:
+            raise CommandError('No symbols to fetch.')
+
+        def report(symbol, result):
+            if 'error' in result:
+                self.stderr.write(f"{symbol}: {result['error']}")
+            else:
+                self.stdout.write(f"{symbol}: {result['inserted']} inserted, {result['updated']} updated, {result['skipped']} skipped")
+
+        results = async_to_sync(fetch_universe)(symbols, options['concurrency'], options['rate'], options['outputsize'], report)
+
+        failed = [symbol for symbol, result in results.items() if 'error' in result]
+        self.stdout.write(self.style.SUCCESS(f'Fetched {len(results) - len(failed)} of {len(results)} symbols.'))
+        if failed:
+            raise CommandError(f"Failed symbols: {', '.join(failed)}")
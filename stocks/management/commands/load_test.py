@@ -0,0 +1,41 @@
+# stocks/management/commands/load_test.py
+import json
+from django.core.management.base import BaseCommand, CommandError
+from stocks.load_test import ENDPOINTS, load_targets, run_load_test
+
+
+class Command(BaseCommand):
+    help = 'Fires concurrent requests at the fetch, backtest and report endpoints of a running service and reports throughput and latency percentiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoints', nargs='*', help=f"Endpoints to load (default: {' '.join(ENDPOINTS)}).")
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Root URL of the service (default: http://127.0.0.1:8000).')
+        parser.add_argument('--symbols', nargs='+', default=['AAPL'], help='Stock symbols requested in turn (default: AAPL).')
+        parser.add_argument('--investment', type=int, default=1000, help='Initial investment of the backtests and reports (default: 1000).')
+        parser.add_argument('--requests', type=int, default=100, help='Number of requests (default: 100).')
+        parser.add_argument('--duration', type=float, help='Send requests for this many seconds instead of a fixed number.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Number of requests in flight (default: 8).')
+        parser.add_argument('--timeout', type=float, default=60, help='Timeout of each request in seconds (default: 60).')
+        parser.add_argument('--output', help='Also write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        try:
+            targets = load_targets(options['endpoints'] or list(ENDPOINTS), options['symbols'], options['investment'])
+        except ValueError as value_err:
+            raise CommandError(str(value_err))
+
+        results = run_load_test(
+            options['url'], targets, options['requests'], options['duration'], options['concurrency'], options['timeout'],
+        )
+
+        self.stdout.write(f"{'Endpoint':<10} {'Requests':>8} {'Errors':>7} {'Req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'Max ms':>9}")
+        for name, summary in [*results['endpoints'].items(), ('all', results['all'])]:
+            self.stdout.write(
+                f"{name:<10} {summary['requests']:>8} {summary['errors']:>7} {summary['throughput']:>8.1f} "
+                f"{summary.get('p50_ms', 0):>9.1f} {summary.get('p95_ms', 0):>9.1f} {summary.get('p99_ms', 0):>9.1f} {summary.get('max_ms', 0):>9.1f}"
+            )
+        self.stdout.write(f"Statuses: {', '.join(f'{status}: {count}' for status, count in sorted(results['statuses'].items()))}")
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2)
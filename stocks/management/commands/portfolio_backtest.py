@@ -0,0 +1,50 @@
+# stocks/management/commands/portfolio_backtest.py
+import json
+from django.core.management.base import BaseCommand, CommandError
+from stocks.portfolio import compute_portfolio_backtest
+
+
+class Command(BaseCommand):
+    help = 'Runs the moving average backtest on a portfolio of stock symbols in parallel worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Stock symbols of the portfolio (default: every stored symbol).')
+        parser.add_argument('--investment', type=float, default=10000, help='Total initial investment (default: 10000).')
+        parser.add_argument('--weights', type=float, nargs='+', help='Capital weights, one per symbol (default: equal weights).')
+        parser.add_argument('--workers', type=int, help='Number of worker processes (default: settings.STOCKS_BACKTEST_WORKERS).')
+        parser.add_argument('--json', action='store_true', help='Print the full result as JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            result = compute_portfolio_backtest(
+                options['symbols'] or None,
+                options['investment'],
+                options['weights'],
+                options['workers'],
+            )
+        except ValueError as value_err:
+            raise CommandError(f'Invalid portfolio parameters: {value_err}')
+
+        if 'error' in result:
+            raise CommandError(result['error'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+            return
+
+        compute_data = result['compute_data']
+        self.stdout.write(f"{'Symbol':<10} {'Weight':>8} {'Return %':>10} {'Contrib %':>10} {'Drawdown %':>11} {'Trades':>7}")
+        ranked = sorted(result['contributions'].items(), key=lambda item: item[1]['contribution'], reverse=True)
+        for symbol, contribution in ranked:
+            self.stdout.write(
+                f"{symbol:<10} {contribution['weight']:>8.4f} {contribution['total_return']:>10.2f} "
+                f"{contribution['contribution']:>10.2f} {contribution['Max_Drawdown'] * 100:>11.2f} {contribution['total_trades']:>7}"
+            )
+        for symbol in result['missing_symbols']:
+            self.stdout.write(self.style.WARNING(f'{symbol}: no data, allocation kept in cash'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Portfolio: total return {compute_data['total_return']:.2f}%, "
+            f"max drawdown {compute_data['Max_Drawdown'] * 100:.2f}%, "
+            f"{compute_data['total_trades']} trades"
+        ))
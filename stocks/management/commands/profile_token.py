@@ -0,0 +1,18 @@
+# stocks/management/commands/profile_token.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from stocks.profiling import PROFILE_HEADER, profile_token
+
+
+class Command(BaseCommand):
+    help = 'Prints a signed token allowing its bearer to profile requests with the X-Stocks-Profile header.'
+
+    def handle(self, *args, **options):
+        if not settings.STOCKS_PROFILING:
+            self.stderr.write(self.style.WARNING('STOCKS_PROFILING is disabled: the header is ignored until it is enabled.'))
+        self.stdout.write(profile_token())
+        # Only the token goes to stdout, so it can be captured
+        self.stderr.write(
+            f'Send it as the {PROFILE_HEADER} header, within {settings.STOCKS_PROFILE_TOKEN_MAX_AGE} seconds; '
+            f'the profiles are written to {settings.STOCKS_PROFILE_DIR}.',
+        )
@@ -0,0 +1,34 @@
+# stocks/management/commands/run_alpha_vantage_stub.py
+from django.core.management.base import BaseCommand
+from stocks.alpha_vantage_stub import AlphaVantageStub
+
+
+class Command(BaseCommand):
+    help = 'Serves synthetic or recorded TIME_SERIES_DAILY data as a local stand-in for the Alpha Vantage API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1).')
+        parser.add_argument('--port', type=int, default=8001, help='Port to listen on (default: 8001).')
+        parser.add_argument('--data-dir', help="Directory of recorded '<SYMBOL>.json' responses (default: synthetic prices for every symbol).")
+        parser.add_argument('--years', type=float, default=2, help='Years of synthetic prices per symbol (default: 2).')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic prices, latencies and errors (default: 0).')
+        parser.add_argument('--latency', type=float, default=0.0, help='Delay of each response in seconds (default: 0).')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Maximum random delay added to each response in seconds (default: 0).')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of the requests answered with HTTP 503 (default: 0).')
+        parser.add_argument('--rate-limit', type=int, help='Requests per minute answered before the rate limit notice (default: no limit).')
+        parser.add_argument('--rate-limit-status', type=int, choices=[200, 429], default=200, help="Status of the rate limit notice: 200 with a 'Note' like Alpha Vantage, or 429 (default: 200).")
+
+    def handle(self, *args, **options):
+        stub = AlphaVantageStub(
+            options['host'], options['port'], options['data_dir'], options['years'], options['seed'],
+            options['latency'], options['jitter'], options['error_rate'], options['rate_limit'], options['rate_limit_status'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Serving Alpha Vantage queries at {stub.url}'))
+        self.stdout.write(f'Run the service with ALPHA_VANTAGE_BASE_URL={stub.url} to use it.')
+        try:
+            stub.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stub.server.server_close()
+            self.stdout.write(f"Answered {stub.stats['requests']} requests: {stub.stats}")
@@ -0,0 +1,28 @@
+# stocks/management/commands/run_report_worker.py
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from stocks.report_jobs import process_report_jobs, purge_report_jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs the queued report jobs, polling the queue until stopped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the queued jobs and exit.')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds between polls of an empty queue (default: 1).')
+        parser.add_argument('--purge-days', type=int, help='First delete the jobs finished more than this many days ago, and their artifacts.')
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            jobs, artifacts = purge_report_jobs(options['purge_days'])
+            self.stdout.write(f'Purged {jobs} jobs and {artifacts} artifacts.')
+
+        while True:
+            processed = process_report_jobs()
+            if processed:
+                self.stdout.write(f'Ran {processed} report jobs.')
+            if options['once']:
+                break
+            close_old_connections()
+            time.sleep(options['poll'])
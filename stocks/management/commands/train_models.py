@@ -0,0 +1,59 @@
+# stocks/management/commands/train_models.py
+import time
+from django.core.management.base import BaseCommand, CommandError
+from stocks.prices import parse_date
+from stocks.training import DEFAULT_FEATURES, MODES, RETURN_MODEL, save_model, train_return_model
+
+
+class Command(BaseCommand):
+    help = 'Trains a next day return model on the stored closes, validates it walk-forward and writes it to the model registry.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Stock symbols to train on (default: every stored symbol).')
+        parser.add_argument('--mode', choices=MODES, default='per_symbol', help='One model per symbol, or one pooled model (default: per_symbol).')
+        parser.add_argument('--lags', type=int, default=DEFAULT_FEATURES['lags'], help=f"Number of lagged returns (default: {DEFAULT_FEATURES['lags']}).")
+        parser.add_argument('--windows', type=int, nargs='+', default=DEFAULT_FEATURES['windows'], help='Rolling windows of the features (default: 5 20).')
+        parser.add_argument('--splits', type=int, default=5, help='Number of walk-forward folds (default: 5).')
+        parser.add_argument('--alpha', type=float, default=1.0, help='Ridge regularization strength (default: 1.0).')
+        parser.add_argument('--start', help="First date of the training data, as 'YYYY-MM-DD'.")
+        parser.add_argument('--end', help="Last date of the training data, as 'YYYY-MM-DD'.")
+        parser.add_argument('--workers', type=int, help='Number of worker processes (default: one per CPU).')
+        parser.add_argument('--name', default=RETURN_MODEL, help=f'Name of the model in the registry (default: {RETURN_MODEL}).')
+        parser.add_argument('--dry-run', action='store_true', help='Report the validation metrics without writing the model.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        features = {'lags': options['lags'], 'windows': options['windows']}
+        try:
+            model, report = train_return_model(
+                options['symbols'] or None,
+                options['mode'],
+                features,
+                options['splits'],
+                options['alpha'],
+                parse_date(options['start']),
+                parse_date(options['end']),
+                options['workers'],
+            )
+        except ValueError as value_err:
+            raise CommandError(f'Invalid training parameters: {value_err}')
+        elapsed = time.perf_counter() - started
+
+        for symbol in report['skipped_symbols']:
+            self.stdout.write(self.style.WARNING(f'{symbol}: not enough data, skipped'))
+
+        metrics = report['metrics']
+        self.stdout.write(
+            f"Walk-forward over {metrics['rows']} days: RMSE {metrics.get('rmse', float('nan')):.6f} "
+            f"(no change: {metrics.get('baseline_rmse', float('nan')):.6f}), "
+            f"directional accuracy {metrics.get('directional_accuracy', float('nan')) * 100:.1f}%"
+        )
+        if options['dry_run']:
+            return
+
+        version, path = save_model(
+            model, report, options['name'],
+            mode=options['mode'], splits=options['splits'], alpha=options['alpha'],
+            start=options['start'], end=options['end'], training_seconds=elapsed,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Trained {options['name']} version {version} in {elapsed:.1f}s: {path}"))
@@ -0,0 +1,235 @@
+# stocks/market_data.py
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from .metrics import stage
+
+TIME_SERIES_KEY = 'Time Series (Daily)'
+
+# HTTP statuses worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class MarketDataError(requests.exceptions.RequestException):
+    """
+    Raised when Alpha Vantage answers with an error payload instead of data.
+    """
+
+
+class RateLimitError(MarketDataError):
+    """
+    Raised when Alpha Vantage keeps rejecting requests because of its rate limit.
+    """
+
+
+def is_rate_limited(payload):
+    """
+    Returns True when an Alpha Vantage payload is a rate limit notice.
+
+    Alpha Vantage answers over-limit requests with HTTP 200 and a 'Note' or 'Information' message.
+    """
+    message = payload.get('Note') or payload.get('Information') or ''
+    return 'rate limit' in message.lower() or 'call frequency' in message.lower()
+
+
+def check_payload(payload):
+    """
+    Raises the matching MarketDataError when an Alpha Vantage payload carries no data.
+    """
+    if is_rate_limited(payload):
+        raise RateLimitError(payload.get('Note') or payload.get('Information'))
+    for key in ('Error Message', 'Information', 'Note'):
+        if key in payload:
+            raise MarketDataError(payload[key])
+
+
+def backoff_delay(backoff, attempt, retry_after=None):
+    """
+    Returns the delay in seconds before retrying a request for the given attempt.
+
+    The delay doubles on every attempt, with up to 50% random jitter, and is never shorter than the
+    `Retry-After` header value sent by the provider.
+    """
+    delay = backoff * 2 ** attempt * (1 + random.random() / 2)
+    try:
+        return max(delay, float(retry_after))
+    except (TypeError, ValueError):
+        return delay
+
+
+class AlphaVantageClient:
+    """
+    Client of the Alpha Vantage API shared by the views, the prediction and the ingestion.
+
+    - Connections are pooled by a single `requests.Session`.
+    - Every request has a connect and a read timeout.
+    - Failed and rate limited requests are retried with exponential backoff, waiting at least the
+      `Retry-After` delay sent by the provider.
+    - Successful payloads are cached for `cache_ttl` seconds, keyed by (function, symbol, outputsize):
+      in memory for the `cache_max_entries` most recently used keys, and on disk when `cache_dir` is set.
+    """
+
+    def __init__(self, base_url=None, api_key=None, timeout=None, max_retries=None, backoff=None,
+                 cache_ttl=None, cache_dir=None, cache_max_entries=None, pool_size=None, sleep=time.sleep):
+        self.base_url = base_url or settings.ALPHA_VANTAGE_BASE_URL
+        self.api_key = api_key or settings.ALPHA_VANTAGE_API_KEY
+        self.timeout = timeout or (settings.ALPHA_VANTAGE_CONNECT_TIMEOUT, settings.ALPHA_VANTAGE_READ_TIMEOUT)
+        self.max_retries = settings.ALPHA_VANTAGE_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = settings.ALPHA_VANTAGE_BACKOFF if backoff is None else backoff
+        self.cache_ttl = settings.ALPHA_VANTAGE_CACHE_TTL if cache_ttl is None else cache_ttl
+        self.cache_dir = settings.ALPHA_VANTAGE_CACHE_DIR if cache_dir is None else cache_dir
+        self.cache_max_entries = cache_max_entries or settings.ALPHA_VANTAGE_CACHE_MAX_ENTRIES
+        self.sleep = sleep
+
+        pool_size = pool_size or settings.ALPHA_VANTAGE_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_daily_time_series(self, symbol, outputsize=None):
+        """
+        Returns the 'Time Series (Daily)' dictionary of a stock symbol, keyed by date.
+        """
+        payload = self.get_json(settings.ALPHA_VANTAGE_FUNCTION, symbol, outputsize or settings.ALPHA_VANTAGE_OUTPUTSIZE)
+        return payload.get(TIME_SERIES_KEY, {})
+
+    def get_json(self, function, symbol, outputsize):
+        """
+        Returns the JSON payload of an Alpha Vantage query, from the cache when it is fresh.
+        """
+        key = (function, symbol, outputsize)
+        payload = self._cache_get(key)
+        if payload is None:
+            with stage('upstream_fetch'):
+                payload = self.request(function=function, symbol=symbol, outputsize=outputsize)
+            self._cache_set(key, payload)
+        return payload
+
+    def request(self, stream=False, **params):
+        """
+        Sends a query to Alpha Vantage, retrying failures and rate limits with exponential backoff.
+
+        Inputs:
+        - stream: Whether the open response is returned instead of its decoded JSON payload.
+        - params: The query parameters, the API key being added.
+
+        Outputs:
+        - Returns the decoded JSON payload, or the response when `stream` is True.
+
+        Callers time the whole fetch, the body of a streamed response included, as the
+        'upstream_fetch' stage.
+        """
+        params = {**params, 'apikey': self.api_key}
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt >= self.max_retries
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if last_attempt:
+                    raise
+                self.sleep(self._backoff_delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUSES and not last_attempt:
+                response.close()
+                self.sleep(self._backoff_delay(attempt, response.headers.get('Retry-After')))
+                continue
+            response.raise_for_status()  # Raise an exception for HTTP errors
+
+            if stream:
+                return response
+            payload = response.json()
+            if is_rate_limited(payload) and not last_attempt:
+                self.sleep(self._backoff_delay(attempt))
+                continue
+            check_payload(payload)
+            return payload
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        return backoff_delay(self.backoff, attempt, retry_after)
+
+    def _cache_path(self, key):
+        digest = hashlib.sha256(json.dumps(key).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{digest}.json')
+
+    def _cache_get(self, key):
+        if self.cache_ttl <= 0:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                return cached[1]
+
+        if self.cache_dir:
+            path = self._cache_path(key)
+            try:
+                if os.path.getmtime(path) + self.cache_ttl > time.time():
+                    with open(path, 'r') as file:
+                        payload = json.load(file)
+                    self._remember(key, payload)
+                    return payload
+            except (OSError, ValueError):
+                pass
+        return None
+
+    def _remember(self, key, payload):
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, payload)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+
+    def _cache_set(self, key, payload):
+        if self.cache_ttl <= 0:
+            return
+
+        self._remember(key, payload)
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path(key)
+            # Write then rename so readers never see a partial file
+            temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temporary_path, 'w') as file:
+                json.dump(payload, file)
+            os.replace(temporary_path, path)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_client = None
+
+
+def get_client():
+    """
+    Returns the Alpha Vantage client shared by the process.
+    """
+    global _client
+    if _client is None:
+        _client = AlphaVantageClient()
+    return _client
+
+
+@receiver(setting_changed)
+def reset_client(setting, **kwargs):
+    # Tests overriding the provider settings get a client built from them
+    global _client
+    if setting.startswith('ALPHA_VANTAGE_'):
+        _client = None
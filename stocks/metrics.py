@@ -0,0 +1,333 @@
+# stocks/metrics.py
+import atexit
+import fcntl
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import partial
+from django.conf import settings
+
+# Counters and histograms of the service, exposed in the Prometheus text format by the `metrics`
+# view. Each process keeps its own values; with STOCKS_METRICS_DIR set, every process also writes
+# them to its own file of that directory, at most every FLUSH_INTERVAL seconds, and the view sums
+# the files of every process, so the metrics cover all the workers of the service. The files of the
+# processes which exited are folded into EXITED_FILE, so the directory does not grow as workers are
+# recycled; the processes writing to the directory must run on the same host, since liveness is
+# checked by pid. The worker processes of the pools write no file: the values recorded by their
+# tasks are sent back to the parent with the results, see `pool_map`.
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+# Seconds between two writes of the values of a process to its file
+FLUSH_INTERVAL = 1.0
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# File of STOCKS_METRICS_DIR summing the values of the processes which exited
+EXITED_FILE = 'exited.json'
+
+# Registered metrics, by name
+METRICS = {}
+
+# Values of the process: {(name, label values): value} for counters, and
+# {(name, label values): [bucket counts..., sum]} for histograms
+_values = {}
+_lock = threading.Lock()
+# Name of the file of the process: pid and a random token, so a reused pid never overwrites the
+# values of a former process
+_process_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+_last_flush = 0.0
+# Whether the process is a worker of a pool, see `pool_task`
+_pool_worker = False
+
+
+class Metric:
+    """
+    A metric: its name, help text, kind ('counter' or 'histogram') and label names.
+    """
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        METRICS[name] = self
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric '{self.name}' takes the labels {', '.join(self.labelnames)}.")
+        return self.name, tuple(str(labels[label]) for label in self.labelnames)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """
+        Adds `amount` to the counter of the given labels.
+        """
+        key = self._key(labels)
+        with _lock:
+            _values[key] = _values.get(key, 0) + amount
+        maybe_flush()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        """
+        Counts a value in the first bucket it fits in, and adds it to the sum of the given labels.
+        """
+        key = self._key(labels)
+        index = next(index for index, bound in enumerate(self.buckets) if value <= bound)
+        with _lock:
+            counts = _values.get(key)
+            if counts is None:
+                counts = _values[key] = [0] * len(self.buckets) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+        maybe_flush()
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observes the duration in seconds of the `with` block, also when it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+REQUESTS = Counter('stocks_http_requests_total', 'HTTP requests served, by route, method and status.', ('route', 'method', 'status'))
+REQUEST_DURATION = Histogram('stocks_http_request_duration_seconds', 'Time to build the HTTP responses, by route.', ('route',))
+RESPONSE_BYTES = Counter('stocks_http_response_bytes_total', 'Bytes of the HTTP response bodies served, by route.', ('route',))
+DB_QUERIES = Counter('stocks_db_queries_total', 'SQL queries run by the HTTP requests, by route.', ('route',))
+DB_QUERY_SECONDS = Counter('stocks_db_query_seconds_total', 'Time spent in the SQL queries of the HTTP requests, by route.', ('route',))
+STAGE_DURATION = Histogram('stocks_stage_duration_seconds', 'Time spent in the stages of the requests and jobs, by stage.', ('stage',))
+
+
+def stage(name):
+    """
+    Times the `with` block as a stage of STAGE_DURATION, such as 'upstream_fetch' or 'pdf_assembly'.
+    """
+    return STAGE_DURATION.time(stage=name)
+
+
+def snapshot():
+    """
+    Returns the values of the process as a JSON-serializable list of [name, label values, value] entries.
+    """
+    with _lock:
+        return [[name, list(label_values), list(value) if isinstance(value, list) else value] for (name, label_values), value in _values.items()]
+
+
+def _metrics_dir():
+    return settings.STOCKS_METRICS_DIR
+
+
+def flush():
+    """
+    Writes the values of the process to its file of STOCKS_METRICS_DIR, when set.
+    """
+    global _last_flush
+    metrics_dir = _metrics_dir()
+    _last_flush = time.monotonic()
+    if not metrics_dir or _pool_worker:
+        return
+
+    os.makedirs(metrics_dir, exist_ok=True)
+    path = os.path.join(metrics_dir, f'{_process_id}.json')
+    # Write then rename so the view never reads a partial file
+    temporary_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(temporary_path, 'w') as file:
+        json.dump(snapshot(), file)
+    os.replace(temporary_path, path)
+
+
+def maybe_flush():
+    # Writes the values of the process when the last write is older than FLUSH_INTERVAL
+    if time.monotonic() - _last_flush >= FLUSH_INTERVAL and _metrics_dir():
+        flush()
+
+
+atexit.register(lambda: _metrics_dir() and flush())
+
+
+def collect():
+    """
+    Returns the values of every process: summed over the files of STOCKS_METRICS_DIR when set,
+    after writing those of the current process, or those of the current process otherwise.
+    """
+    metrics_dir = _metrics_dir()
+    if not metrics_dir:
+        return _sum([snapshot()])
+    flush()
+    _fold_exited(metrics_dir)
+    return _sum(_read_snapshots(metrics_dir, os.listdir(metrics_dir)))
+
+
+def _read_snapshots(metrics_dir, files):
+    snapshots = []
+    for file in files:
+        if file.endswith('.json'):
+            try:
+                with open(os.path.join(metrics_dir, file)) as snapshot_file:
+                    snapshots.append(json.load(snapshot_file))
+            except (OSError, ValueError):
+                continue  # removed since listed
+    return snapshots
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # a process of another user
+    return True
+
+
+def _fold_exited(metrics_dir):
+    # Adds the files of the exited processes to EXITED_FILE and removes them, holding a lock so
+    # concurrent scrapes never fold a file twice
+    with open(os.path.join(metrics_dir, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        exited = []
+        for file in os.listdir(metrics_dir):
+            pid = file.partition('-')[0]
+            if file.endswith('.json') and file != EXITED_FILE and pid.isdigit() and not _alive(int(pid)):
+                exited.append(file)
+        if not exited:
+            return
+
+        totals = _sum(_read_snapshots(metrics_dir, [EXITED_FILE, *exited]))
+        path = os.path.join(metrics_dir, EXITED_FILE)
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump([[name, list(label_values), value] for (name, label_values), value in totals.items()], file)
+        os.replace(f'{path}.tmp', path)
+        for file in exited:
+            os.remove(os.path.join(metrics_dir, file))
+
+
+def _sum(snapshots):
+    # Sums the entries of `snapshot` lists into {(name, label values): value}
+    totals = {}
+    for entries in snapshots:
+        for name, label_values, value in entries:
+            key = name, tuple(label_values)
+            if key not in totals:
+                totals[key] = value
+            elif isinstance(value, list):
+                totals[key] = [total + count for total, count in zip(totals[key], value)]
+            else:
+                totals[key] += value
+    return totals
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return '+Inf' if value == math.inf else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics(totals=None):
+    """
+    Renders the metrics of `collect` in the Prometheus text exposition format.
+    """
+    totals = collect() if totals is None else totals
+    lines = []
+    for name, metric in METRICS.items():
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for (metric_name, label_values), value in sorted(totals.items()):
+            if metric_name != name:
+                continue
+            if metric.kind == 'counter':
+                lines.append(f'{name}{_format_labels(metric.labelnames, label_values)} {_format_value(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets, value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(metric.labelnames, label_values, [('le', _format_value(float(bound)))])} {cumulative}")
+            lines.append(f'{name}_sum{_format_labels(metric.labelnames, label_values)} {_format_value(float(value[-1]))}')
+            lines.append(f'{name}_count{_format_labels(metric.labelnames, label_values)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def merge(entries):
+    """
+    Adds the values of a `snapshot`, such as one recorded by a pool task, to those of the process.
+    """
+    with _lock:
+        for name, label_values, value in entries:
+            key = name, tuple(label_values)
+            if key not in _values:
+                _values[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                _values[key] = [total + count for total, count in zip(_values[key], value)]
+            else:
+                _values[key] += value
+    maybe_flush()
+
+
+def pool_task(function, *args):
+    """
+    Runs `function(*args)` in a worker process of a pool, and returns the tuple (result, snapshot
+    of the values recorded by the call). The process writes no file of its own: pool workers exit
+    without running atexit, and a file per worker would pile up in STOCKS_METRICS_DIR.
+    """
+    global _pool_worker
+    _pool_worker = True
+    reset()
+    result = function(*args)
+    return result, snapshot()
+
+
+def pool_map(executor, function, *iterables, chunksize=1):
+    """
+    Returns the list of the results of `executor.map(function, *iterables)`, adding the values
+    recorded by the tasks in the worker processes to those of the current process.
+    """
+    results = []
+    for result, entries in executor.map(partial(pool_task, function), *iterables, chunksize=chunksize):
+        merge(entries)
+        results.append(result)
+    return results
+
+
+def reset():
+    """
+    Clears the values of the process. The files of the other processes are left untouched.
+    """
+    with _lock:
+        _values.clear()
+
+
+def _after_fork():
+    # A forked worker process starts with no values and its own file
+    global _process_id, _last_flush
+    _values.clear()
+    _process_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+    _last_flush = 0.0
+
+
+os.register_at_fork(after_in_child=_after_fork)
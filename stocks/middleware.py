@@ -0,0 +1,145 @@
+# stocks/middleware.py
+import re
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from .metrics import DB_QUERIES, DB_QUERY_SECONDS, REQUEST_DURATION, REQUESTS, RESPONSE_BYTES
+from .profiling import PROFILE_HEADER, PROFILE_ID_HEADER, profile_call, valid_token
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting the SQL queries of a request and the time spent in them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def route_name(request):
+    """
+    Returns the route label of a request: the name of its URL pattern, or 'unmatched'.
+    """
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None and match.view_name else 'unmatched'
+
+
+async def _count_bytes_async(chunks, route):
+    # The same, for the bodies of the async streaming responses
+    sent = 0
+    try:
+        async for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        RESPONSE_BYTES.inc(sent, route=route)
+
+
+def _count_bytes(chunks, route):
+    # Passes a streamed body through, counting its bytes once it is sent
+    sent = 0
+    try:
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        RESPONSE_BYTES.inc(sent, route=route)
+
+
+class MetricsMiddleware:
+    """
+    Records the metrics of every request, see `metrics`: its count by route, method and status,
+    its duration, the bytes of its response body, and the number and time of its SQL queries.
+
+    The duration covers the building of the response; the bytes of streamed responses, such as
+    the report downloads, are counted while they are sent.
+
+    The middleware runs in both modes, so under ASGI the async views, such as `fetch_many`, are
+    not moved to a worker thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        queries = QueryRecorder()
+        start = time.perf_counter()
+        with self._recording(queries):
+            response = self.get_response(request)
+        return self._record(request, response, time.perf_counter() - start, queries)
+
+    async def __acall__(self, request):
+        queries = QueryRecorder()
+        start = time.perf_counter()
+        with self._recording(queries):
+            response = await self.get_response(request)
+        return self._record(request, response, time.perf_counter() - start, queries)
+
+    def _recording(self, queries):
+        # Installs the query recorder on every database connection
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(queries))
+        return stack
+
+    def _record(self, request, response, elapsed, queries):
+        route = route_name(request)
+        REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        REQUEST_DURATION.observe(elapsed, route=route)
+        DB_QUERIES.inc(queries.count, route=route)
+        DB_QUERY_SECONDS.inc(queries.seconds, route=route)
+        if response.streaming:
+            count_bytes = _count_bytes_async if getattr(response, 'is_async', False) else _count_bytes
+            response.streaming_content = count_bytes(response.streaming_content, route)
+        else:
+            RESPONSE_BYTES.inc(len(response.content), route=route)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests carrying the X-Stocks-Profile header, see `profiling.profile_call`.
+
+    The header is honored for staff users whatever its value, and for other clients when it holds
+    a token of the `profile_token` command. The response names the written profile in its
+    X-Stocks-Profile-Id header.
+
+    The middleware is only installed with settings.STOCKS_PROFILING, so it costs nothing when
+    profiling is disabled, and a header lookup per request otherwise. It must come after
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        if not settings.STOCKS_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        value = request.headers.get(PROFILE_HEADER)
+        if not value or not (getattr(request, 'user', None) and request.user.is_staff or valid_token(value)):
+            return self.get_response(request)
+
+        label = re.sub(r'[^A-Za-z0-9_-]', '_', request.path.strip('/').split('/')[0]) or 'root'
+        response, profile_id = profile_call(lambda: self.get_response(request), label)
+        if profile_id is not None:
+            response[PROFILE_ID_HEADER] = profile_id
+        return response
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0003_stockdata_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockdata',
+            index=models.Index(fields=['symbol', 'date'], include=('close_price',), name='stockdata_symbol_date_close'),
+        ),
+        migrations.AddIndex(
+            model_name='stockdata',
+            index=models.Index(fields=['symbol', '-date'], include=('close_price',), name='stockdata_symbol_latest'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0004_stockdata_range_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StrategyState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=10)),
+                ('strategy', models.CharField(max_length=50)),
+                ('params', models.JSONField(default=dict)),
+                ('params_key', models.CharField(max_length=200)),
+                ('last_date', models.DateField(null=True)),
+                ('last_close', models.FloatField(null=True)),
+                ('bars', models.IntegerField(default=0)),
+                ('window', models.JSONField(default=list)),
+                ('ma_short_total', models.FloatField(default=0.0)),
+                ('ma_long_total', models.FloatField(default=0.0)),
+                ('cash', models.FloatField(default=0.0)),
+                ('shares', models.FloatField(default=0.0)),
+                ('peak_value', models.FloatField(default=0.0)),
+                ('max_drawdown', models.FloatField(default=0.0)),
+                ('total_trades', models.IntegerField(default=0)),
+                ('previous', models.JSONField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('symbol', 'strategy', 'params_key')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StrategyEquity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('value', models.FloatField()),
+                ('state', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='equity', to='stocks.strategystate')),
+            ],
+            options={
+                'unique_together': {('state', 'date')},
+            },
+        ),
+    ]
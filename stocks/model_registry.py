@@ -0,0 +1,193 @@
+# stocks/model_registry.py
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+from django.conf import settings
+
+# Directory of the model artifacts shipped with the package, the default of settings.STOCKS_MODEL_DIR
+MODEL_DIR = os.path.join(os.path.dirname(__file__), 'ML_models')
+DEFAULT_MODEL = 'linear_regression_model_Stocks'
+# Version given to an unversioned artifact stored as <name>.pkl
+DEFAULT_VERSION = 'default'
+# Model names and versions, which come from request parameters and must stay inside the model directory
+ARTIFACT_NAME = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+
+def version_key(version):
+    """
+    Sort key of the model versions: their runs of digits compare as numbers, so 'v2' comes before
+    'v10', and the timestamps of `training.save_model` sort in training order.
+    """
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', version)]
+
+
+class ModelNotFoundError(FileNotFoundError):
+    pass
+
+
+class InvalidModelError(ValueError):
+    pass
+
+
+class ModelEntry:
+    """
+    A loaded model artifact with the file state it was loaded from.
+    """
+
+    def __init__(self, name, version, path, model, metadata, mtime_ns, size):
+        self.name = name
+        self.version = version
+        self.path = path
+        self.model = model
+        self.metadata = metadata
+        self.mtime_ns = mtime_ns
+        self.size = size
+
+
+class ModelRegistry:
+    """
+    Loads model artifacts once per process and keeps them in a memory-bounded LRU cache.
+
+    Artifacts are resolved inside `model_dir`:
+    - <name>/<version>.pkl for versioned artifacts, the latest version being the last one in the
+      order of `version_key`.
+    - <name>.pkl for an unversioned artifact, which gets the version 'default'.
+    An optional <artifact>.json file next to an artifact holds its metadata.
+
+    Entries are keyed by (name, version) and evicted least recently used first once the size of the
+    cached artifacts goes over `max_bytes`. With `hot_reload`, an artifact whose file changed on
+    disk is loaded again on its next use.
+    """
+
+    def __init__(self, model_dir=None, max_bytes=None, hot_reload=None):
+        self.model_dir = settings.STOCKS_MODEL_DIR if model_dir is None else model_dir
+        self.max_bytes = settings.STOCKS_MODEL_CACHE_BYTES if max_bytes is None else max_bytes
+        self.hot_reload = settings.STOCKS_MODEL_HOT_RELOAD if hot_reload is None else hot_reload
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def versions(self, name):
+        """
+        Returns the list of the available versions of a model, sorted by `version_key`.
+        """
+        versions = []
+        version_dir = os.path.join(self.model_dir, name)
+        if os.path.isdir(version_dir):
+            versions = sorted((file[:-4] for file in os.listdir(version_dir) if file.endswith('.pkl')), key=version_key)
+        if os.path.isfile(os.path.join(self.model_dir, f'{name}.pkl')):
+            versions.insert(0, DEFAULT_VERSION)
+        return versions
+
+    def resolve(self, name, version=None):
+        """
+        Returns the (version, path) of a model artifact, the latest version when `version` is None.
+
+        Names and versions are letters, digits, '_', '-' and '.', without '..': other values,
+        such as paths leading outside `model_dir`, raise ModelNotFoundError.
+        """
+        self._check_name('model', name)
+        if version is not None:
+            self._check_name('version', version)
+        if version is None:
+            versions = self.versions(name)
+            if not versions:
+                raise ModelNotFoundError(f"No artifact found for model '{name}'.")
+            version = versions[-1]
+
+        if version == DEFAULT_VERSION:
+            path = os.path.join(self.model_dir, f'{name}.pkl')
+        else:
+            path = os.path.join(self.model_dir, name, f'{version}.pkl')
+        if os.path.commonpath([os.path.realpath(path), os.path.realpath(self.model_dir)]) != os.path.realpath(self.model_dir):
+            raise ModelNotFoundError(f"No artifact found for model '{name}' version '{version}'.")
+        if not os.path.isfile(path):
+            raise ModelNotFoundError(f"No artifact found for model '{name}' version '{version}'.")
+        return version, path
+
+    def _check_name(self, kind, value):
+        if not isinstance(value, str) or not ARTIFACT_NAME.match(value) or '..' in value:
+            raise ModelNotFoundError(f"Invalid {kind} name '{value}'.")
+
+    def get(self, name=DEFAULT_MODEL, version=None):
+        """
+        Returns the ModelEntry of a model, loading it on first use or when its file changed.
+        """
+        version, path = self.resolve(name, version)
+        key = (name, version)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self.hot_reload or self._file_state(path) == (entry.mtime_ns, entry.size):
+                    self._entries.move_to_end(key)
+                    return entry
+
+            entry = self._load(name, version, path)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _file_state(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, name, version, path):
+        mtime_ns, size = self._file_state(path)
+        import joblib  # imported by the first model loaded
+
+        try:
+            model = joblib.load(path)
+        except Exception as load_err:
+            raise InvalidModelError(f"Error loading model '{name}' version '{version}': {load_err}")
+
+        metadata = {}
+        if os.path.isfile(f'{path}.json'):
+            with open(f'{path}.json', 'r') as file:
+                metadata = json.load(file)
+
+        self._validate(name, version, model, metadata)
+        return ModelEntry(name, version, path, model, metadata, mtime_ns, size)
+
+    def _validate(self, name, version, model, metadata):
+        if not callable(getattr(model, 'predict', None)):
+            raise InvalidModelError(f"Model '{name}' version '{version}' has no predict method.")
+
+        n_features = getattr(model, 'n_features_in_', metadata.get('n_features', 1))
+        if metadata.get('n_features', n_features) != n_features:
+            raise InvalidModelError(f"Model '{name}' version '{version}' does not match its metadata.")
+
+        # A single prediction must give one finite value
+        prediction = np.asarray(model.predict(np.zeros((1, n_features))))
+        if prediction.shape != (1,) or not np.all(np.isfinite(prediction)):
+            raise InvalidModelError(f"Model '{name}' version '{version}' gives an invalid prediction.")
+
+    def _evict(self):
+        total = sum(entry.size for entry in self._entries.values())
+        # The most recently used entry is always kept
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.size
+
+
+_registry = None
+
+
+def get_registry():
+    """
+    Returns the model registry shared by the process.
+    """
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
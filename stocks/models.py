@@ -14,3 +14,85 @@ class StockData(models.Model):
 
     class Meta:
         unique_together = ('symbol', 'date')
+        indexes = [
+            # Ordered per-symbol range scans of the closes, answered from the index alone on PostgreSQL
+            models.Index(fields=['symbol', 'date'], include=['close_price'], name='stockdata_symbol_date_close'),
+            # Latest N days of a symbol
+            models.Index(fields=['symbol', '-date'], include=['close_price'], name='stockdata_symbol_latest'),
+        ]
+
+
+class DataVersion(models.Model):
+    """
+    Version of the stored rows of a stock symbol, incremented by every ingestion writing rows of it.
+    """
+    symbol = models.CharField(max_length=10, unique=True)
+    version = models.BigIntegerField(default=0)
+
+
+class StrategyState(models.Model):
+    """
+    Running state of a strategy on one stock symbol, advanced one day at a time as rows are ingested.
+    """
+    symbol = models.CharField(max_length=10)
+    strategy = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    params_key = models.CharField(max_length=200)  # canonical JSON of params, part of the unique key
+    last_date = models.DateField(null=True)
+    last_close = models.FloatField(null=True)
+    bars = models.IntegerField(default=0)
+    window = models.JSONField(default=list)  # trailing closes needed to roll the moving averages
+    ma_short_total = models.FloatField(default=0.0)
+    ma_long_total = models.FloatField(default=0.0)
+    cash = models.FloatField(default=0.0)
+    shares = models.FloatField(default=0.0)
+    peak_value = models.FloatField(default=0.0)
+    max_drawdown = models.FloatField(default=0.0)
+    total_trades = models.IntegerField(default=0)
+    previous = models.JSONField(null=True)  # state before the last day, to apply a correction of that day
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('symbol', 'strategy', 'params_key')
+
+
+class StrategyEquity(models.Model):
+    """
+    Portfolio value of a strategy state at the close of one day.
+    """
+    state = models.ForeignKey(StrategyState, on_delete=models.CASCADE, related_name='equity')
+    date = models.DateField()
+    value = models.FloatField()
+
+    class Meta:
+        unique_together = ('state', 'date')
+
+
+class ReportJob(models.Model):
+    """
+    Report generation job, processed by the report workers (see `report_jobs`).
+
+    Jobs are deduplicated by `key`, a hash of the symbol, parameters and data version of the report.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    key = models.CharField(max_length=64, unique=True)
+    symbol = models.CharField(max_length=10)
+    initial_investment = models.IntegerField()
+    params = models.JSONField(default=dict)  # start, end and strategy of the backtest
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    artifact = models.CharField(max_length=64, blank=True)  # digest of the PDF in the artifact store
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            # Oldest queued jobs first
+            models.Index(fields=['status', 'created_at'], name='reportjob_status_created'),
+        ]
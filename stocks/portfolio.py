@@ -0,0 +1,148 @@
+# stocks/portfolio.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+import numpy as np
+from .backtest_engine import run_backtest
+from .metrics import pool_map
+from .prices import load_close_prices_many, load_universe
+
+
+def parse_weights(symbols, weights=None):
+    """
+    Validates and normalizes the capital weights of a portfolio.
+
+    Inputs:
+    - symbols: List of stock symbols in the portfolio.
+    - weights: Optional list of weights, one per symbol (default: equal weights).
+
+    Outputs:
+    - Returns a NumPy array of weights summing to 1.
+
+    Raises ValueError when the weights do not match the symbols or are not positive.
+    """
+    if not symbols:
+        raise ValueError('At least one symbol is required.')
+    if len(set(symbols)) != len(symbols):
+        raise ValueError('Each symbol can only appear once.')
+
+    if weights is None:
+        return np.full(len(symbols), 1.0 / len(symbols))
+
+    weights = np.asarray(weights, dtype=np.float64)
+    if len(weights) != len(symbols):
+        raise ValueError('The number of weights must match the number of symbols.')
+    if np.any(weights <= 0):
+        raise ValueError('The weights must be positive.')
+
+    return weights / weights.sum()
+
+
+def run_backtests(closes_list, investments, max_workers=None):
+    """
+    Runs one backtest per price series, fanned out across worker processes.
+
+    Inputs:
+    - closes_list: List of 1-D NumPy arrays of closing prices.
+    - investments: List of initial investments, one per price series.
+    - max_workers: Number of worker processes (default: settings.STOCKS_BACKTEST_WORKERS,
+      0 meaning one per CPU).
+
+    Outputs:
+    - Returns the list of `run_backtest` results, in the order of `closes_list`.
+
+    The workers only receive price arrays and run the database-free engine, so they never
+    open their own database connection.
+    """
+    max_workers = max_workers or settings.STOCKS_BACKTEST_WORKERS or os.cpu_count() or 1
+    max_workers = min(max_workers, len(closes_list))
+
+    if max_workers <= 1:
+        return [run_backtest(closes, investment) for closes, investment in zip(closes_list, investments)]
+
+    chunksize = max(1, len(closes_list) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return pool_map(executor, run_backtest, closes_list, investments, chunksize=chunksize)
+
+
+def compute_portfolio_backtest(symbols=None, initial_investment=10000, weights=None, max_workers=None, start=None, end=None):
+    """
+    Computes the moving average backtest of a portfolio of stock symbols.
+
+    Inputs:
+    - symbols: List of stock symbols (default: every symbol stored in the StockData table).
+    - initial_investment: The total amount of money invested across the portfolio (default: 10000).
+    - weights: Optional list of capital weights, one per symbol (default: equal weights).
+    - max_workers: Number of worker processes used to run the backtests.
+    - start: Optional first date of the backtest (inclusive).
+    - end: Optional last date of the backtest (inclusive).
+
+    Outputs:
+    - Returns a dictionary containing:
+      - 'compute_data': The total return, maximum drawdown, total number of trades and portfolio
+        values of the combined portfolio.
+      - 'dates': The dates of the combined portfolio values.
+      - 'contributions': For each symbol, its weight, allocated capital, final value, total return,
+        maximum drawdown, number of trades and contribution to the portfolio return (in percent).
+      - 'missing_symbols': The requested symbols without data; their capital stays in cash.
+    - Returns a dictionary with an 'error' key when none of the symbols has data.
+
+    Each symbol is allocated its share of the capital and backtested on its own history. Before its
+    first day of data a symbol's allocation is held in cash, and after its last day its value is
+    carried forward, so the portfolio curve is defined on the union of all trading days.
+    """
+    if symbols is None:
+        symbols = load_universe()
+    weights = parse_weights(symbols, weights)
+    allocations = weights * initial_investment
+
+    prices = load_close_prices_many(symbols, start, end)
+    held = [i for i, symbol in enumerate(symbols) if symbol in prices]
+    if not held:
+        return {
+            'error': 'No data available for the specified symbols.'
+        }
+
+    results = run_backtests(
+        [prices[symbols[i]][1] for i in held],
+        [allocations[i] for i in held],
+        max_workers,
+    )
+
+    # Align every symbol on the union of the trading days
+    symbol_dates = {i: np.array(prices[symbols[i]][0], dtype='datetime64[D]') for i in held}
+    all_dates = np.unique(np.concatenate(list(symbol_dates.values())))
+
+    portfolio_values = np.full(len(all_dates), allocations.sum() - allocations[held].sum())
+    contributions = {}
+    for i, result in zip(held, results):
+        position = np.searchsorted(symbol_dates[i], all_dates, side='right') - 1
+        values = result['portfolio_values']
+        portfolio_values += np.where(position >= 0, values[np.maximum(position, 0)], allocations[i])
+
+        final_value = float(values[-1])
+        contributions[symbols[i]] = {
+            'weight': float(weights[i]),
+            'allocation': float(allocations[i]),
+            'final_value': final_value,
+            'total_return': float(result['total_return']),
+            'Max_Drawdown': float(result['Max_Drawdown']),
+            'total_trades': int(result['total_trades']),
+            'contribution': float((final_value - allocations[i]) / initial_investment * 100),
+        }
+
+    peak_values = np.maximum.accumulate(portfolio_values)
+    max_drawdown = float(np.max((peak_values - portfolio_values) / peak_values))
+    total_return = (portfolio_values[-1] - initial_investment) / initial_investment * 100
+
+    return {
+        'compute_data': {
+            'total_return': float(total_return),
+            'Max_Drawdown': max_drawdown,
+            'total_trades': sum(contribution['total_trades'] for contribution in contributions.values()),
+            'portfolio_values': portfolio_values.tolist(),
+        },
+        'dates': [str(date) for date in all_dates],
+        'contributions': contributions,
+        'missing_symbols': [symbol for symbol in symbols if symbol not in prices],
+    }
@@ -1,87 +1,198 @@
+import logging
 import numpy as np
-import pandas as pd
-import pickle
 import requests
-import os
-from django.http import JsonResponse
+from datetime import date
 from django.conf import settings
+from .ingestion import ingest_time_series
+from .market_data import get_client
+from .model_registry import DEFAULT_MODEL, get_registry
+from .prices import latest_dates, load_recent_closes
+from .training import RETURN_MODEL, first_row, latest_features
 
-def predict_stock_prices(symbol):
-    try:
-        # Build the API URL
-        base_url = settings.ALPHA_VANTAGE_BASE_URL
-        function = settings.ALPHA_VANTAGE_FUNCTION
-        api_key = settings.ALPHA_VANTAGE_API_KEY
-        output_size = settings.ALPHA_VANTAGE_OUTPUTSIZE
-
-        url = f'{base_url}?function={function}&symbol={symbol}&apikey={api_key}&outputsize={output_size}'
-        
-        # Make the API request
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        
-        # Fetch the time series data
-        data = response.json().get('Time Series (Daily)', {})
-
-        # Check if data is empty
-        if not data:
-            return JsonResponse({'error': 'No time series data available for the given symbol.'}, status=404)
-
-        # Create a DataFrame from the fetched data
-        df = pd.DataFrame.from_dict(data, orient='index')
-
-        # Rename the columns to remove the prefixes
-        df.rename(columns={
-            '1. open': 'open_price',
-            '2. high': 'high_price',
-            '3. low': 'low_price',
-            '4. close': 'close_price',
-            '5. volume': 'volume'
-        }, inplace=True)
-
-        # Reset the index to use 'date' as a column
-        df.index.name = 'date'
-        df.reset_index(inplace=True)
-
-        # Convert columns to appropriate data types
-        df['open_price'] = df['open_price'].astype(float)
-        df['high_price'] = df['high_price'].astype(float)
-        df['low_price'] = df['low_price'].astype(float)
-        df['close_price'] = df['close_price'].astype(float)
-        df['volume'] = df['volume'].astype(float)
-
-        # Ensure the 'date' column is in datetime format
-        df['date'] = pd.to_datetime(df['date'])
-
-        # Sort the DataFrame by date
-        df = df.sort_values('date')
-
-        # Select only the 'date' and 'close_price' columns
-        filtered_df = df[['date', 'close_price']]
-        
-        # Get the last 30 rows
-        last_30_rows_df = filtered_df.tail(30)
-
-        # Reshape the close prices for future predictions
-        future_X = last_30_rows_df['close_price'].values.reshape(-1, 1)
-
-        # Load the model
-        model_file_path = os.path.join(os.path.dirname(__file__), 'ML_model', 'linear_regression_model.pkl')
-        
+# Number of trailing closes fed to the model
+PREDICTION_WINDOW = 30
+# Maximum number of business days forecast
+MAX_HORIZON = 260
+# Maximum number of symbols predicted or forecast together, each possibly fetched from Alpha Vantage
+MAX_SYMBOLS = 50
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_symbol(symbol):
+    """
+    Fetches the daily time series of a stock symbol from Alpha Vantage and ingests the new days.
+
+    Inputs:
+    - symbol: The stock symbol to refresh.
+
+    Outputs:
+    - Returns the counts of `ingest_time_series`.
+    """
+    data = get_client().get_daily_time_series(symbol)
+    return ingest_time_series(data, symbol)
+
+
+def refresh_stale_symbols(symbols, max_age_days=None):
+    """
+    Refreshes the symbols whose latest stored day is older than `max_age_days`.
+
+    Inputs:
+    - symbols: List of stock symbols.
+    - max_age_days: Maximum age in calendar days of the latest stored day (default: settings.STOCKS_PREDICTION_MAX_AGE_DAYS).
+
+    Outputs:
+    - Returns a tuple (refreshed, failed) of the lists of the stale symbols whose refresh succeeded
+      and failed. A failed refresh is logged and does not stop the refresh of the other symbols.
+    """
+    max_age_days = settings.STOCKS_PREDICTION_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    stored_dates = latest_dates(symbols)
+
+    stale_symbols = [
+        symbol for symbol in symbols
+        if symbol not in stored_dates or (date.today() - stored_dates[symbol]).days > max_age_days
+    ]
+    refreshed, failed = [], []
+    for symbol in stale_symbols:
         try:
-            with open(model_file_path, 'rb') as file:
-                loaded_model = pickle.load(file)
-        except FileNotFoundError:
-            raise FileNotFoundError("Model file not found.")
-        except pickle.UnpicklingError:
-            raise ValueError("Error unpickling the model file.")
-
-        # Make predictions
-        future_predictions = loaded_model.predict(future_X)
-
-        return future_predictions  # Return the predictions here
-
-    except requests.exceptions.RequestException as e:
-        return JsonResponse({'error': str(e)}, status=500)
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+            refresh_symbol(symbol)
+        except requests.exceptions.RequestException:
+            logger.warning('Error refreshing %s from Alpha Vantage', symbol, exc_info=True)
+            failed.append(symbol)
+        else:
+            refreshed.append(symbol)
+    return refreshed, failed
+
+
+def check_symbol_count(symbols):
+    # Bounds the work, and the Alpha Vantage requests, of a single call
+    if len(symbols) > MAX_SYMBOLS:
+        raise ValueError(f'At most {MAX_SYMBOLS} symbols can be requested together.')
+
+
+def predict_many(symbols, model_name=DEFAULT_MODEL, version=None, refresh=True):
+    """
+    Predicts the next closing price of several stock symbols from each of their last 30 closes.
+
+    Inputs:
+    - symbols: List of stock symbols to predict.
+    - model_name: Name of the model artifact in the model registry (default: DEFAULT_MODEL).
+    - version: Version of the model artifact (default: the latest version).
+    - refresh: Whether stale symbols are fetched from Alpha Vantage first (default: True).
+
+    Outputs:
+    - Returns a dictionary mapping each symbol to a (dates, predictions) tuple, where predictions
+      holds one predicted close per input close of the given dates.
+
+    The closes are read from the StockData table, and the inputs of every symbol are stacked to
+    run a single `predict` call. Raises LookupError when a symbol has no data or could not be
+    refreshed, and ValueError for more than MAX_SYMBOLS symbols.
+    """
+    check_symbol_count(symbols)
+    failed = refresh_stale_symbols(symbols)[1] if refresh else []
+
+    if failed:
+        raise LookupError(f"Could not refresh {', '.join(failed)} from Alpha Vantage.")
+    recent_closes = load_recent_closes(symbols, PREDICTION_WINDOW)
+    missing_symbols = [symbol for symbol in symbols if symbol not in recent_closes]
+    if missing_symbols:
+        raise LookupError(f"No time series data available for {', '.join(missing_symbols)}.")
+
+    # Get the model, loaded once per process by the registry
+    loaded_model = get_registry().get(model_name, version).model
+
+    # One row per close, every symbol in the same batch
+    future_X = np.concatenate([recent_closes[symbol][1] for symbol in symbols]).reshape(-1, 1)
+    future_predictions = loaded_model.predict(future_X)
+
+    predictions, start = {}, 0
+    for symbol in symbols:
+        dates, closes = recent_closes[symbol]
+        predictions[symbol] = (dates, future_predictions[start:start + len(closes)])
+        start += len(closes)
+    return predictions
+
+
+def predict_stock_prices(symbol, model_name=DEFAULT_MODEL, version=None):
+    """
+    Predicts the next closing price of a stock symbol from each of its last 30 closes.
+
+    Inputs:
+    - symbol: The stock symbol to predict.
+    - model_name: Name of the model artifact in the model registry (default: DEFAULT_MODEL).
+    - version: Version of the model artifact (default: the latest version).
+
+    Outputs:
+    - Returns a NumPy array with one predicted close per input close.
+
+    Raises LookupError when no time series data is available for the symbol or it could not be
+    refreshed, and the errors of the model registry otherwise.
+    """
+    dates, future_predictions = predict_many([symbol], model_name, version)[symbol]
+    return future_predictions
+
+
+def forecast_many(symbols, horizon=5, model_name=RETURN_MODEL, version=None, refresh=True):
+    """
+    Forecasts the closing prices of several stock symbols over the next `horizon` business days.
+
+    Inputs:
+    - symbols: List of stock symbols to forecast.
+    - horizon: Number of business days forecast after the last stored day of each symbol.
+    - model_name: Name of the model artifact in the model registry (default: RETURN_MODEL).
+    - version: Version of the model artifact (default: the latest version).
+    - refresh: Whether stale symbols are fetched from Alpha Vantage first (default: True).
+
+    Outputs:
+    - Returns a dictionary containing:
+      - 'model', 'version': The name and the resolved version of the model.
+      - 'horizon': The number of business days forecast.
+      - 'forecasts': Maps each symbol to a dictionary of its 'last_date' and 'last_close', and
+        the 'dates' and 'predictions' of the forecast.
+      - 'missing_symbols': The symbols without enough stored closes, or whose refresh from Alpha
+        Vantage failed.
+
+    Forecasts are recursive: each predicted close is appended to the trailing closes to predict
+    the next one. Every step is one batched call for all the symbols: a return model of
+    `train_models` predicts the next log return from the features of the trailing closes, and a
+    model without feature specification, such as DEFAULT_MODEL, the next close from the last one.
+    """
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f'The horizon must be between 1 and {MAX_HORIZON} days.')
+    check_symbol_count(symbols)
+    failed = refresh_stale_symbols(symbols)[1] if refresh else []
+
+    entry = get_registry().get(model_name, version)
+    features = getattr(entry.model, 'features', None)
+    window = first_row(features) + 1 if features else 1
+
+    recent_closes = load_recent_closes(symbols, window)
+    held = [symbol for symbol in symbols if symbol in recent_closes and len(recent_closes[symbol][1]) == window and symbol not in failed]
+    missing_symbols = [symbol for symbol in symbols if symbol not in held]
+    result = {'model': model_name, 'version': entry.version, 'horizon': horizon, 'forecasts': {}, 'missing_symbols': missing_symbols}
+    if not held:
+        return result
+
+    # One row of trailing closes per symbol, extended by one column per step
+    closes = np.empty((len(held), window + horizon))
+    closes[:, :window] = np.vstack([recent_closes[symbol][1] for symbol in held])
+    for step in range(window, window + horizon):
+        if features:
+            returns = entry.model.predict(latest_features(closes[:, step - window:step], features), held)
+            closes[:, step] = closes[:, step - 1] * np.exp(returns)
+        else:
+            closes[:, step] = entry.model.predict(closes[:, step - 1:step])
+
+    last_dates = np.array([recent_closes[symbol][0][-1] for symbol in held], dtype='datetime64[D]')
+    dates = np.busday_offset(last_dates[:, None], np.arange(1, horizon + 1), roll='forward')
+
+    result['forecasts'] = {
+        symbol: {
+            'last_date': str(last_dates[index]),
+            'last_close': float(closes[index, window - 1]),
+            'dates': dates[index].astype(str).tolist(),
+            'predictions': closes[index, window:].tolist(),
+        }
+        for index, symbol in enumerate(held)
+    }
+    return result
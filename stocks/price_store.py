@@ -0,0 +1,173 @@
+# stocks/price_store.py
+import os
+import re
+import threading
+import numpy as np
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from .models import StockData
+
+# Columns of a symbol file, one contiguous row each
+COLUMNS = ('date', 'open', 'high', 'low', 'close', 'volume')
+FIELDS = ('date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume')
+
+SYMBOL_PATTERN = re.compile(r'^[A-Za-z0-9.^=-]{1,10}$')
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+class PriceSeries:
+    """
+    Daily prices of a stock symbol read from the columnar store.
+
+    Every column is a read-only view of the memory-mapped file, ordered by date, so nothing is
+    copied until a column is used. `dates` is the date column as a datetime64[D] array.
+    """
+
+    def __init__(self, symbol, columns):
+        self.symbol = symbol
+        self.columns = columns
+
+    def __len__(self):
+        return self.columns.shape[1]
+
+    @property
+    def date(self):
+        return self.columns[0]
+
+    @property
+    def open(self):
+        return self.columns[1]
+
+    @property
+    def high(self):
+        return self.columns[2]
+
+    @property
+    def low(self):
+        return self.columns[3]
+
+    @property
+    def close(self):
+        return self.columns[4]
+
+    @property
+    def volume(self):
+        return self.columns[5]
+
+    @property
+    def dates(self):
+        return EPOCH + self.date.astype(np.int64)
+
+    def between(self, start=None, end=None):
+        """
+        Returns the series restricted to the dates from `start` to `end`, both included, as views.
+        """
+        lo = 0 if start is None else np.searchsorted(self.date, (np.datetime64(start, 'D') - EPOCH).astype(np.float64), side='left')
+        hi = len(self) if end is None else np.searchsorted(self.date, (np.datetime64(end, 'D') - EPOCH).astype(np.float64), side='right')
+        return PriceSeries(self.symbol, self.columns[:, lo:hi])
+
+
+class PriceStore:
+    """
+    Columnar copy of the StockData table, with one NumPy file per symbol.
+
+    A symbol file <symbol>.npy holds a float64 array of shape (6, days): the date (as days since
+    1970-01-01), open, high, low, close and volume columns, each one contiguous and ordered by date.
+    Files are opened with memory mapping, so repeated reads only cost page cache accesses, and are
+    replaced atomically when a symbol is written again.
+    """
+
+    def __init__(self, store_dir=None):
+        self.store_dir = str(store_dir or settings.STOCKS_PRICE_STORE_DIR)
+        self._lock = threading.Lock()
+
+    def path(self, symbol):
+        if not SYMBOL_PATTERN.match(symbol):
+            raise ValueError(f"Invalid stock symbol '{symbol}'.")
+        return os.path.join(self.store_dir, f'{symbol}.npy')
+
+    def symbols(self):
+        """
+        Returns the sorted list of the symbols in the store.
+        """
+        if not os.path.isdir(self.store_dir):
+            return []
+        return sorted(file[:-4] for file in os.listdir(self.store_dir) if file.endswith('.npy'))
+
+    def read(self, symbol):
+        """
+        Returns the PriceSeries of a symbol, or None when the symbol is not in the store.
+        """
+        if not SYMBOL_PATTERN.match(symbol):
+            return None
+        try:
+            columns = np.load(self.path(symbol), mmap_mode='r')
+        except FileNotFoundError:
+            return None
+        return PriceSeries(symbol, columns)
+
+    def write(self, symbol, rows):
+        """
+        Replaces the file of a symbol with rows of (date, open, high, low, close, volume), ordered by date.
+        """
+        rows = list(rows)
+        columns = np.empty((len(COLUMNS), len(rows)), dtype=np.float64)
+        if rows:
+            dates, *prices = zip(*rows)
+            columns[0] = (np.array(dates, dtype='datetime64[D]') - EPOCH).astype(np.float64)
+            columns[1:] = prices
+
+        path = self.path(symbol)
+        os.makedirs(self.store_dir, exist_ok=True)
+        # Write then rename so memory-mapped readers keep the old file until they reopen it
+        temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'wb') as file:
+            np.save(file, columns)
+        os.replace(temporary_path, path)
+
+    def sync(self, symbol):
+        """
+        Writes the file of a symbol from its StockData rows, removing it when the symbol has none.
+        """
+        rows = StockData.objects.filter(symbol=symbol).order_by('date').values_list(*FIELDS)
+        with self._lock:
+            if rows:
+                self.write(symbol, rows)
+            else:
+                self.delete(symbol)
+
+    def delete(self, symbol):
+        try:
+            os.remove(self.path(symbol))
+        except FileNotFoundError:
+            pass
+
+
+_store = None
+
+
+def get_store():
+    """
+    Returns the price store shared by the process.
+    """
+    global _store
+    if _store is None:
+        _store = PriceStore()
+    return _store
+
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    # Tests overriding the store directory get a store built from it
+    global _store
+    if setting == 'STOCKS_PRICE_STORE_DIR':
+        _store = None
+
+
+def columnar_backend():
+    """
+    Returns True when the closing prices are read from the columnar store (settings.STOCKS_PRICE_BACKEND).
+    """
+    return settings.STOCKS_PRICE_BACKEND == 'columnar'
@@ -0,0 +1,249 @@
+# stocks/prices.py
+from datetime import date
+import numpy as np
+from django.db import connection
+from django.db.models import Max
+from .models import StockData
+from .price_store import columnar_backend, get_store
+
+# Read side of the StockData table. Every function selects only the columns it returns, as tuples
+# or NumPy arrays, so that the per-symbol reads are served by the (symbol, date) covering indexes
+# without building model instances. With settings.STOCKS_PRICE_BACKEND = 'columnar', the closing
+# prices are read from the memory-mapped files of `price_store` instead, and symbols missing from
+# the store fall back to the table. Both backends return the dates as datetime64[D] arrays.
+
+
+def _date_array(dates):
+    return np.array(dates, dtype='datetime64[D]')
+
+
+def parse_date(value):
+    """
+    Returns the datetime.date of an ISO 'YYYY-MM-DD' string, or None for an empty value.
+    """
+    if not value:
+        return None
+    return date.fromisoformat(value)
+
+
+def _date_range(queryset, start=None, end=None):
+    # Both bounds are inclusive
+    if start is not None:
+        queryset = queryset.filter(date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(date__lte=end)
+    return queryset
+
+
+def load_close_prices(symbol, start=None, end=None):
+    """
+    Loads the closing prices of a stock symbol with a single query.
+
+    Inputs:
+    - symbol: The stock symbol to load.
+    - start: Optional first date loaded (inclusive).
+    - end: Optional last date loaded (inclusive).
+
+    Outputs:
+    - Returns a tuple (dates, closes) where dates is a datetime64[D] NumPy array and closes is a
+      contiguous float64 NumPy array, both ordered by date. From the columnar store, closes is a
+      read-only view of the memory-mapped file.
+    """
+    if columnar_backend():
+        series = get_store().read(symbol)
+        if series is not None:
+            series = series.between(start, end)
+            return series.dates, series.close
+
+    rows = _date_range(StockData.objects.filter(symbol=symbol), start, end).order_by('date').values_list('date', 'close_price')
+    if not rows:
+        return _date_array([]), np.empty(0, dtype=np.float64)
+
+    dates, closes = zip(*rows)
+    return _date_array(dates), np.ascontiguousarray(closes, dtype=np.float64)
+
+
+def load_close_prices_many(symbols, start=None, end=None):
+    """
+    Loads the closing prices of several stock symbols with a single query.
+
+    Inputs:
+    - symbols: Iterable of stock symbols to load.
+    - start: Optional first date loaded (inclusive).
+    - end: Optional last date loaded (inclusive).
+
+    Outputs:
+    - Returns a dictionary mapping each symbol with data to a (dates, closes) tuple, as returned
+      by `load_close_prices`. Symbols without data are left out.
+    """
+    symbols = list(symbols)
+    stored_prices = {}
+    if columnar_backend():
+        store, missing_symbols = get_store(), []
+        for symbol in symbols:
+            series = store.read(symbol)
+            if series is None:
+                missing_symbols.append(symbol)
+                continue
+            series = series.between(start, end)
+            if len(series):
+                stored_prices[symbol] = (series.dates, series.close)
+        symbols = missing_symbols
+        if not symbols:
+            return stored_prices
+
+    queryset = _date_range(StockData.objects.filter(symbol__in=symbols), start, end)
+    rows = queryset.order_by('symbol', 'date').values_list('symbol', 'date', 'close_price')
+
+    prices = {}
+    for symbol, day, close_price in rows:
+        dates, closes = prices.setdefault(symbol, ([], []))
+        dates.append(day)
+        closes.append(close_price)
+
+    return {
+        **stored_prices,
+        **{symbol: (_date_array(dates), np.ascontiguousarray(closes, dtype=np.float64)) for symbol, (dates, closes) in prices.items()},
+    }
+
+
+# Price columns and the StockData fields they are read from
+PRICE_FIELDS = {
+    'open': 'open_price',
+    'high': 'high_price',
+    'low': 'low_price',
+    'close': 'close_price',
+    'volume': 'volume',
+}
+
+
+def load_prices_many(symbols, columns=('close',), start=None, end=None):
+    """
+    Loads price columns of several stock symbols with a single query.
+
+    Inputs:
+    - symbols: Iterable of stock symbols to load.
+    - columns: Names of the columns to load, among 'open', 'high', 'low', 'close' and 'volume'.
+    - start: Optional first date loaded (inclusive).
+    - end: Optional last date loaded (inclusive).
+
+    Outputs:
+    - Returns a dictionary mapping each symbol with data to a (dates, prices) tuple, where dates is
+      a datetime64[D] NumPy array and prices maps each column to a float64 NumPy array, ordered by
+      date. Symbols without data are left out.
+    """
+    unknown = set(columns) - set(PRICE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown price columns: {', '.join(sorted(unknown))}.")
+
+    symbols = list(symbols)
+    stored_prices = {}
+    if columnar_backend():
+        store, missing_symbols = get_store(), []
+        for symbol in symbols:
+            series = store.read(symbol)
+            if series is None:
+                missing_symbols.append(symbol)
+                continue
+            series = series.between(start, end)
+            if len(series):
+                stored_prices[symbol] = (series.dates, {column: getattr(series, column) for column in columns})
+        symbols = missing_symbols
+        if not symbols:
+            return stored_prices
+
+    queryset = _date_range(StockData.objects.filter(symbol__in=symbols), start, end)
+    rows = queryset.order_by('symbol', 'date').values_list('symbol', 'date', *(PRICE_FIELDS[column] for column in columns))
+
+    grouped = {}
+    for symbol, day, *values in rows:
+        dates, symbol_rows = grouped.setdefault(symbol, ([], []))
+        dates.append(day)
+        symbol_rows.append(values)
+
+    for symbol, (dates, symbol_rows) in grouped.items():
+        table = np.array(symbol_rows, dtype=np.float64).reshape(len(symbol_rows), len(columns))
+        stored_prices[symbol] = (_date_array(dates), {column: np.ascontiguousarray(table[:, i]) for i, column in enumerate(columns)})
+    return stored_prices
+
+
+def load_prices(symbol, columns=('close',), start=None, end=None):
+    """
+    Loads price columns of a stock symbol, see `load_prices_many`.
+
+    Outputs:
+    - Returns a (dates, prices) tuple, with no dates and empty columns when the symbol has no data.
+    """
+    loaded = load_prices_many([symbol], columns, start, end)
+    if symbol not in loaded:
+        return _date_array([]), {column: np.empty(0, dtype=np.float64) for column in columns}
+    return loaded[symbol]
+
+
+def load_recent_closes(symbols, count):
+    """
+    Loads the trailing closing prices of several stock symbols with a single query.
+
+    Inputs:
+    - symbols: List of stock symbols.
+    - count: Number of trailing closes per symbol.
+
+    Outputs:
+    - Returns a dictionary mapping each symbol with data to a (dates, closes) tuple ordered by date,
+      dates being a datetime64[D] NumPy array and closes a float64 NumPy array. Symbols without data
+      are left out.
+
+    Each symbol is read with `ORDER BY date DESC LIMIT count`, answered by the (symbol, -date)
+    index without scanning the older rows of the symbol. The reads are sent as a single UNION ALL
+    query where the database allows LIMIT in compound statements (PostgreSQL), and one after the
+    other otherwise (SQLite).
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols or count < 1:
+        return {}
+
+    recent = [
+        StockData.objects.filter(symbol=symbol).order_by('-date').values_list('symbol', 'date', 'close_price')[:count]
+        for symbol in symbols
+    ]
+    if len(recent) == 1:
+        rows = recent[0]
+    elif connection.features.supports_slicing_ordering_in_compound:
+        rows = recent[0].union(*recent[1:], all=True)
+    else:
+        rows = [row for queryset in recent for row in queryset]
+
+    closes = {}
+    for symbol, day, close_price in rows:
+        dates, values = closes.setdefault(symbol, ([], []))
+        dates.append(day)
+        values.append(close_price)
+
+    # The rows come newest first within each symbol
+    return {
+        symbol: (_date_array(dates[::-1]), np.asarray(values[::-1], dtype=np.float64))
+        for symbol, (dates, values) in closes.items()
+    }
+
+
+def latest_date(symbol):
+    """
+    Returns the latest date stored for a stock symbol, or None when it has no data.
+    """
+    return StockData.objects.filter(symbol=symbol).aggregate(latest=Max('date'))['latest']
+
+
+def latest_dates(symbols):
+    """
+    Returns a dictionary mapping each stored symbol of `symbols` to its latest date.
+    """
+    return dict(
+        StockData.objects.filter(symbol__in=symbols).values('symbol').annotate(latest=Max('date')).values_list('symbol', 'latest')
+    )
+
+
+def load_universe():
+    """
+    Returns the sorted list of every stock symbol stored in the StockData table.
+    """
+    return list(StockData.objects.order_by('symbol').values_list('symbol', flat=True).distinct())
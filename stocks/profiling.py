@@ -0,0 +1,192 @@
+# stocks/profiling.py
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+from django.conf import settings
+from django.core import signing
+
+# On-demand profiling of single requests, see `middleware.ProfilingMiddleware`: a request is run
+# under cProfile and tracemalloc while a sampler thread records its call stacks, and the results
+# are written to STOCKS_PROFILE_DIR.
+
+# Header requesting the profile of a request: any value for staff users, a token of
+# `profile_token` otherwise
+PROFILE_HEADER = 'X-Stocks-Profile'
+# Response header naming the written profile
+PROFILE_ID_HEADER = 'X-Stocks-Profile-Id'
+
+SIGNING_SALT = 'stocks.profiling'
+
+# Seconds between two samples of the call stack
+SAMPLE_INTERVAL = 0.001
+
+# Number of functions and allocation sites listed in the summary
+TOP_ENTRIES = 30
+
+logger = logging.getLogger(__name__)
+
+# tracemalloc traces the whole process: it is started by the first of the overlapping profiles and
+# stopped by the last one, unless it was already tracing before them
+_tracing_lock = threading.Lock()
+_active_profiles = 0
+_started_tracing = False
+
+
+def _start_tracing():
+    global _active_profiles, _started_tracing
+    with _tracing_lock:
+        if _active_profiles == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _active_profiles += 1
+
+
+def _stop_tracing():
+    global _active_profiles, _started_tracing
+    with _tracing_lock:
+        _active_profiles -= 1
+        if _active_profiles == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def profile_token():
+    """
+    Returns a signed token allowing its bearer to profile requests, valid for
+    settings.STOCKS_PROFILE_TOKEN_MAX_AGE seconds.
+    """
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign('profile')
+
+
+def valid_token(token):
+    """
+    Returns whether a token was made by `profile_token` with this SECRET_KEY and has not expired.
+    """
+    try:
+        return signing.TimestampSigner(salt=SIGNING_SALT).unsign(token, max_age=settings.STOCKS_PROFILE_TOKEN_MAX_AGE) == 'profile'
+    except signing.BadSignature:
+        return False
+
+
+class StackSampler:
+    """
+    Thread sampling the call stack of another thread every `interval` seconds.
+
+    `stacks` counts the samples of each stack, as a tuple of 'module:function:line' frames from
+    the outermost call.
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}:{code.co_firstlineno}")
+                frame = frame.f_back
+            stack = tuple(reversed(stack))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def collapsed(self):
+        """
+        Returns the samples in the collapsed stack format of flamegraph.pl and speedscope:
+        one 'frame;frame;frame count' line per stack.
+        """
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+def profile_call(function, label='request', profile_dir=None):
+    """
+    Runs `function` under cProfile, tracemalloc and a `StackSampler`, and writes the results.
+
+    Inputs:
+    - function: The callable profiled, called without arguments.
+    - label: Part of the name of the profile, such as the route of the request.
+    - profile_dir: The directory of the profiles (default: settings.STOCKS_PROFILE_DIR).
+
+    Outputs:
+    - Returns a tuple (result, profile_id): the return value of `function` and the name of the
+      profile, or None when the profile could not be written, the error being logged. The files
+      of the profile in `profile_dir` are:
+      - '<profile_id>.prof': The cProfile statistics, readable by `pstats` or snakeviz.
+      - '<profile_id>.collapsed': The sampled call stacks, for flamegraph.pl or speedscope.
+      - '<profile_id>.txt': The wall time, the functions with the highest cumulative time, and
+        the lines that allocated the most memory still held at the end of the call.
+
+    Only the calling thread is profiled: work handed to other threads or processes is not seen.
+    The allocations and peak memory cover the whole process, so they include those of the
+    requests profiled at the same time.
+    """
+    profile_dir = str(profile_dir or settings.STOCKS_PROFILE_DIR)
+    profile_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}"
+
+    profiler = cProfile.Profile()
+    _start_tracing()
+    start = time.perf_counter()
+    try:
+        with StackSampler(threading.get_ident()) as sampler:
+            profiler.enable()
+            try:
+                result = function()
+            finally:
+                profiler.disable()
+        elapsed = time.perf_counter() - start
+        try:
+            allocations = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ])
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        except Exception:
+            logger.exception('Error taking the memory snapshot of the profile %s', profile_id)
+            return result, None
+    finally:
+        _stop_tracing()
+
+    try:
+        _write_profile(profile_dir, profile_id, profiler, sampler, elapsed, allocations, peak_bytes)
+    except Exception:
+        logger.exception('Error writing the profile %s', profile_id)
+        return result, None
+    return result, profile_id
+
+
+def _write_profile(profile_dir, profile_id, profiler, sampler, elapsed, allocations, peak_bytes):
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, profile_id)
+    profiler.dump_stats(f'{path}.prof')
+    with open(f'{path}.collapsed', 'w') as collapsed_file:
+        collapsed_file.write(sampler.collapsed())
+
+    functions = io.StringIO()
+    pstats.Stats(profiler, stream=functions).sort_stats('cumulative').print_stats(TOP_ENTRIES)
+    with open(f'{path}.txt', 'w') as summary_file:
+        summary_file.write(f'Profile {profile_id}\nWall time: {elapsed:.4f}s\nPeak traced memory: {peak_bytes} bytes\n\n')
+        summary_file.write(f'Top {TOP_ENTRIES} allocation sites (memory held at the end):\n')
+        for statistic in allocations.statistics('lineno')[:TOP_ENTRIES]:
+            summary_file.write(f'{statistic}\n')
+        summary_file.write(f'\nTop {TOP_ENTRIES} functions by cumulative time:\n')
+        summary_file.write(functions.getvalue())
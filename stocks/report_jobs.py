@@ -0,0 +1,224 @@
+# stocks/report_jobs.py
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .artifacts import get_artifact_store
+from .models import ReportJob
+from .prices import parse_date
+from .result_cache import cached_backtest, data_version, result_key
+from .strategies import DEFAULT_STRATEGY, get_strategy
+
+# Report generation runs outside the request: a request submits a ReportJob row, and workers claim
+# queued jobs from the table, render the PDF and store it in the artifact store. The table is the
+# queue, so no broker is needed, and workers may run as threads of the web processes (see
+# `ReportWorkerPool`) or as separate `run_report_worker` processes.
+
+
+def submit_report(symbol='AAPL', initial_investment=1000, start=None, end=None, strategies=((DEFAULT_STRATEGY, None),)):
+    """
+    Submits the report of a backtest, reusing the job of an identical report.
+
+    Inputs:
+    - symbol, initial_investment, start, end: The arguments of `compute_backtest`.
+    - strategies: List holding the single (name, params) pair of the strategy of the report.
+
+    Outputs:
+    - Returns a tuple (job, queued), queued being True when the report has to be rendered.
+
+    Jobs are identified by the symbol, parameters and data version of the report: submitting a
+    report already queued, running or done returns that job, so a burst of identical requests
+    renders it once, and new data for the symbol gives a new job. Failed jobs, and done jobs whose
+    artifact was removed, are queued again.
+    """
+    if len(strategies) != 1:
+        raise ValueError('A report covers a single strategy.')
+    name, params = strategies[0]
+    params = {
+        'start': start.isoformat() if start else None,
+        'end': end.isoformat() if end else None,
+        'strategy': name,
+        'strategy_params': get_strategy(name).resolve_params(params),
+    }
+    key = result_key('report', symbol, data_version(symbol), initial_investment=initial_investment, **params)
+
+    job, queued = ReportJob.objects.get_or_create(
+        key=key,
+        defaults={'symbol': symbol, 'initial_investment': initial_investment, 'params': params},
+    )
+    if job.status == ReportJob.FAILED or (job.status == ReportJob.DONE and not get_artifact_store().exists(job.artifact)):
+        queued = bool(
+            ReportJob.objects.filter(pk=job.pk, status=job.status)
+            .update(status=ReportJob.QUEUED, artifact='', error='', created_at=timezone.now(), started_at=None, finished_at=None)
+        )
+        job.refresh_from_db()
+
+    if queued:
+        transaction.on_commit(wake_workers)
+    return job, queued
+
+
+def claim_next_job():
+    """
+    Marks the oldest queued job as running and returns it, or returns None when there is none.
+
+    Running jobs started more than settings.STOCKS_REPORT_JOB_TIMEOUT seconds ago are considered
+    lost by a stopped worker and can be claimed again.
+    """
+    now = timezone.now()
+    lost_before = now - timedelta(seconds=settings.STOCKS_REPORT_JOB_TIMEOUT)
+    claimable = ReportJob.objects.filter(Q(status=ReportJob.QUEUED) | Q(status=ReportJob.RUNNING, started_at__lt=lost_before))
+
+    for job in claimable.order_by('created_at')[:10]:
+        # Conditional update on the status read, so each job is claimed by a single worker
+        claimed = ReportJob.objects.filter(pk=job.pk, status=job.status, started_at=job.started_at).update(
+            status=ReportJob.RUNNING, started_at=now,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_report_job(job):
+    """
+    Renders the report of a claimed job into the artifact store and records the outcome.
+    """
+    from .reports import build_backtest_report  # ReportLab and Matplotlib load with the first job
+
+    try:
+        strategies = [(job.params['strategy'], job.params['strategy_params'])]
+        backtest_result = json.loads(cached_backtest(
+            job.symbol, job.initial_investment, parse_date(job.params['start']), parse_date(job.params['end']), strategies,
+        ))
+        job.artifact = get_artifact_store().put(build_backtest_report(job.symbol, backtest_result))
+        job.status = ReportJob.DONE
+    except Exception as err:
+        job.error = str(err)
+        job.status = ReportJob.FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'artifact', 'error', 'finished_at'])
+    return job
+
+
+def process_report_jobs(limit=None):
+    """
+    Runs queued jobs until the queue is empty, or `limit` jobs were run, and returns their number.
+    """
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_report_job(job)
+        processed += 1
+    return processed
+
+
+def purge_report_jobs(days):
+    """
+    Deletes the jobs finished more than `days` days ago and the artifacts no job refers to.
+
+    Outputs:
+    - Returns a tuple (jobs, artifacts) with the number of deleted jobs and artifacts.
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted_jobs, _ = ReportJob.objects.filter(status__in=[ReportJob.DONE, ReportJob.FAILED], finished_at__lt=cutoff).delete()
+
+    store = get_artifact_store()
+    unreferenced = store.digests() - set(ReportJob.objects.exclude(artifact='').values_list('artifact', flat=True))
+    for digest in unreferenced:
+        store.delete(digest)
+    return deleted_jobs, len(unreferenced)
+
+
+class ReportWorkerPool:
+    """
+    Threads of the web process running the queued report jobs.
+
+    `wake` is called when a job is queued. It schedules a pass over the queue unless one is already
+    scheduled and not yet started, which will then see the new job, so a burst of submissions
+    schedules at most one pass per worker. The pool also wakes when it starts, and then every
+    `poll_interval` seconds, to run the jobs queued by other processes or before a restart, and
+    those left running by a stopped worker once they time out.
+    """
+
+    def __init__(self, workers, poll_interval=0):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report-worker')
+        self._lock = threading.Lock()
+        self._scheduled = 0
+        self._stopped = threading.Event()
+        self.wake()
+        if poll_interval > 0:
+            threading.Thread(target=self._poll, args=(poll_interval,), name='report-poller', daemon=True).start()
+
+    def _poll(self, poll_interval):
+        while not self._stopped.wait(poll_interval):
+            self.wake()
+
+    def stop(self):
+        """
+        Stops the polling and waits for the scheduled passes to finish.
+        """
+        self._stopped.set()
+        self.executor.shutdown()
+
+    def wake(self):
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled += 1
+        self.executor.submit(self._run)
+
+    def _run(self):
+        with self._lock:
+            self._scheduled -= 1
+        try:
+            process_report_jobs()
+        finally:
+            connections.close_all()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """
+    Returns the report worker pool of the process, or None when settings.STOCKS_REPORT_WORKERS is 0.
+    """
+    global _pool
+    if settings.STOCKS_REPORT_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ReportWorkerPool(settings.STOCKS_REPORT_WORKERS, settings.STOCKS_REPORT_POLL_INTERVAL)
+    return _pool
+
+
+def wake_workers():
+    pool = get_worker_pool()
+    if pool is not None:
+        pool.wake()
+
+
+def report_job_payload(job):
+    """
+    Returns the JSON-serializable status of a report job.
+    """
+    return {
+        'id': job.pk,
+        'symbol': job.symbol,
+        'initial_investment': job.initial_investment,
+        'params': job.params,
+        'status': job.status,
+        'error': job.error or None,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'artifact': job.artifact or None,
+    }
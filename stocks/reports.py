@@ -0,0 +1,99 @@
+# stocks/reports.py
+from io import BytesIO
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+from .charts import render_chart
+from .metrics import stage
+
+# Rendering of the backtest report PDF. The charts are drawn by `charts.render_chart`, which has
+# no global state, so reports can be rendered concurrently by the report workers.
+
+
+# Style of the metric tables
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+
+
+def portfolio_chart(symbol, portfolio_values):
+    """
+    Returns the PNG bytes of the portfolio value plot.
+    """
+    return render_chart('portfolio', portfolio_values, f'Backtest Performance for {symbol}')
+
+
+def stock_chart(symbol, dates, closes):
+    """
+    Returns the PNG bytes of the closing price plot, with about 20 date labels.
+    """
+    return render_chart('stock', closes, f'Stock Data for {symbol}', x_labels=dates)
+
+
+def draw_backtest_page(pdf_canvas, symbol, compute_data, portfolio_png, stock_png):
+    """
+    Draws the report page of a backtest: its two charts and the table of its metrics.
+
+    Inputs:
+    - pdf_canvas: The ReportLab canvas, on its current page.
+    - symbol: The stock symbol of the backtest.
+    - compute_data: The total return, maximum drawdown and number of trades of the backtest.
+    - portfolio_png, stock_png: The PNG bytes of `portfolio_chart` and `stock_chart`.
+    """
+    # Draw portfolio value plot
+    pdf_canvas.drawImage(ImageReader(BytesIO(portfolio_png)), 50, 500, width=500, height=200)
+
+    # Draw stock data plot
+    pdf_canvas.drawString(50, 220, f'Stock Data for {symbol}')
+    pdf_canvas.drawImage(ImageReader(BytesIO(stock_png)), 50, 250, width=500, height=200)
+
+    # Draw table of metrics
+    data = [['Metric', 'Value'],
+            ['Total Return', f"{compute_data['total_return']:.2f}%"],
+            ['Max Drawdown', f"{compute_data['Max_Drawdown'] * 100:.2f}%"],
+            ['Total Trades', compute_data['total_trades']]]
+    table = Table(data, colWidths=[200, 200])
+    table.setStyle(TABLE_STYLE)
+    table.wrapOn(pdf_canvas, 50, 200)
+    table.drawOn(pdf_canvas, 50, 100)
+
+
+def build_backtest_report(symbol, backtest_result):
+    """
+    Renders the PDF report of a backtest.
+
+    Inputs:
+    - symbol: The stock symbol of the backtest.
+    - backtest_result: The dictionary returned by `compute_backtest`.
+
+    Outputs:
+    - Returns the PDF document as bytes, including:
+      - Portfolio performance plot.
+      - Stock data plot.
+      - Summary table of metrics (total return, max drawdown, total trades).
+
+    The document is rendered in ReportLab's invariant mode, without creation date or random
+    identifier, so the same backtest always gives the same bytes.
+    """
+    compute_data = backtest_result['compute_data']
+    stock_data = backtest_result.get('stock_data', [])
+
+    portfolio_png = portfolio_chart(symbol, compute_data['portfolio_values'])
+    stock_png = stock_chart(symbol, [entry['date'] for entry in stock_data], [entry['close_price'] for entry in stock_data])
+
+    with stage('pdf_assembly'):
+        pdf_buf = BytesIO()
+        pdf_canvas = canvas.Canvas(pdf_buf, pagesize=letter, invariant=True)
+        draw_backtest_page(pdf_canvas, symbol, compute_data, portfolio_png, stock_png)
+
+        # Finalize PDF
+        pdf_canvas.save()
+    return pdf_buf.getvalue()
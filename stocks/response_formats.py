@@ -0,0 +1,205 @@
+# stocks/response_formats.py
+import json
+from io import BytesIO
+import numpy as np
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+from .charts import downsample_minmax
+
+# Response formats of the backtest results:
+# - 'records': The result as computed, 'stock_data' being a list of {'date', 'close_price'} dictionaries.
+# - 'columnar': The same document with 'stock_data' as parallel 'date' and 'close_price' arrays.
+# - 'npy': A NumPy structured array of the date, close price and portfolio value columns, the
+#   other fields of the result being sent as JSON in the 'X-Backtest-Summary' header.
+FORMATS = ('records', 'columnar', 'npy')
+NPY_CONTENT_TYPE = 'application/x-npy'
+
+# Query parameters of the response formats
+FORMAT_QUERY_PARAMS = {'format', 'points', 'precision', 'stream'}
+
+STREAM_CHUNK_SIZE = 64 * 1024  # bytes
+STREAM_LIST_SLICE = 1000  # list items encoded at once when streaming
+
+
+def parse_format_options(query, accept=''):
+    """
+    Returns the response options of a backtest request, raising ValueError when invalid.
+
+    Inputs:
+    - query: The query parameters, which may contain:
+      - format: 'records', 'columnar' or 'npy' (default: 'npy' when `accept` asks for
+        NPY_CONTENT_TYPE, 'records' otherwise).
+      - points: Maximum number of days of the series, downsampled when longer.
+      - precision: Number of decimals of the prices and portfolio values.
+      - stream: '1' to stream the JSON document.
+    - accept: The Accept header of the request.
+
+    Outputs:
+    - Returns a dictionary of the 'response_format', 'points', 'precision' and 'stream' options.
+    """
+    response_format = query.get('format') or ('npy' if NPY_CONTENT_TYPE in accept else 'records')
+    if response_format not in FORMATS:
+        raise ValueError(f"Unknown format '{response_format}', expected one of {', '.join(FORMATS)}.")
+
+    points = int(query['points']) if query.get('points') else None
+    if points is not None and points < 2:
+        raise ValueError('The number of points must be at least 2.')
+    precision = int(query['precision']) if query.get('precision') else None
+    if precision is not None and precision < 0:
+        raise ValueError('The precision must be positive.')
+
+    stream = query.get('stream', '0') == '1'
+    if stream and response_format == 'npy':
+        raise ValueError('Only the JSON formats can be streamed.')
+
+    return {'response_format': response_format, 'points': points, 'precision': precision, 'stream': stream}
+
+
+def select_points(series, points):
+    """
+    Returns the sorted indices of at most `points` days keeping the shape of every series, or None to keep all days.
+
+    Each series keeps the first, last, minimum and maximum days of its buckets, see `charts.downsample_minmax`.
+    With fewer than 4 points per series, the days kept are then thinned out evenly, keeping the
+    first and last days.
+    """
+    if points is None or len(series[0]) <= points:
+        return None
+    buckets = max(1, points // (4 * len(series)))
+    kept = np.unique(np.concatenate([downsample_minmax(values, buckets) for values in series]))
+    if len(kept) > points:
+        kept = kept[np.unique(np.linspace(0, len(kept) - 1, points).round().astype(np.int64))]
+    return kept
+
+
+def backtest_series(result, points=None, precision=None):
+    """
+    Returns the series of a backtest result, downsampled and rounded.
+
+    Inputs:
+    - result: The dictionary returned by `compute_backtest` or `compute_backtests`.
+    - points, precision: The options of `parse_format_options`.
+
+    Outputs:
+    - Returns a tuple (dates, closes, curves): the list of the dates, and the float64 arrays of the
+      closes and of the portfolio values of each strategy.
+    """
+    stock_data = result.get('stock_data', [])
+    dates = [entry['date'] for entry in stock_data]
+    closes = np.array([entry['close_price'] for entry in stock_data], dtype=np.float64)
+    entries = result['strategies'] if 'strategies' in result else [result]
+    curves = [np.asarray(entry['compute_data']['portfolio_values'], dtype=np.float64) for entry in entries]
+
+    kept = select_points([closes, *curves], points)
+    if kept is not None:
+        dates = [dates[index] for index in kept]
+        closes = closes[kept]
+        curves = [values[kept] for values in curves]
+    if precision is not None:
+        closes = np.round(closes, precision)
+        curves = [np.round(values, precision) for values in curves]
+    return dates, closes, curves
+
+
+def _with_series(result, stock_data, curves):
+    # The result with its portfolio values and stock data replaced
+    def with_curve(entry, values):
+        return {**entry, 'compute_data': {**entry['compute_data'], 'portfolio_values': values}}
+
+    if 'strategies' in result:
+        payload = {**result, 'strategies': [with_curve(entry, values) for entry, values in zip(result['strategies'], curves)]}
+    else:
+        payload = with_curve(result, curves[0])
+    payload['stock_data'] = stock_data
+    return payload
+
+
+def json_payload(result, response_format='records', points=None, precision=None):
+    """
+    Returns the JSON document of a backtest result in the 'records' or 'columnar' format.
+    """
+    dates, closes, curves = backtest_series(result, points, precision)
+    curves = [values.tolist() for values in curves]
+    if response_format == 'columnar':
+        return _with_series(result, {'date': dates, 'close_price': closes.tolist()}, curves)
+    return _with_series(result, [{'date': day, 'close_price': close} for day, close in zip(dates, closes.tolist())], curves)
+
+
+def npy_content(result, points=None, precision=None):
+    """
+    Returns a tuple (content, summary): the .npy bytes of the series of a backtest result and the
+    JSON-serializable result without its series.
+
+    The structured array has the fields 'date' (datetime64[D]), 'close_price' and 'portfolio_value',
+    or one 'portfolio_value_<strategy>' field per strategy for several strategies.
+    """
+    dates, closes, curves = backtest_series(result, points, precision)
+    if 'strategies' in result:
+        names = [f"portfolio_value_{entry['strategy']}" for entry in result['strategies']]
+    else:
+        names = ['portfolio_value']
+
+    table = np.empty(len(dates), dtype=[('date', 'datetime64[D]'), ('close_price', np.float64)] + [(name, np.float64) for name in names])
+    table['date'] = np.asarray(dates, dtype='datetime64[D]')
+    table['close_price'] = closes
+    for name, values in zip(names, curves):
+        table[name] = values
+
+    buffer = BytesIO()
+    np.save(buffer, table, allow_pickle=False)
+    # The result without its series
+    summary = _with_series(result, None, [None] * len(curves))
+    del summary['stock_data']
+    for entry in summary.get('strategies', [summary]):
+        del entry['compute_data']['portfolio_values']
+    return buffer.getvalue(), summary
+
+
+def iter_json(value):
+    """
+    Encodes a JSON document piece by piece, long lists being encoded a slice at a time.
+    """
+    if isinstance(value, dict):
+        yield '{'
+        for index, (key, item) in enumerate(value.items()):
+            yield (', ' if index else '') + json.dumps(str(key)) + ': '
+            yield from iter_json(item)
+        yield '}'
+    elif isinstance(value, list) and len(value) > STREAM_LIST_SLICE:
+        yield '['
+        for first in range(0, len(value), STREAM_LIST_SLICE):
+            yield (', ' if first else '') + json.dumps(value[first:first + STREAM_LIST_SLICE], cls=DjangoJSONEncoder)[1:-1]
+        yield ']'
+    else:
+        yield json.dumps(value, cls=DjangoJSONEncoder)
+
+
+def stream_json(value, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yields the JSON encoding of a document as byte chunks of about `chunk_size` bytes.
+    """
+    pieces, size = [], 0
+    for piece in iter_json(value):
+        pieces.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield ''.join(pieces).encode()
+            pieces, size = [], 0
+    if pieces:
+        yield ''.join(pieces).encode()
+
+
+def backtest_response(result, response_format='records', points=None, precision=None, stream=False):
+    """
+    Returns the HTTP response of a backtest result in the requested format, see `parse_format_options`.
+    """
+    if response_format == 'npy':
+        content, summary = npy_content(result, points, precision)
+        response = HttpResponse(content, content_type=NPY_CONTENT_TYPE)
+        response['X-Backtest-Summary'] = json.dumps(summary, cls=DjangoJSONEncoder)
+        return response
+
+    payload = json_payload(result, response_format, points, precision)
+    if stream:
+        return StreamingHttpResponse(stream_json(payload), content_type='application/json')
+    return HttpResponse(json.dumps(payload, cls=DjangoJSONEncoder), content_type='application/json')
@@ -0,0 +1,88 @@
+# stocks/result_cache.py
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .controller import compute_backtest, compute_backtests
+from .models import DataVersion
+from .strategies import DEFAULT_STRATEGY, get_strategy
+
+# Backtest results are cached per (symbol, parameters, data version). The data version of a symbol
+# is a counter of the DataVersion table incremented by the ingestion whenever it writes rows of
+# the symbol, so every worker process sees the same version, results computed from older data are
+# never read again and simply expire, and report jobs are deduplicated across processes.
+
+
+def get_cache():
+    return caches[settings.STOCKS_RESULT_CACHE]
+
+
+def data_version(symbol):
+    """
+    Returns the current data version of a stock symbol, 0 when no rows of it were ingested.
+    """
+    return DataVersion.objects.filter(symbol=symbol).values_list('version', flat=True).first() or 0
+
+
+def bump_data_version(symbol):
+    """
+    Increments the data version of a stock symbol, invalidating its cached results. Called in a
+    transaction, the new version is visible to the other processes once it commits.
+    """
+    if DataVersion.objects.filter(symbol=symbol).update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            DataVersion.objects.create(symbol=symbol, version=1)
+    except IntegrityError:
+        # Created by a concurrent ingestion
+        DataVersion.objects.filter(symbol=symbol).update(version=F('version') + 1)
+
+
+def result_key(kind, symbol, version, **params):
+    """
+    Returns the cache key of a result, hashing its parameters so any symbol or value is a valid key.
+    """
+    payload = json.dumps([kind, symbol, version, params], sort_keys=True, cls=DjangoJSONEncoder)
+    return f'stocks:{kind}:{hashlib.sha256(payload.encode()).hexdigest()}'
+
+
+def cached_backtest(symbol='AAPL', initial_investment=1000, start=None, end=None, strategies=((DEFAULT_STRATEGY, None),)):
+    """
+    Returns the backtest of a stock symbol from the result cache, computing it on a miss.
+
+    Inputs:
+    - symbol, initial_investment, start, end: The arguments of `compute_backtest`.
+    - strategies: List of (name, params) pairs of the strategies to run (default: the moving average strategy).
+
+    Outputs:
+    - Returns the JSON encoding of the dictionary returned by `compute_backtest` for a single
+      strategy, or by `compute_backtests` for several. Only these bytes are cached, so a view
+      answers a cache hit without serializing the result again, and decodes them when it needs
+      the dictionary.
+
+    Raises LookupError when the symbol has no data in the range, without caching it.
+    """
+    # Resolved parameters, so requests spelling out the defaults share the entry
+    strategies = [(name, get_strategy(name).resolve_params(params)) for name, params in strategies]
+
+    cache = get_cache()
+    key = result_key(
+        'backtest', symbol, data_version(symbol),
+        initial_investment=initial_investment, start=start, end=end, strategies=strategies,
+    )
+
+    content = cache.get(key)
+    if content is None:
+        if len(strategies) == 1:
+            result = compute_backtest(symbol, initial_investment, start, end, *strategies[0])
+        else:
+            result = compute_backtests(symbol, initial_investment, start, end, strategies)
+        if 'error' in result:
+            raise LookupError(result['error'])
+        content = json.dumps(result, cls=DjangoJSONEncoder).encode()
+        cache.set(key, content)
+    return content
@@ -0,0 +1,98 @@
+# stocks/startup.py
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from django.conf import settings
+
+# Cold start of a worker process, see the `benchmark_startup` management command. The plotting,
+# PDF, ML and bulk fetch stacks are imported by the first request that needs them rather than at
+# startup, so a worker serving only backtests never loads them; this measures how long a fresh
+# process takes to be ready to serve, and checks that none of them creeps back into startup.
+
+# Packages that must not be imported until a request needs them
+HEAVY_MODULES = ('matplotlib', 'reportlab', 'scipy', 'sklearn', 'pandas', 'httpx', 'joblib')
+
+# Modules imported on first use, whose import time is measured after startup
+LAZY_IMPORTS = ('stocks.reports', 'stocks.batch_reports', 'stocks.bulk_fetch', 'scipy.signal', 'joblib')
+
+# Run by a fresh interpreter: loads the WSGI application and the URL configuration, as a worker
+# does before its first request, then prints its measures as JSON
+PROBE = '''
+import importlib, json, resource, sys, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+seconds = time.perf_counter() - start
+loaded_at = time.time()
+max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+heavy = sorted({name.partition('.')[0] for name in sys.modules} & set(HEAVY_MODULES))
+first_use = {}
+for name in LAZY_IMPORTS if MEASURE_FIRST_USE else ():
+    import_start = time.perf_counter()
+    importlib.import_module(name)
+    first_use[name] = time.perf_counter() - import_start
+print(json.dumps({'loaded_at': loaded_at, 'seconds': seconds, 'max_rss': max_rss, 'heavy_modules': heavy, 'first_use': first_use}))
+'''
+
+
+def probe_startup(settings_module=None, first_use=False):
+    """
+    Starts a Python process loading the service as a worker does, and returns its measures.
+
+    Inputs:
+    - settings_module: The Django settings of the process (default: those of this process).
+    - first_use: Whether to also time the imports of LAZY_IMPORTS once the service is loaded.
+
+    Outputs:
+    - Returns a dictionary with:
+      - 'wall_seconds': Time from launching the interpreter to the service being loaded.
+      - 'seconds': Time to load the service, without the start of the interpreter.
+      - 'max_rss': Peak resident memory of the process in bytes.
+      - 'heavy_modules': The packages of HEAVY_MODULES imported at startup, which should be none.
+      - 'first_use': Seconds to import each of LAZY_IMPORTS, when `first_use` is set.
+    """
+    code = f'HEAVY_MODULES = {HEAVY_MODULES!r}\nLAZY_IMPORTS = {LAZY_IMPORTS!r}\nMEASURE_FIRST_USE = {bool(first_use)}\n{PROBE}'
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': settings_module or settings.SETTINGS_MODULE,
+        # The modules importable here, such as the settings module, are importable by the probe
+        'PYTHONPATH': os.pathsep.join(path for path in sys.path if path),
+    }
+    launched_at = time.time()
+    completed = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+    if completed.returncode:
+        raise RuntimeError(f'The startup probe failed:\n{completed.stderr.strip()}')
+    measures = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {'wall_seconds': measures.pop('loaded_at') - launched_at, **measures}
+
+
+def measure_startup(repeat=5, settings_module=None, first_use=True):
+    """
+    Measures the cold start of `repeat` fresh worker processes, see `probe_startup`.
+
+    Outputs:
+    - Returns a dictionary with the number of 'runs', the min, median and max of their
+      'wall_seconds' and 'seconds', the median 'max_rss' in bytes, the 'heavy_modules' imported
+      at startup by any run, and the median 'first_use' import time of each of LAZY_IMPORTS.
+    """
+    if repeat < 1:
+        raise ValueError(f'Invalid repeat {repeat}, expected a positive integer.')
+    probes = [probe_startup(settings_module, first_use) for _ in range(repeat)]
+
+    def spread(key):
+        values = [probe[key] for probe in probes]
+        return {'min': min(values), 'median': float(np.median(values)), 'max': max(values)}
+
+    return {
+        'runs': repeat,
+        'wall_seconds': spread('wall_seconds'),
+        'seconds': spread('seconds'),
+        'max_rss': int(np.median([probe['max_rss'] for probe in probes])),
+        'heavy_modules': sorted({name for probe in probes for name in probe['heavy_modules']}),
+        'first_use': {name: float(np.median([probe['first_use'][name] for probe in probes])) for name in probes[0]['first_use']},
+    }
@@ -0,0 +1,203 @@
+# stocks/strategies.py
+from .backtest_engine import MOVING_AVERAGE_LONG, MOVING_AVERAGE_SHORT, run_signals
+from .indicators import IndicatorSet
+
+# Registry of the strategies, by name
+STRATEGIES = {}
+DEFAULT_STRATEGY = 'moving_average'
+
+
+class Strategy:
+    """
+    A trading rule turning the indicators of a price series into buy and sell signals.
+
+    Subclasses set:
+    - name: The name the strategy is registered and requested with.
+    - columns: The price columns its indicators read.
+    - defaults: Its parameters with their default values; requested values are cast to their types.
+    And implement `signals`. The trading itself is shared, see `backtest_engine.run_signals`.
+    """
+    name = None
+    columns = ('close',)
+    defaults = {}
+
+    def resolve_params(self, params=None):
+        """
+        Returns the complete parameters of the strategy, with `params` overriding the defaults.
+        """
+        params = params or {}
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"Unknown parameters for strategy '{self.name}': {', '.join(sorted(unknown))}.")
+        return {key: type(default)(params.get(key, default)) for key, default in self.defaults.items()}
+
+    def signals(self, prices, indicators, params):
+        """
+        Returns the (buy_signal, sell_signal) boolean arrays of the strategy.
+
+        Inputs:
+        - prices: Dictionary of the float64 price columns, ordered by date.
+        - indicators: The IndicatorSet of the run, shared with the other strategies.
+        - params: The resolved parameters of the strategy.
+        """
+        raise NotImplementedError
+
+
+def register_strategy(cls):
+    """
+    Class decorator registering a strategy under its name.
+    """
+    STRATEGIES[cls.name] = cls()
+    return cls
+
+
+def get_strategy(name):
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown strategy '{name}', expected one of {', '.join(sorted(STRATEGIES))}.")
+
+
+@register_strategy
+class MovingAverageStrategy(Strategy):
+    """
+    Buy when the close falls below the short moving average, sell when it rises above the long one.
+    This is the original strategy of `compute_backtest_reference`.
+    """
+    name = 'moving_average'
+    defaults = {'short_window': MOVING_AVERAGE_SHORT, 'long_window': MOVING_AVERAGE_LONG}
+
+    def signals(self, prices, indicators, params):
+        close = prices['close']
+        return (
+            close < indicators.get('moving_average', window=params['short_window']),
+            close > indicators.get('moving_average', window=params['long_window']),
+        )
+
+
+@register_strategy
+class EMACrossoverStrategy(Strategy):
+    """
+    Be invested while the fast exponential moving average is above the slow one.
+    """
+    name = 'ema_crossover'
+    defaults = {'fast_window': 12, 'slow_window': 26}
+
+    def signals(self, prices, indicators, params):
+        fast = indicators.get('ema', window=params['fast_window'])
+        slow = indicators.get('ema', window=params['slow_window'])
+        return fast > slow, fast < slow
+
+
+@register_strategy
+class RSIStrategy(Strategy):
+    """
+    Buy when the RSI is oversold, below `lower`, and sell when it is overbought, above `upper`.
+    """
+    name = 'rsi'
+    defaults = {'window': 14, 'lower': 30.0, 'upper': 70.0}
+
+    def signals(self, prices, indicators, params):
+        values = indicators.get('rsi', window=params['window'])
+        return values < params['lower'], values > params['upper']
+
+
+@register_strategy
+class BollingerStrategy(Strategy):
+    """
+    Buy when the close falls below the lower Bollinger band and sell when it rises above the upper one.
+    """
+    name = 'bollinger'
+    defaults = {'window': 20, 'width': 2.0}
+
+    def signals(self, prices, indicators, params):
+        middle, upper, lower = indicators.get('bollinger', window=params['window'], width=params['width'])
+        return prices['close'] < lower, prices['close'] > upper
+
+
+@register_strategy
+class ATRBreakoutStrategy(Strategy):
+    """
+    Buy when the close breaks `multiplier` average true ranges above its moving average and sell
+    when it breaks as far below.
+    """
+    name = 'atr_breakout'
+    columns = ('high', 'low', 'close')
+    defaults = {'window': 20, 'atr_window': 14, 'multiplier': 2.0}
+
+    def signals(self, prices, indicators, params):
+        middle = indicators.get('sma', window=params['window'])
+        band = params['multiplier'] * indicators.get('atr', window=params['atr_window'])
+        return prices['close'] > middle + band, prices['close'] < middle - band
+
+
+def parse_strategies(names, params=None):
+    """
+    Parses the strategies requested as a comma separated list of names, with shared parameters.
+
+    Inputs:
+    - names: The strategy names, e.g. 'rsi,bollinger' (default strategy when empty).
+    - params: Optional dictionary of parameter values; each one is given to every requested
+      strategy that defines it.
+
+    Outputs:
+    - Returns the list of (name, params) pairs.
+
+    Raises ValueError for an unknown strategy or a parameter defined by none of the strategies.
+    """
+    names = [name.strip() for name in (names or DEFAULT_STRATEGY).split(',') if name.strip()] or [DEFAULT_STRATEGY]
+    if len(set(names)) != len(names):
+        raise ValueError('Each strategy can only be requested once.')
+    params = params or {}
+
+    strategies, used = [], set()
+    for name in names:
+        defaults = get_strategy(name).defaults
+        strategies.append((name, {key: value for key, value in params.items() if key in defaults}))
+        used.update(defaults)
+
+    unknown = set(params) - used
+    if unknown:
+        raise ValueError(f"Unknown strategy parameters: {', '.join(sorted(unknown))}.")
+    return strategies
+
+
+def strategy_columns(names):
+    """
+    Returns the price columns read by the given strategies.
+    """
+    columns = {'close'}
+    for name in names:
+        columns.update(get_strategy(name).columns)
+    return sorted(columns)
+
+
+def run_strategies(prices, strategies, initial_investment=1000, indicators=None):
+    """
+    Backtests several strategies on one price series, sharing their indicators.
+
+    Inputs:
+    - prices: Dictionary of the float64 price columns of the series, ordered by date.
+    - strategies: List of (name, params) pairs; params may be partial or None.
+    - initial_investment: The initial amount of money invested by each strategy (default: 1000).
+    - indicators: Optional IndicatorSet of the series to share with other runs.
+
+    Outputs:
+    - Returns a list with one `run_backtest` result per strategy, in order.
+
+    Each indicator is computed once for a given set of parameters, however many strategies use it.
+    """
+    indicators = indicators or IndicatorSet(prices)
+    results = []
+    for name, params in strategies:
+        strategy = get_strategy(name)
+        buy_signal, sell_signal = strategy.signals(prices, indicators, strategy.resolve_params(params))
+        results.append(run_signals(prices['close'], buy_signal, sell_signal, initial_investment))
+    return results
+
+
+def run_strategy(prices, initial_investment=1000, name=DEFAULT_STRATEGY, params=None):
+    """
+    Backtests one strategy on one price series. Picklable entry point for worker processes.
+    """
+    return run_strategies(prices, [(name, params)], initial_investment)[0]
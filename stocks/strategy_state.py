@@ -0,0 +1,234 @@
+# stocks/strategy_state.py
+import json
+from collections import deque
+from datetime import date
+from django.conf import settings
+from django.db import transaction
+from .backtest_engine import MOVING_AVERAGE_LONG, MOVING_AVERAGE_SHORT
+from .models import StockData, StrategyEquity, StrategyState
+
+STRATEGY = 'moving_average'
+
+# Fields saved before the last advanced day, so a correction of that day can be applied
+SNAPSHOT_FIELDS = ['last_date', 'last_close', 'bars', 'ma_short_total', 'ma_long_total', 'cash', 'shares', 'peak_value', 'max_drawdown', 'total_trades']
+
+
+def strategy_params(initial_investment=1000, ma_short=MOVING_AVERAGE_SHORT, ma_long=MOVING_AVERAGE_LONG):
+    """
+    Returns the validated parameters of a moving average strategy state.
+    """
+    if initial_investment <= 0:
+        raise ValueError('The initial investment must be greater than zero.')
+    if int(ma_short) != ma_short or int(ma_long) != ma_long or ma_short < 1 or ma_long < 1:
+        raise ValueError('The moving average windows must be positive integers.')
+    return {'initial_investment': float(initial_investment), 'ma_short': int(ma_short), 'ma_long': int(ma_long)}
+
+
+def params_key(params):
+    # Canonical JSON of the parameters, part of the unique key of the states
+    return json.dumps(params, sort_keys=True)
+
+
+def persisted_params():
+    """
+    Returns the keys of the parameters whose states are persisted, from settings.STOCKS_STRATEGY_STATES:
+    comma separated 'initial_investment:ma_short:ma_long' entries.
+    """
+    keys = set()
+    for entry in settings.STOCKS_STRATEGY_STATES.split(','):
+        if entry.strip():
+            initial_investment, ma_short, ma_long = (float(value) for value in entry.split(':'))
+            keys.add(params_key(strategy_params(initial_investment, ma_short, ma_long)))
+    return keys
+
+
+def _snapshot(state, window):
+    snapshot = {field: getattr(state, field) for field in SNAPSHOT_FIELDS}
+    snapshot['last_date'] = state.last_date.isoformat() if state.last_date else None
+    snapshot['window'] = list(window)
+    return snapshot
+
+
+def _restore(state, snapshot):
+    for field in SNAPSHOT_FIELDS:
+        setattr(state, field, snapshot[field])
+    state.last_date = date.fromisoformat(snapshot['last_date']) if snapshot['last_date'] else None
+    state.window = snapshot['window']
+
+
+def _roll(total, window, close, bars, size):
+    # Running sum of the reference loop: once the window is full, the oldest close is dropped one
+    # day early, see `backtest_engine.moving_average`
+    total += close
+    if bars < size - 1:
+        return total, total / (bars + 1)
+    total -= window[-(size - 1)] if size > 1 else close
+    return total, total / size
+
+
+def advance(state, window, close):
+    """
+    Advances a strategy state by one day and returns the portfolio value at the day's close.
+
+    Inputs:
+    - state: The StrategyState, updated in place.
+    - window: Deque of the trailing closes before the day, updated in place.
+    - close: The closing price of the day.
+
+    The trading rules and moving averages are those of `compute_backtest_reference`, so the cost
+    of a day only depends on the moving average windows. Unlike the batch backtest, which values
+    an open position at the last close of the whole series, the equity curve marks the position to
+    the close of each day, so past values never change as days are appended.
+    """
+    params = state.params
+    state.ma_short_total, ma_short_value = _roll(state.ma_short_total, window, close, state.bars, params['ma_short'])
+    state.ma_long_total, ma_long_value = _roll(state.ma_long_total, window, close, state.bars, params['ma_long'])
+    window.append(close)
+    state.bars += 1
+
+    # Buy condition
+    if state.cash != 0 and close < ma_short_value:
+        state.shares = state.cash / close
+        state.cash = 0
+        state.total_trades += 1
+
+    # Sell condition
+    elif state.shares > 0 and close > ma_long_value:
+        state.cash = state.shares * close
+        state.shares = 0
+        state.total_trades += 1
+
+    value = state.cash + state.shares * close
+
+    # Data for drawdown
+    if value > state.peak_value:
+        state.peak_value = value
+    else:
+        state.max_drawdown = max(state.max_drawdown, (state.peak_value - value) / state.peak_value)
+
+    return value
+
+
+def catch_up(state):
+    """
+    Advances a strategy state over the days stored after its last day, and saves it.
+
+    Only the new rows of the symbol are read. When the close of the last advanced day changed since
+    (ingestion refreshes the latest stored day), that day is undone and advanced again.
+    """
+    rows = StockData.objects.filter(symbol=state.symbol)
+
+    if state.last_date is not None and state.previous is not None:
+        stored_close = rows.filter(date=state.last_date).values_list('close_price', flat=True).first()
+        if stored_close is not None and stored_close != state.last_close:
+            StrategyEquity.objects.filter(state=state, date=state.last_date).delete()
+            _restore(state, state.previous)
+            state.previous = None
+
+    if state.last_date is not None:
+        rows = rows.filter(date__gt=state.last_date)
+    new_rows = list(rows.order_by('date').values_list('date', 'close_price'))
+    if not new_rows:
+        return state
+
+    points = _advance_rows(state, new_rows)
+    state.save()
+    StrategyEquity.objects.bulk_create(points)
+    return state
+
+
+def _advance_rows(state, rows):
+    # Advances a state over (date, close) rows, returning the StrategyEquity points of the days
+    window = deque(state.window, maxlen=max(state.params['ma_short'], state.params['ma_long']) - 1)
+    points = []
+    for index, (day, close) in enumerate(rows):
+        if index == len(rows) - 1:
+            state.previous = _snapshot(state, window)
+        value = advance(state, window, close)
+        state.last_date, state.last_close = day, close
+        points.append(StrategyEquity(state=state, date=day, value=value))
+    state.window = list(window)
+    return points
+
+
+def compute_strategy_state(symbol, params):
+    """
+    Returns an unsaved StrategyState advanced over the whole history of a stock symbol, with its
+    equity curve as a list of (date, value) pairs in its `curve` attribute.
+    """
+    state = StrategyState(symbol=symbol, strategy=STRATEGY, params_key=params_key(params), params=params, cash=params['initial_investment'])
+    rows = list(StockData.objects.filter(symbol=symbol).order_by('date').values_list('date', 'close_price'))
+    state.curve = [(point.date, point.value) for point in _advance_rows(state, rows)]
+    return state
+
+
+def get_strategy_state(symbol, initial_investment=1000, ma_short=MOVING_AVERAGE_SHORT, ma_long=MOVING_AVERAGE_LONG):
+    """
+    Returns the up to date moving average strategy state of a stock symbol.
+
+    Inputs:
+    - symbol: The stock symbol.
+    - initial_investment, ma_short, ma_long: The strategy parameters.
+
+    Outputs:
+    - Returns the StrategyState, created and advanced over the whole history on first use, and
+      then only over the days ingested since. Returns None when the symbol has no data.
+
+    Only the parameters of settings.STOCKS_STRATEGY_STATES are persisted, so requests cannot grow
+    the states advanced by every ingestion: the state of other parameters is computed over the
+    whole history on each call and not saved, see `compute_strategy_state`.
+    """
+    params = strategy_params(initial_investment, ma_short, ma_long)
+    if not StockData.objects.filter(symbol=symbol).exists():
+        return None
+    if params_key(params) not in persisted_params():
+        return compute_strategy_state(symbol, params)
+
+    with transaction.atomic():
+        state, created = StrategyState.objects.select_for_update().get_or_create(
+            symbol=symbol,
+            strategy=STRATEGY,
+            params_key=params_key(params),
+            defaults={'params': params, 'cash': params['initial_investment']},
+        )
+        return catch_up(state)
+
+
+def advance_symbol_states(symbol):
+    """
+    Advances the persisted strategy states of a stock symbol over its newly ingested days.
+    """
+    with transaction.atomic():
+        for state in StrategyState.objects.select_for_update().filter(symbol=symbol, params_key__in=persisted_params()):
+            catch_up(state)
+
+
+def strategy_state_payload(state, with_curve=True):
+    """
+    Returns the JSON-serializable summary of a strategy state, with its equity curve when asked.
+    """
+    initial_investment = state.params['initial_investment']
+    value = state.cash + state.shares * (state.last_close or 0)
+    payload = {
+        'symbol': state.symbol,
+        'strategy': state.strategy,
+        'params': state.params,
+        'last_date': state.last_date.isoformat() if state.last_date else None,
+        'bars': state.bars,
+        'position': 'invested' if state.shares > 0 else 'cash',
+        'cash': state.cash,
+        'shares': state.shares,
+        'value': value,
+        'total_return': (value - initial_investment) / initial_investment * 100,
+        'peak_value': state.peak_value,
+        'Max_Drawdown': state.max_drawdown,
+        'total_trades': state.total_trades,
+    }
+    if with_curve:
+        if state.pk is None:
+            curve = state.curve
+        else:
+            curve = list(StrategyEquity.objects.filter(state=state).order_by('date').values_list('date', 'value'))
+        payload['dates'] = [day.strftime('%Y-%m-%d') for day, _ in curve]
+        payload['portfolio_values'] = [value for _, value in curve]
+    return payload
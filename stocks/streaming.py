@@ -0,0 +1,197 @@
+# stocks/streaming.py
+import codecs
+import json
+import logging
+import re
+from django.conf import settings
+from .ingestion import parse_daily_row
+from .market_data import TIME_SERIES_KEY, RateLimitError, backoff_delay, check_payload
+
+# Longest text accepted before the time series starts (the 'Meta Data' block is a few hundred bytes)
+MAX_HEADER_SIZE = 1024 * 1024
+# Size of the chunks read from the response
+CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+# Parsed text is dropped from the buffer once it gets this long
+TRIM_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class TimeSeriesStreamParser:
+    """
+    Incremental parser of an Alpha Vantage 'Time Series (Daily)' response body.
+
+    Chunks of the body are given to `feed`, which returns the typed rows of the days completed so
+    far, as produced by `ingestion.parse_daily_row`. Only the day being read is kept as text, so
+    the memory used does not depend on the size of the response.
+
+    Alpha Vantage lists the days newest first: with `stop_before`, parsing ends at the first day
+    older than that date and `finished` is set, so the rest of the response does not need to be read.
+    """
+
+    def __init__(self, stop_before=None):
+        self.stop_before = stop_before
+        self.finished = False
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self._in_series = False
+
+    def feed(self, chunk):
+        """
+        Parses a chunk of the response body and returns the list of rows it completes.
+        """
+        if self.finished:
+            return []
+        self._buffer += self._decoder.decode(chunk)
+
+        if not self._in_series and not self._find_series():
+            if len(self._buffer) > MAX_HEADER_SIZE:
+                raise ValueError('The response does not contain a daily time series.')
+            return []
+
+        rows = []
+        while not self.finished:
+            entry = self._next_entry()
+            if entry is None:
+                break
+
+            date, daily_data = entry
+            try:
+                row = parse_daily_row(date, daily_data)
+            except (KeyError, TypeError, ValueError) as parse_err:
+                logger.warning('Parsing error occurred while processing date %s: %s', date, parse_err)
+                continue
+
+            if self.stop_before is not None and row[0] < self.stop_before:
+                self.finished = True
+                break
+            rows.append(row)
+
+        if self._position > TRIM_SIZE:
+            self._buffer = self._buffer[self._position:]
+            self._position = 0
+        return rows
+
+    def close(self):
+        """
+        Checks the end of the response, raising when it held no complete time series.
+
+        A response without a time series is decoded as a whole, and the error or rate limit notice
+        it carries is raised as in `market_data.check_payload`.
+        """
+        if self.finished:
+            return
+        self._buffer += self._decoder.decode(b'', final=True)
+
+        if not self._in_series:
+            check_payload(json.loads(self._buffer or '{}'))
+            raise LookupError('No time series data available for the given symbol.')
+        raise ValueError('The time series of the response is truncated.')
+
+    def _skip_whitespace(self, position):
+        return WHITESPACE.match(self._buffer, position).end()
+
+    def _find_series(self):
+        start = self._buffer.find(f'"{TIME_SERIES_KEY}"')
+        if start < 0:
+            return False
+
+        position = self._skip_whitespace(start + len(TIME_SERIES_KEY) + 2)
+        if position >= len(self._buffer) or self._buffer[position] != ':':
+            return False
+        position = self._skip_whitespace(position + 1)
+        if position >= len(self._buffer):
+            return False
+        if self._buffer[position] != '{':
+            raise ValueError('The daily time series of the response is not an object.')
+
+        self._buffer = self._buffer[position + 1:]
+        self._position = 0
+        self._in_series = True
+        return True
+
+    def _next_entry(self):
+        # Returns the next (date, daily data) pair, or None until the buffer holds a complete one
+        position = self._skip_whitespace(self._position)
+        if position < len(self._buffer) and self._buffer[position] == ',':
+            position = self._skip_whitespace(position + 1)
+        if position >= len(self._buffer):
+            return None
+        if self._buffer[position] == '}':
+            self.finished = True
+            return None
+
+        try:
+            date, position = self._json.raw_decode(self._buffer, position)
+            position = self._skip_whitespace(position)
+            if position >= len(self._buffer):
+                return None
+            if self._buffer[position] != ':':
+                raise ValueError(f'Unexpected character in the time series at day {date}.')
+            daily_data, position = self._json.raw_decode(self._buffer, self._skip_whitespace(position + 1))
+        except json.JSONDecodeError:
+            # The entry continues in the next chunk
+            return None
+
+        self._position = position
+        return date, daily_data
+
+
+def iter_time_series_rows(chunks, stop_before=None):
+    """
+    Yields the typed rows of an Alpha Vantage daily time series read from an iterable of byte chunks.
+
+    Inputs:
+    - chunks: Iterable of bytes of the response body, e.g. `response.iter_content(...)`.
+    - stop_before: Optional date; reading stops at the first day older than it.
+
+    Outputs:
+    - Yields (date, open_price, high_price, low_price, close_price, volume) tuples, newest first.
+    """
+    parser = TimeSeriesStreamParser(stop_before)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.finished:
+            return
+    parser.close()
+
+
+def stream_daily_rows(client, symbol, stop_before=None, outputsize=None):
+    """
+    Fetches the daily time series of a stock symbol and yields its rows while the response is read.
+
+    Inputs:
+    - client: The `market_data.AlphaVantageClient` used for the request.
+    - symbol: The stock symbol to fetch.
+    - stop_before: Optional date; the response is closed at the first day older than it.
+    - outputsize: Alpha Vantage output size (default: settings.ALPHA_VANTAGE_OUTPUTSIZE).
+
+    Outputs:
+    - Yields the rows of `iter_time_series_rows`, newest first.
+
+    The request goes through the client's connection pool, timeouts and retries; a rate limit
+    notice in the body, which comes before any row, is retried with the same backoff.
+    """
+    attempt = 0
+    while True:
+        response = client.request(
+            stream=True,
+            function=settings.ALPHA_VANTAGE_FUNCTION,
+            symbol=symbol,
+            outputsize=outputsize or settings.ALPHA_VANTAGE_OUTPUTSIZE,
+        )
+        try:
+            yield from iter_time_series_rows(response.iter_content(CHUNK_SIZE), stop_before)
+            return
+        except RateLimitError:
+            if attempt >= client.max_retries:
+                raise
+        finally:
+            response.close()
+
+        client.sleep(backoff_delay(client.backoff, attempt))
+        attempt += 1
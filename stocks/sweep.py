@@ -0,0 +1,128 @@
+# stocks/sweep.py
+import numpy as np
+from .backtest_engine import moving_average, run_backtest
+
+# Columns of the ranked table and whether a higher value ranks first
+RANKING_COLUMNS = {
+    'total_return': True,
+    'Max_Drawdown': False,
+    'total_trades': False,
+}
+
+# Maximum number of combinations evaluated by a sweep
+MAX_SWEEP_COMBINATIONS = 10000
+
+
+def parse_range(value):
+    """
+    Parses a sweep range given as 'start:stop:step' (stop included) or as a comma separated list.
+
+    Inputs:
+    - value: The range string, e.g. '10:100:10' or '20,50,100'.
+
+    Outputs:
+    - Returns a sorted list of unique numbers, as ints when they are integral.
+
+    Raises ValueError when the range cannot be parsed, is empty, or selects more than
+    MAX_SWEEP_COMBINATIONS values, checked before the values are generated.
+    """
+    if ':' in value:
+        parts = [float(part) for part in value.split(':')]
+        if len(parts) not in (2, 3):
+            raise ValueError(f"Invalid range '{value}', expected 'start:stop' or 'start:stop:step'.")
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) == 3 else 1
+        if not np.isfinite(parts).all() or step <= 0:
+            raise ValueError(f"Invalid range '{value}', the bounds must be finite and the step positive.")
+        if (stop - start) / step >= MAX_SWEEP_COMBINATIONS:
+            raise ValueError(f"Invalid range '{value}', more than {MAX_SWEEP_COMBINATIONS} values.")
+        numbers = np.arange(start, stop + step / 2, step).tolist()
+    else:
+        numbers = [float(part) for part in value.split(',') if part.strip()]
+
+    if not numbers:
+        raise ValueError(f"Invalid range '{value}', no value selected.")
+    if len(numbers) > MAX_SWEEP_COMBINATIONS:
+        raise ValueError(f"Invalid range '{value}', more than {MAX_SWEEP_COMBINATIONS} values.")
+
+    return sorted({int(number) if float(number).is_integer() else number for number in numbers})
+
+
+def sweep_moving_average(closes, short_windows, long_windows, initial_investments=(1000,), order_by='total_return'):
+    """
+    Evaluates the moving average strategy over a grid of parameters on one price series.
+
+    Inputs:
+    - closes: 1-D NumPy array of closing prices ordered by date.
+    - short_windows: Windows of the moving average used by the buy condition.
+    - long_windows: Windows of the moving average used by the sell condition.
+    - initial_investments: Initial investments to evaluate (default: (1000,)).
+    - order_by: Column used to rank the results, one of RANKING_COLUMNS (default: 'total_return').
+
+    Outputs:
+    - Returns the ranked list of results, one dictionary per combination, containing the
+      'short_window', 'long_window', 'initial_investment', 'total_return', 'Max_Drawdown',
+      'total_trades' and 'final_value'.
+
+    The prefix sum of the closes is computed once and every moving average is derived from it
+    once per window. For each short window, all the long windows are evaluated in a single call
+    to the engine. The strategy is invariant to the amount invested, so each initial investment
+    only scales the final value.
+
+    Raises ValueError for grids of more than MAX_SWEEP_COMBINATIONS combinations, and windows
+    longer than the series, before computing anything.
+    """
+    short_windows, long_windows, initial_investments = list(short_windows), list(long_windows), list(initial_investments)
+    if not short_windows or not long_windows or not initial_investments:
+        raise ValueError('Every sweep range needs at least one value.')
+    combinations = len(short_windows) * len(long_windows) * len(initial_investments)
+    if combinations > MAX_SWEEP_COMBINATIONS:
+        raise ValueError(f'The sweep has {combinations} combinations, at most {MAX_SWEEP_COMBINATIONS} are evaluated.')
+    if order_by not in RANKING_COLUMNS:
+        raise ValueError(f"Invalid ranking column '{order_by}', expected one of {', '.join(RANKING_COLUMNS)}.")
+    windows = set(short_windows) | set(long_windows)
+    if any(int(window) != window or window < 2 for window in windows):
+        raise ValueError('The moving average windows must be integers of at least 2 days.')
+    if max(windows) > len(closes):
+        raise ValueError(f'The moving average windows must be at most the {len(closes)} days of the series.')
+    if any(investment <= 0 for investment in initial_investments):
+        raise ValueError('The initial investments must be greater than zero.')
+
+    closes = np.ascontiguousarray(closes, dtype=np.float64)
+    prefix_sum = np.concatenate(([0.0], np.cumsum(closes)))
+    averages = {window: moving_average(closes, int(window), prefix_sum) for window in windows}
+    long_averages = np.stack([averages[window] for window in long_windows])
+
+    total_returns, drawdowns, trades = [], [], []
+    for short_window in short_windows:
+        result = run_backtest(closes, 1, ma_short=averages[short_window], ma_long=long_averages)
+        total_returns.append(result['total_return'])
+        drawdowns.append(result['Max_Drawdown'])
+        trades.append(result['total_trades'])
+
+    # Grid of shape (short windows, long windows, initial investments)
+    grid_shape = (len(short_windows), len(long_windows), len(initial_investments))
+    columns = {
+        'total_return': np.broadcast_to(np.array(total_returns)[:, :, None], grid_shape).ravel(),
+        'Max_Drawdown': np.broadcast_to(np.array(drawdowns)[:, :, None], grid_shape).ravel(),
+        'total_trades': np.broadcast_to(np.array(trades)[:, :, None], grid_shape).ravel(),
+    }
+    short_index, long_index, investment_index = (index.ravel() for index in np.indices(grid_shape))
+    investments = np.asarray(initial_investments, dtype=np.float64)[investment_index]
+    final_values = investments * (1 + columns['total_return'] / 100)
+
+    key = columns[order_by]
+    order = np.argsort(-key if RANKING_COLUMNS[order_by] else key, kind='stable')
+
+    return [
+        {
+            'short_window': short_windows[short_index[i]],
+            'long_window': long_windows[long_index[i]],
+            'initial_investment': initial_investments[investment_index[i]],
+            'total_return': float(columns['total_return'][i]),
+            'Max_Drawdown': float(columns['Max_Drawdown'][i]),
+            'total_trades': int(columns['total_trades'][i]),
+            'final_value': float(final_values[i]),
+        }
+        for i in order.tolist()
+    ]
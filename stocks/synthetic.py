@@ -0,0 +1,74 @@
+# stocks/synthetic.py
+import zlib
+from datetime import date
+import numpy as np
+
+# Seeded synthetic market data, used by the benchmarks and the load tests instead of Alpha Vantage.
+
+BUSINESS_DAYS_PER_YEAR = 252
+
+
+def synthetic_symbols(count):
+    """
+    Returns `count` synthetic stock symbols: 'SYN000', 'SYN001', ...
+    """
+    return [f'SYN{index:03d}' for index in range(count)]
+
+
+def gbm_ohlcv(symbol, days, seed=0, end=None, start_price=100.0, drift=0.05, volatility=0.2):
+    """
+    Generates the daily prices of a stock symbol as a geometric Brownian motion.
+
+    Inputs:
+    - symbol: The stock symbol, which seeds its series together with `seed`, so a symbol always
+      has the same prices whatever the other symbols generated.
+    - days: Number of business days.
+    - seed: Seed of the generator (default: 0).
+    - end: Last business day of the series (default: today, rolled back to a business day).
+    - start_price: Close of the day before the series (default: 100).
+    - drift, volatility: Annualized drift and volatility of the log returns (default: 0.05 and 0.2).
+
+    Outputs:
+    - Returns a dictionary of arrays: 'date' (datetime64[D], ascending business days), 'open',
+      'high', 'low', 'close' and 'volume'. Opens gap from the previous close, highs and lows
+      enclose the open and the close, and volumes are log-normal.
+    """
+    rng = np.random.default_rng([seed, zlib.crc32(symbol.encode())])
+    dt = 1 / BUSINESS_DAYS_PER_YEAR
+
+    end = np.busday_offset(np.datetime64(end or date.today(), 'D'), 0, roll='backward')
+    dates = np.busday_offset(end, np.arange(1 - days, 1))
+
+    log_returns = (drift - volatility ** 2 / 2) * dt + volatility * np.sqrt(dt) * rng.standard_normal(days)
+    close = start_price * np.exp(np.cumsum(log_returns))
+    previous_close = np.concatenate([[start_price], close[:-1]])
+    open_ = previous_close * np.exp(volatility * np.sqrt(dt) / 4 * rng.standard_normal(days))
+    high = np.maximum(open_, close) * np.exp(np.abs(volatility * np.sqrt(dt) / 2 * rng.standard_normal(days)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(volatility * np.sqrt(dt) / 2 * rng.standard_normal(days)))
+    volume = rng.lognormal(np.log(1e6), 0.5, days).astype(np.int64)
+
+    return {'date': dates, 'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}
+
+
+def alpha_vantage_payload(ohlcv):
+    """
+    Returns the prices of `gbm_ohlcv` as an Alpha Vantage 'Time Series (Daily)' dictionary, newest day first.
+    """
+    return {
+        day: {
+            '1. open': f'{open_:.4f}', '2. high': f'{high:.4f}', '3. low': f'{low:.4f}',
+            '4. close': f'{close:.4f}', '5. volume': str(volume),
+        }
+        for day, open_, high, low, close, volume in zip(
+            ohlcv['date'][::-1].astype(str).tolist(), ohlcv['open'][::-1].tolist(), ohlcv['high'][::-1].tolist(),
+            ohlcv['low'][::-1].tolist(), ohlcv['close'][::-1].tolist(), ohlcv['volume'][::-1].tolist(),
+        )
+    }
+
+
+def synthetic_market(symbols, years, seed=0, end=None):
+    """
+    Returns a dictionary mapping each stock symbol to its `gbm_ohlcv` prices over `years` years.
+    """
+    days = int(round(years * BUSINESS_DAYS_PER_YEAR))
+    return {symbol: gbm_ohlcv(symbol, days, seed, end) for symbol in symbols}
@@ -1,10 +1,69 @@
-from django.test import TestCase
-from .models import StockData
-from .views import backtest_strategy  # Ensure you have the correct import path
-from django.urls import reverse
-from django.http import JsonResponse
-import os
+import asyncio
 import json
+import multiprocessing
+import os
+import pstats
+import re
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import requests
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.signals import request_started
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import metrics
+from .alpha_vantage_stub import AlphaVantageStub
+from .apps import start_report_workers
+from .artifacts import get_artifact_store
+from .backtest_engine import moving_average, position_states, run_backtest
+from .batch_reports import build_batch_report
+from .benchmarks import compare_results, parse_size, run_benchmarks
+from .bulk_fetch import TokenBucket, fetch_universe
+from .charts import downsample_minmax, render_chart
+from .controller import compute_backtest, compute_backtest_reference
+from .indicators import IndicatorSet
+from .ingestion import ingest_rows, ingest_time_series, parse_time_series
+from .load_test import load_targets, run_load_test
+from .market_data import AlphaVantageClient, MarketDataError, RateLimitError
+from .middleware import MetricsMiddleware
+from .model_registry import DEFAULT_MODEL, DEFAULT_VERSION, MODEL_DIR, InvalidModelError, ModelNotFoundError, ModelRegistry, version_key
+from .models import DataVersion, ReportJob, StockData, StrategyState
+from .portfolio import compute_portfolio_backtest
+from .prediction import MAX_SYMBOLS, forecast_many, predict_many
+from .price_store import PriceStore, get_store
+from .prices import load_close_prices, load_close_prices_many, load_prices, load_recent_closes
+from .profiling import profile_call, profile_token
+from .report_jobs import ReportWorkerPool, claim_next_job, process_report_jobs, purge_report_jobs, submit_report
+from .reports import build_backtest_report
+from .response_formats import stream_json
+from .result_cache import bump_data_version, cached_backtest, data_version, get_cache
+from .startup import HEAVY_MODULES, LAZY_IMPORTS, measure_startup, probe_startup
+from .strategies import STRATEGIES, parse_strategies, run_strategies
+from .strategy_state import advance_symbol_states, get_strategy_state, strategy_state_payload
+from .streaming import iter_time_series_rows
+from .sweep import parse_range, sweep_moving_average
+from .synthetic import alpha_vantage_payload, gbm_ohlcv, synthetic_market, synthetic_symbols
+from .training import build_features, latest_features, save_model, train_return_model, walk_forward_splits
+from .views import backtest_strategy  # Ensure you have the correct import path
+
 
 class BacktestStrategyTests(TestCase):
     
@@ -12,6 +71,7 @@ class BacktestStrategyTests(TestCase):
 
         # Clear any existing StockData
         StockData.objects.all().delete()  # Ensure a clean state for each test
+        get_cache().clear()
         # Set up initial data for the tests
 
         # Construct the absolute path to the JSON file
@@ -58,11 +118,1650 @@ class BacktestStrategyTests(TestCase):
         pass  # Implement as needed for your scenario
 
 
+class VectorizedBacktestTests(TestCase):
+
+    def setUp(self):
+        json_file_path = os.path.join(os.path.dirname(__file__), 'stockTestData', 'stock_data.json')
+
+        with open(json_file_path, 'r') as file:
+            json_data = json.load(file)
+
+        StockData.objects.bulk_create([
+            StockData(symbol='AAPL', date=date, **values) for date, values in json_data.items()
+        ])
+
+    def assertSameBacktest(self, symbol, initial_investment):
+        expected = compute_backtest_reference(symbol, initial_investment)
+        result = compute_backtest(symbol, initial_investment)
+
+        self.assertEqual(expected['stock_data'], result['stock_data'])
+        self.assertEqual(expected['compute_data']['total_trades'], result['compute_data']['total_trades'])
+        self.assertAlmostEqual(expected['compute_data']['total_return'], result['compute_data']['total_return'], places=6)
+        self.assertAlmostEqual(expected['compute_data']['Max_Drawdown'], result['compute_data']['Max_Drawdown'], places=9)
+        np.testing.assert_allclose(result['compute_data']['portfolio_values'], expected['compute_data']['portfolio_values'], rtol=1e-9)
+
+    def test_parity_with_reference(self):
+        self.assertSameBacktest('AAPL', 5000)
+
+    def test_parity_with_reference_random_walk(self):
+        # Short, volatile history so both moving average warm-up phases and crossing signals are hit
+        rng = np.random.default_rng(42)
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.03, 300)))
+        dates = np.datetime64('2020-01-01') + np.arange(300)
+        StockData.objects.bulk_create([
+            StockData(symbol='TEST', date=str(date), close_price=float(close)) for date, close in zip(dates, closes)
+        ])
+        self.assertSameBacktest('TEST', 1000)
+
+    def test_no_data(self):
+        self.assertEqual(compute_backtest('MSFT', 1000), {'error': 'No data available for the specified symbol.'})
+
+
+class DataAccessTests(TestCase):
+
+    def setUp(self):
+        dates = np.datetime64('2024-01-01') + np.arange(10)
+        StockData.objects.bulk_create(
+            [StockData(symbol=symbol, date=str(day), close_price=float(i)) for symbol in ('AAPL', 'MSFT') for i, day in enumerate(dates)]
+        )
+
+    def test_closes_are_read_without_model_instances(self):
+        with CaptureQueriesContext(connection) as queries:
+            dates, closes = load_close_prices('AAPL', date(2024, 1, 3), date(2024, 1, 5))
+
+        self.assertEqual(dates.tolist(), [date(2024, 1, 3), date(2024, 1, 4), date(2024, 1, 5)])
+        np.testing.assert_array_equal(closes, [2.0, 3.0, 4.0])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('timestamp', queries[0]['sql'])
+        self.assertNotIn('open_price', queries[0]['sql'])
+
+    def test_recent_closes(self):
+        with CaptureQueriesContext(connection) as queries:
+            recent = load_recent_closes(['AAPL', 'MSFT', 'IBM'], 3)
+
+        self.assertEqual(sorted(recent), ['AAPL', 'MSFT'])
+        self.assertEqual(recent['MSFT'][0].dtype, np.dtype('datetime64[D]'))
+        self.assertEqual(recent['MSFT'][0].astype(str).tolist(), ['2024-01-08', '2024-01-09', '2024-01-10'])
+        np.testing.assert_array_equal(recent['MSFT'][1], [7.0, 8.0, 9.0])
+        # Limited per symbol rather than ranking the whole history, in one query where supported
+        self.assertEqual(len(queries), 1 if connection.features.supports_slicing_ordering_in_compound else 3)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertEqual(sql.count('LIMIT 3'), 3)
+        self.assertNotIn('ROW_NUMBER', sql)
+
+        self.assertEqual(load_recent_closes(['AAPL'], 20)['AAPL'][1].tolist(), [float(i) for i in range(10)])
+        self.assertEqual(load_recent_closes([], 3), {})
+
+    def test_backtest_date_range(self):
+        get_cache().clear()
+        url = reverse('backtest_strategy', kwargs={'symbol': 'AAPL', 'initial_investment': 1000})
+
+        response = self.client.get(url, {'start': '2024-01-04', 'end': '2024-01-08'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([day['date'] for day in response.json()['stock_data']][::4], ['2024-01-04', '2024-01-08'])
+
+        self.assertEqual(self.client.get(url, {'start': '2024-02-01'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'start': '01/04/2024'}).status_code, 400)
+
+
+class PriceStoreTests(TestCase):
+
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.store_dir)
+
+        json_file_path = os.path.join(os.path.dirname(__file__), 'stockTestData', 'stock_data.json')
+        with open(json_file_path, 'r') as file:
+            json_data = json.load(file)
+        StockData.objects.bulk_create([
+            StockData(symbol='AAPL', date=date, **values) for date, values in json_data.items()
+        ])
+
+    def test_columns_are_memory_mapped(self):
+        store = PriceStore(self.store_dir)
+        store.sync('AAPL')
+        series = store.read('AAPL')
+
+        dates, closes = load_close_prices('AAPL')
+        np.testing.assert_array_equal(series.dates, dates)
+        np.testing.assert_array_equal(series.close, closes)
+        self.assertIsInstance(series.close.base, np.memmap)
+        self.assertTrue(series.close.flags['C_CONTIGUOUS'])
+
+        window = series.between(dates[10], dates[19])
+        self.assertEqual(len(window), 10)
+        np.testing.assert_array_equal(window.close, closes[10:20])
+        self.assertIsNone(store.read('MSFT'))
+
+    def test_backtest_reads_columnar_backend(self):
+        expected = compute_backtest('AAPL', 5000)
+
+        with override_settings(STOCKS_PRICE_BACKEND='columnar', STOCKS_PRICE_STORE_DIR=self.store_dir):
+            PriceStore(self.store_dir).sync('AAPL')
+            with self.assertNumQueries(0):
+                result = compute_backtest('AAPL', 5000)
+
+        self.assertEqual(result, expected)
+
+    def test_backends_return_the_same_types(self):
+        PriceStore(self.store_dir).sync('AAPL')
+        loads = {
+            'close_prices': lambda: load_close_prices('AAPL', date(2023, 1, 1)),
+            'close_prices_many': lambda: load_close_prices_many(['AAPL'])['AAPL'],
+            'prices': lambda: load_prices('AAPL', ('open', 'close')),
+            'missing': lambda: load_close_prices('MSFT'),
+        }
+        for name, load in loads.items():
+            with self.subTest(name):
+                dates, values = load()
+                with override_settings(STOCKS_PRICE_BACKEND='columnar', STOCKS_PRICE_STORE_DIR=self.store_dir):
+                    stored_dates, stored_values = load()
+
+                self.assertEqual(dates.dtype, np.dtype('datetime64[D]'))
+                self.assertEqual(stored_dates.dtype, np.dtype('datetime64[D]'))
+                np.testing.assert_array_equal(dates, stored_dates)
+                if not isinstance(values, dict):
+                    values, stored_values = {'close': values}, {'close': stored_values}
+                for column in values:
+                    np.testing.assert_array_equal(values[column], stored_values[column])
+
+    def test_ingestion_keeps_store_in_sync(self):
+        with override_settings(STOCKS_PRICE_BACKEND='columnar', STOCKS_PRICE_STORE_DIR=self.store_dir):
+            with self.captureOnCommitCallbacks(execute=True):
+                ingest_time_series(time_series_payload(1)['Time Series (Daily)'], 'MSFT')
+
+            dates, closes = load_close_prices('MSFT')
+
+        self.assertEqual(dates.tolist(), [date.today()])
+        np.testing.assert_array_equal(closes, [11.0])
+
+    def test_store_is_synced_before_the_data_version_bump(self):
+        stored_at_bump = []
+
+        with override_settings(STOCKS_PRICE_BACKEND='columnar', STOCKS_PRICE_STORE_DIR=self.store_dir), \
+                mock.patch('stocks.ingestion.bump_data_version', side_effect=lambda symbol: stored_at_bump.append(get_store().read(symbol))):
+            with self.captureOnCommitCallbacks(execute=True):
+                ingest_time_series(time_series_payload(1)['Time Series (Daily)'], 'MSFT')
+
+        # Bumped with the rows, then once the file is rewritten
+        self.assertEqual(len(stored_at_bump), 2)
+        self.assertIsNone(stored_at_bump[0])
+        self.assertEqual(stored_at_bump[1].dates.astype(object).tolist(), [date.today()])
+
+
+class ResultCacheTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        dates = np.datetime64('2024-01-01') + np.arange(300)
+        closes = 100 + 10 * np.sin(np.arange(300) / 10)
+        StockData.objects.bulk_create([
+            StockData(symbol='AAPL', date=str(day), close_price=float(close)) for day, close in zip(dates, closes)
+        ])
+        self.url = reverse('backtest_strategy', kwargs={'symbol': 'AAPL', 'initial_investment': 1000})
+
+    def test_repeated_backtests_are_cached(self):
+        first = self.client.get(self.url)
+        with mock.patch('stocks.result_cache.compute_backtest') as compute:
+            second = self.client.get(self.url)
+            self.client.get(self.url, {'end': '2024-06-30'})
+
+        self.assertEqual(first.json(), second.json())
+        # Only the request with new parameters is computed
+        self.assertEqual(compute.call_count, 1)
+
+    def test_ingestion_invalidates_results(self):
+        first = self.client.get(self.url).json()
+
+        StockData.objects.filter(symbol='AAPL', date='2024-10-26').update(close_price=1.0)
+        self.assertEqual(self.client.get(self.url).json(), first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_time_series(time_series_payload(1)['Time Series (Daily)'], 'AAPL')
+        self.assertNotEqual(self.client.get(self.url).json(), first)
+
+    def test_data_version_is_shared_by_the_processes(self):
+        self.assertEqual(data_version('AAPL'), 0)
+        ingest_time_series(time_series_payload(1)['Time Series (Daily)'], 'AAPL')
+        self.assertEqual(data_version('AAPL'), 1)
+        self.assertEqual(data_version('MSFT'), 0)
+
+        # Stored in the database rather than in the cache of a process
+        get_cache().clear()
+        self.assertEqual(data_version('AAPL'), 1)
+        bump_data_version('AAPL')
+        self.assertEqual(DataVersion.objects.get(symbol='AAPL').version, 2)
+
+    def test_only_the_encoding_is_cached(self):
+        content = cached_backtest('AAPL', 1000)
+        self.assertIsInstance(content, bytes)
+        with mock.patch('stocks.result_cache.compute_backtest') as compute:
+            self.assertEqual(cached_backtest('AAPL', 1000), content)
+        compute.assert_not_called()
+
+        with self.assertRaises(LookupError):
+            cached_backtest('IBM', 1000)
+        self.assertEqual(self.client.get(reverse('backtest_strategy', kwargs={'symbol': 'IBM', 'initial_investment': 1000})).status_code, 404)
+
+    def test_report_uses_cached_result(self):
+        self.client.get(self.url)
+        with mock.patch('stocks.result_cache.compute_backtest') as compute:
+            response = self.client.get(reverse('generate_backtest_report', kwargs={'symbol': 'AAPL', 'initial_investment': 1000}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        compute.assert_not_called()
+
+
+class StrategyTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        rng = np.random.default_rng(7)
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 400)))
+        dates = np.datetime64('2024-01-01') + np.arange(len(closes))
+        StockData.objects.bulk_create([
+            StockData(symbol='AAPL', date=str(day), open_price=close, high_price=close * 1.01, low_price=close * 0.99, close_price=close, volume=1000)
+            for day, close in zip(dates, closes.tolist())
+        ])
+        self.prices = {'close': closes, 'high': closes * 1.01, 'low': closes * 0.99}
+        self.url = reverse('backtest_strategy', kwargs={'symbol': 'AAPL', 'initial_investment': 1000})
+
+    def test_moving_average_strategy_matches_reference(self):
+        result = compute_backtest('AAPL', 1000)
+        reference = compute_backtest_reference('AAPL', 1000)
+
+        self.assertEqual(result['strategy'], 'moving_average')
+        self.assertEqual(result['compute_data']['total_trades'], reference['compute_data']['total_trades'])
+        np.testing.assert_allclose(result['compute_data']['portfolio_values'], reference['compute_data']['portfolio_values'])
+        strategy_result = run_strategies(self.prices, [('moving_average', None)])[0]
+        engine_result = run_backtest(self.prices['close'])
+        self.assertEqual(strategy_result['total_trades'], engine_result['total_trades'])
+        np.testing.assert_array_equal(strategy_result['portfolio_values'], engine_result['portfolio_values'])
+
+    def test_indicators_are_shared(self):
+        indicators = IndicatorSet(self.prices)
+        run_strategies(self.prices, [('ema_crossover', {'fast_window': 10, 'slow_window': 20}), ('ema_crossover', {'fast_window': 20, 'slow_window': 50})], 1000, indicators)
+        # The 20 days EMA is computed once for both strategies
+        self.assertEqual(indicators.computed, 3)
+
+        results = run_strategies(self.prices, [(name, None) for name in STRATEGIES], 1000, indicators)
+        self.assertEqual(len(results), len(STRATEGIES))
+        computed = indicators.computed
+        run_strategies(self.prices, [(name, None) for name in STRATEGIES], 1000, indicators)
+        self.assertEqual(indicators.computed, computed)
+
+    def test_parse_strategies(self):
+        self.assertEqual(parse_strategies(None), [('moving_average', {})])
+        self.assertEqual(parse_strategies('rsi,bollinger', {'window': '10'}), [('rsi', {'window': '10'}), ('bollinger', {'window': '10'})])
+        for names, params in (('unknown', {}), ('rsi', {'width': '2'}), ('rsi,rsi', {})):
+            with self.assertRaises(ValueError):
+                parse_strategies(names, params)
+
+    def test_strategy_endpoint(self):
+        response = self.client.get(self.url, {'strategy': 'rsi', 'window': '10', 'lower': '35'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['strategy'], 'rsi')
+        self.assertEqual(response.json()['params'], {'window': 10, 'lower': 35.0, 'upper': 70.0})
+
+        response = self.client.get(self.url, {'strategy': 'rsi,atr_breakout,ema_crossover'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['strategy'] for entry in response.json()['strategies']], ['rsi', 'atr_breakout', 'ema_crossover'])
+
+        for params in ({'strategy': 'unknown'}, {'strategy': 'rsi', 'width': '2'}, {'strategy': 'rsi', 'window': '2.5'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+class ChartTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.values = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 10000)))
+        self.dates = (np.datetime64('2000-01-01') + np.arange(10000)).astype(str).tolist()
+
+    def test_downsampling_keeps_extremes(self):
+        kept = downsample_minmax(self.values, 100)
+        self.assertLessEqual(len(kept), 400)
+        self.assertTrue(np.all(np.diff(kept) > 0))
+        self.assertEqual((kept[0], kept[-1]), (0, 9999))
+
+        # Every bucket keeps its range of values
+        for bucket in np.array_split(np.arange(10000), 100):
+            bucket_kept = kept[(kept >= bucket[0]) & (kept <= bucket[-1])]
+            self.assertEqual(self.values[bucket_kept].min(), self.values[bucket].min())
+            self.assertEqual(self.values[bucket_kept].max(), self.values[bucket].max())
+
+        np.testing.assert_array_equal(downsample_minmax(self.values[:50], 100), np.arange(50))
+
+    def test_templates_render_like_new_figures(self):
+        render_chart('stock', self.values[:5000] * 2, 'Other', self.dates[:5000])
+        png = render_chart('stock', self.values, 'Stock Data for AAPL', self.dates)
+
+        self.assertTrue(png.startswith(b'\x89PNG'))
+        self.assertEqual(png, render_chart('stock', self.values, 'Stock Data for AAPL', self.dates, reuse=False))
+
+
+class ReportJobTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        artifact_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, artifact_dir)
+        settings_override = override_settings(STOCKS_ARTIFACT_DIR=artifact_dir, STOCKS_REPORT_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        dates = np.datetime64('2024-01-01') + np.arange(300)
+        closes = 100 + 10 * np.sin(np.arange(300) / 10)
+        StockData.objects.bulk_create([
+            StockData(symbol='AAPL', date=str(day), close_price=float(close)) for day, close in zip(dates, closes)
+        ])
+        self.url = reverse('submit_report_job', kwargs={'symbol': 'AAPL', 'initial_investment': 1000})
+
+    def test_report_job_lifecycle(self):
+        first = self.client.post(self.url)
+        second = self.client.post(self.url)
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(first.json()['id'], second.json()['id'])
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+        status_url = first.json()['status_url']
+        self.assertEqual(self.client.get(status_url).json()['status'], 'queued')
+        self.assertEqual(self.client.get(reverse('download_report', kwargs={'job_id': first.json()['id']})).status_code, 409)
+
+        self.assertEqual(process_report_jobs(), 1)
+        self.assertEqual(process_report_jobs(), 0)
+
+        status = self.client.get(status_url).json()
+        self.assertEqual(status['status'], 'done')
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+        self.assertEqual(download['ETag'], f'"{status["artifact"]}"')
+
+        # The done job is reused until the data of the symbol changes
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_time_series(time_series_payload(1)['Time Series (Daily)'], 'AAPL')
+        self.assertEqual(self.client.post(self.url).status_code, 202)
+        self.assertEqual(ReportJob.objects.count(), 2)
+
+    def test_failed_jobs_are_retried(self):
+        job, queued = submit_report('MSFT', 1000)
+        self.assertTrue(queued)
+        process_report_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.FAILED)
+        self.assertTrue(job.error)
+
+        job, queued = submit_report('MSFT', 1000)
+        self.assertTrue(queued)
+        self.assertEqual(job.status, ReportJob.QUEUED)
+
+    def test_jobs_are_claimed_once(self):
+        submit_report('AAPL', 1000)
+        self.assertIsNotNone(claim_next_job())
+        self.assertIsNone(claim_next_job())
+
+        # A job running for longer than the timeout is claimed again
+        ReportJob.objects.update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertIsNotNone(claim_next_job())
+
+    def test_worker_pool_scans_the_queue_without_submissions(self):
+        with mock.patch('stocks.report_jobs.process_report_jobs') as process:
+            pool = ReportWorkerPool(1, poll_interval=0.05)
+            deadline = time.monotonic() + 5
+            while process.call_count < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            pool.stop()
+
+        # Once at startup, then at every poll
+        self.assertGreaterEqual(process.call_count, 3)
+
+    def test_first_request_starts_the_workers(self):
+        request_started.connect(start_report_workers, dispatch_uid='stocks.start_report_workers')
+        with mock.patch('stocks.report_jobs.get_worker_pool') as get_worker_pool:
+            self.client.get('/metrics')
+            self.client.get('/metrics')
+
+        get_worker_pool.assert_called_once_with()
+
+    def test_identical_reports_share_artifacts(self):
+        # Different jobs, as the parameters differ, but the same backtest and document
+        submit_report('AAPL', 1000)
+        submit_report('AAPL', 1000, end=date(2024, 10, 26))
+        self.assertEqual(process_report_jobs(), 2)
+
+        self.assertEqual(len(set(ReportJob.objects.values_list('artifact', flat=True))), 1)
+        self.assertEqual(len(get_artifact_store().digests()), 1)
+
+        self.assertEqual(purge_report_jobs(0), (2, 1))
+
+        self.assertEqual(ReportJob.objects.count(), 0)
+        self.assertEqual(get_artifact_store().digests(), set())
+
+    def test_reports_render_concurrently(self):
+        backtest_result = compute_backtest('AAPL', 1000)
+        expected = build_backtest_report('AAPL', backtest_result)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            reports = list(executor.map(lambda _: build_backtest_report('AAPL', backtest_result), range(8)))
+        self.assertEqual(reports, [expected] * 8)
+
+
+class BatchReportTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        dates = np.datetime64('2024-01-01') + np.arange(300)
+        for symbol in ('AAPL', 'MSFT', 'GOOG'):
+            closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+            StockData.objects.bulk_create([
+                StockData(symbol=symbol, date=str(day), close_price=close) for day, close in zip(dates, closes.tolist())
+            ])
+
+    def page_count(self, pdf):
+        return len(re.findall(rb'/Type /Page\b', pdf))
+
+    def test_batch_report(self):
+        result = build_batch_report(['AAPL', 'MSFT', 'GOOG', 'NONE'], 1000, max_workers=1)
+
+        self.assertEqual(result['missing_symbols'], ['NONE'])
+        self.assertEqual(self.page_count(result['pdf']), 4)
+        returns = [entry['total_return'] for entry in result['summary']]
+        self.assertEqual(returns, sorted(returns, reverse=True))
+        for entry in result['summary']:
+            self.assertAlmostEqual(entry['total_return'], compute_backtest(entry['symbol'], 1000)['compute_data']['total_return'])
+
+        # Worker processes give the same document
+        self.assertEqual(build_batch_report(['AAPL', 'MSFT', 'GOOG', 'NONE'], 1000, max_workers=2)['pdf'], result['pdf'])
+
+    def test_batch_report_endpoint(self):
+        url = reverse('batch_backtest_report', kwargs={'initial_investment': 1000})
+        response = self.client.get(url, {'symbols': 'AAPL,NONE', 'strategy': 'rsi', 'window': '10'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['X-Missing-Symbols'], 'NONE')
+        self.assertEqual(self.page_count(response.content), 2)
+
+        self.assertEqual(self.client.get(url, {'symbols': 'NONE'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'strategy': 'rsi,bollinger'}).status_code, 400)
+
+
+class ResponseFormatTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        dates = np.datetime64('2020-01-01') + np.arange(2000)
+        closes = 100 + 10 * np.sin(np.arange(2000) / 10) + np.arange(2000) / 100
+        StockData.objects.bulk_create([
+            StockData(symbol='AAPL', date=str(day), close_price=close) for day, close in zip(dates, closes.tolist())
+        ])
+        self.url = reverse('backtest_strategy', kwargs={'symbol': 'AAPL', 'initial_investment': 1000})
+        self.records = self.client.get(self.url).json()
+
+    def test_columnar_format(self):
+        columnar = self.client.get(self.url, {'format': 'columnar'}).json()
+
+        self.assertEqual(columnar['compute_data'], self.records['compute_data'])
+        self.assertEqual(columnar['stock_data']['date'], [entry['date'] for entry in self.records['stock_data']])
+        self.assertEqual(columnar['stock_data']['close_price'], [entry['close_price'] for entry in self.records['stock_data']])
+
+    def test_points_and_precision(self):
+        reduced = self.client.get(self.url, {'format': 'columnar', 'points': '500', 'precision': '2'}).json()
+        dates = reduced['stock_data']['date']
+        values = reduced['compute_data']['portfolio_values']
+        full_values = self.records['compute_data']['portfolio_values']
+
+        self.assertLessEqual(len(dates), 500)
+        self.assertEqual(len(values), len(dates))
+        self.assertEqual((dates[0], dates[-1]), (self.records['stock_data'][0]['date'], self.records['stock_data'][-1]['date']))
+        self.assertAlmostEqual(max(values), max(full_values), places=2)
+        self.assertEqual(values, [round(value, 2) for value in values])
+
+        # Fewer points than the 4 days kept per series and bucket
+        for points in (2, 3, 7):
+            tiny = self.client.get(self.url, {'format': 'columnar', 'points': str(points), 'strategy': 'moving_average,rsi'}).json()
+            dates = tiny['stock_data']['date']
+            self.assertEqual(len(dates), points)
+            self.assertEqual((dates[0], dates[-1]), (self.records['stock_data'][0]['date'], self.records['stock_data'][-1]['date']))
+            self.assertTrue(all(len(entry['compute_data']['portfolio_values']) == points for entry in tiny['strategies']))
+
+    def test_streaming(self):
+        response = self.client.get(self.url, {'stream': '1'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), self.records)
+
+        document = {'values': list(range(5000)), 'nested': {'empty': [], 'text': 'a'}}
+        self.assertEqual(json.loads(b''.join(stream_json(document, chunk_size=100))), document)
+
+    def test_npy_format(self):
+        response = self.client.get(self.url, {'strategy': 'moving_average,rsi'}, HTTP_ACCEPT='application/x-npy')
+        self.assertEqual(response['Content-Type'], 'application/x-npy')
+        table = np.load(BytesIO(response.content), allow_pickle=False)
+        summary = json.loads(response['X-Backtest-Summary'])
+
+        self.assertEqual(table.dtype.names, ('date', 'close_price', 'portfolio_value_moving_average', 'portfolio_value_rsi'))
+        self.assertEqual(len(table), 2000)
+        self.assertEqual(table['date'][0], np.datetime64('2020-01-01'))
+        np.testing.assert_allclose(table['portfolio_value_moving_average'], self.records['compute_data']['portfolio_values'])
+        self.assertEqual(summary['strategies'][0]['compute_data']['total_trades'], self.records['compute_data']['total_trades'])
+
+    def test_invalid_options(self):
+        for params in ({'format': 'xml'}, {'points': '1'}, {'precision': '-1'}, {'format': 'npy', 'stream': '1'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+class StrategyStateTests(TestCase):
+
+    def setUp(self):
+        json_file_path = os.path.join(os.path.dirname(__file__), 'stockTestData', 'stock_data.json')
+        with open(json_file_path, 'r') as file:
+            self.rows = sorted(json.load(file).items())
+        settings_override = override_settings(STOCKS_STRATEGY_STATES='1000:50:200,5000:50:200')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def store(self, symbol, rows):
+        StockData.objects.bulk_create([StockData(symbol=symbol, date=date, **values) for date, values in rows])
+
+    def summary(self, symbol):
+        payload = strategy_state_payload(get_strategy_state(symbol, 5000))
+        return {key: payload[key] for key in ('bars', 'position', 'value', 'Max_Drawdown', 'total_trades', 'portfolio_values')}
+
+    def test_state_matches_backtest(self):
+        self.store('AAPL', self.rows)
+        payload = strategy_state_payload(get_strategy_state('AAPL', 5000))
+        expected = compute_backtest_reference('AAPL', 5000)['compute_data']
+
+        self.assertEqual(payload['bars'], len(self.rows))
+        self.assertEqual(payload['total_trades'], expected['total_trades'])
+        self.assertAlmostEqual(payload['total_return'], expected['total_return'], places=9)
+        # Days in cash do not depend on how open positions are valued
+        closes = np.array([values['close_price'] for _, values in self.rows], dtype=np.float64)
+        in_cash = ~position_states(closes < moving_average(closes, 50), closes > moving_average(closes, 200))
+        np.testing.assert_allclose(np.array(payload['portfolio_values'])[in_cash], np.array(expected['portfolio_values'])[in_cash])
+
+    def test_new_days_are_appended(self):
+        self.store('AAPL', self.rows[:-10])
+        get_strategy_state('AAPL', 5000)
+        self.store('AAPL', self.rows[-10:])
+
+        # Only the rows after the last advanced day are read
+        with CaptureQueriesContext(connection) as queries:
+            incremental = self.summary('AAPL')
+        self.store('MSFT', self.rows)
+
+        self.assertEqual(incremental, self.summary('MSFT'))
+        self.assertTrue(any('"stocks_stockdata"."date" >' in query['sql'] for query in queries))
+
+    def test_correction_of_last_day(self):
+        self.store('AAPL', self.rows)
+        get_strategy_state('AAPL', 5000)
+        last_date = self.rows[-1][0]
+        StockData.objects.filter(symbol='AAPL', date=last_date).update(close_price=1.0)
+
+        rows = self.rows[:-1] + [(last_date, {**self.rows[-1][1], 'close_price': 1.0})]
+        self.store('MSFT', rows)
+        self.assertEqual(self.summary('AAPL'), self.summary('MSFT'))
+
+    def test_strategy_state_view(self):
+        url = reverse('strategy_state', kwargs={'symbol': 'AAPL', 'initial_investment': 5000})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.store('AAPL', self.rows)
+        response = self.client.get(url, {'short': 20, 'long': 100, 'curve': '0'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['params'], {'initial_investment': 5000.0, 'ma_short': 20, 'ma_long': 100})
+        self.assertNotIn('portfolio_values', response.json())
+        self.assertEqual(self.client.get(url, {'short': 'x'}).status_code, 400)
+
+    def test_only_configured_parameters_are_persisted(self):
+        self.store('AAPL', self.rows[:-10])
+        persisted = strategy_state_payload(get_strategy_state('AAPL', 5000))
+        transient = strategy_state_payload(get_strategy_state('AAPL', 5000, 20, 100))
+        self.assertEqual(StrategyState.objects.count(), 1)
+
+        with override_settings(STOCKS_STRATEGY_STATES=''):
+            self.assertEqual(strategy_state_payload(get_strategy_state('AAPL', 5000)), persisted)
+        self.assertEqual(StrategyState.objects.count(), 1)
+        self.assertEqual(transient['params'], {'initial_investment': 5000.0, 'ma_short': 20, 'ma_long': 100})
+        self.assertEqual(len(transient['portfolio_values']), len(self.rows) - 10)
+
+        # Ingestion only advances the persisted states
+        self.store('AAPL', self.rows[-10:])
+        advance_symbol_states('AAPL')
+        self.assertEqual(StrategyState.objects.get().bars, len(self.rows))
+
+
+class IngestionTests(TestCase):
+
+    def time_series(self, days, offset=0):
+        # Alpha Vantage shaped payload, newest day first
+        today = date.today()
+        return {
+            (today - timedelta(days=offset + i)).isoformat(): {
+                '1. open': '10.0', '2. high': '12.0', '3. low': '9.0',
+                '4. close': str(11.0 + i), '5. volume': '1000',
+            }
+            for i in range(days)
+        }
+
+    def test_first_ingest_inserts_rows_within_cutoff(self):
+        data = self.time_series(5)
+        data['1990-01-02'] = data[date.today().isoformat()]
+
+        counts = ingest_time_series(data, 'AAPL', batch_size=2)
+
+        self.assertEqual(counts, {'inserted': 5, 'updated': 0, 'skipped': 1})
+        self.assertEqual(StockData.objects.filter(symbol='AAPL').count(), 5)
+
+    def test_incremental_ingest_keeps_other_symbols(self):
+        ingest_time_series(self.time_series(5, offset=1), 'AAPL')
+        ingest_time_series(self.time_series(3), 'MSFT')
+
+        data = self.time_series(6)
+        data[(date.today() - timedelta(days=1)).isoformat()]['4. close'] = '99.0'
+        counts = ingest_time_series(data, 'AAPL')
+
+        self.assertEqual(counts, {'inserted': 1, 'updated': 1, 'skipped': 4})
+        self.assertEqual(StockData.objects.filter(symbol='AAPL').count(), 6)
+        self.assertEqual(StockData.objects.filter(symbol='MSFT').count(), 3)
+        self.assertEqual(StockData.objects.get(symbol='AAPL', date=date.today() - timedelta(days=1)).close_price, 99.0)
+
+    def test_rows_are_read_one_batch_at_a_time(self):
+        read, read_at_write = [], []
+
+        def rows():
+            for row in parse_time_series(self.time_series(5)):
+                read.append(row)
+                yield row
+
+        with mock.patch('stocks.ingestion._write_batch', side_effect=lambda batch: read_at_write.append(len(read))):
+            counts = ingest_rows('AAPL', rows(), batch_size=2)
+
+        self.assertEqual(counts['inserted'], 5)
+        # Each batch is written before the next one is read
+        self.assertEqual(read_at_write, [2, 4, 5])
+
+    def test_parse_errors_are_logged(self):
+        series = self.time_series(2)
+        series['2024-01-02'] = {'4. close': 'n/a'}
+
+        with self.assertLogs('stocks.ingestion', 'WARNING') as logs:
+            rows = list(parse_time_series(series))
+        self.assertEqual(len(rows), 2)
+        self.assertIn('2024-01-02', logs.output[0])
+
+
+class PortfolioBacktestTests(TestCase):
+
+    def setUp(self):
+        json_file_path = os.path.join(os.path.dirname(__file__), 'stockTestData', 'stock_data.json')
+
+        with open(json_file_path, 'r') as file:
+            json_data = json.load(file)
+
+        StockData.objects.bulk_create([
+            StockData(symbol='AAPL', date=date, **values) for date, values in json_data.items()
+        ])
+        # Second symbol with a shorter history and different prices
+        StockData.objects.bulk_create([
+            StockData(symbol='MSFT', date=date, close_price=float(values['close_price']) * 1.5 + i % 7)
+            for i, (date, values) in enumerate(list(json_data.items())[:300])
+        ])
+
+    def test_single_symbol_matches_backtest(self):
+        result = compute_portfolio_backtest(['AAPL'], 5000, max_workers=1)
+        expected = compute_backtest('AAPL', 5000)['compute_data']
+
+        self.assertAlmostEqual(expected['total_return'], result['compute_data']['total_return'])
+        self.assertAlmostEqual(expected['Max_Drawdown'], result['compute_data']['Max_Drawdown'])
+        self.assertEqual(expected['portfolio_values'], result['compute_data']['portfolio_values'])
+
+    def test_parallel_matches_sequential(self):
+        sequential = compute_portfolio_backtest(['AAPL', 'MSFT', 'IBM'], 9000, [2, 1, 1], max_workers=1)
+        parallel = compute_portfolio_backtest(['AAPL', 'MSFT', 'IBM'], 9000, [2, 1, 1], max_workers=2)
+
+        self.assertEqual(sequential, parallel)
+        self.assertEqual(parallel['missing_symbols'], ['IBM'])
+        self.assertEqual(len(parallel['dates']), 501)
+        self.assertAlmostEqual(
+            sum(contribution['contribution'] for contribution in parallel['contributions'].values()),
+            parallel['compute_data']['total_return'],
+        )
+
+    def test_invalid_weights(self):
+        response = self.client.get(reverse('portfolio_backtest', kwargs={'initial_investment': 5000}), {'symbols': 'AAPL,MSFT', 'weights': '1'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ParameterSweepTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 400)))
+
+    def test_sweep_matches_single_backtests(self):
+        results = sweep_moving_average(self.closes, [5, 20, 50], [30, 200], [1000, 5000])
+
+        self.assertEqual(len(results), 12)
+        self.assertEqual(results, sorted(results, key=lambda row: -row['total_return']))
+        for row in results:
+            expected = run_backtest(
+                self.closes,
+                row['initial_investment'],
+                moving_average(self.closes, row['short_window']),
+                moving_average(self.closes, row['long_window']),
+            )
+            self.assertAlmostEqual(float(expected['total_return']), row['total_return'], places=9)
+            self.assertAlmostEqual(float(expected['Max_Drawdown']), row['Max_Drawdown'], places=9)
+            self.assertEqual(int(expected['total_trades']), row['total_trades'])
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('10:50:20'), [10, 30, 50])
+        self.assertEqual(parse_range('200,50'), [50, 200])
+        with self.assertRaises(ValueError):
+            parse_range('10:5:-1')
+        # Too many values, rejected without generating them
+        with self.assertRaises(ValueError):
+            parse_range('2:1e12')
+        with self.assertRaises(ValueError):
+            parse_range('2:inf')
+
+    def test_sweep_limits(self):
+        with mock.patch('stocks.sweep.run_backtest') as backtest:
+            with self.assertRaises(ValueError):
+                sweep_moving_average(self.closes, range(2, 102), range(2, 102), [1000, 2000])
+            with self.assertRaises(ValueError):
+                sweep_moving_average(self.closes, [5], [len(self.closes) + 1])
+        backtest.assert_not_called()
+
+        self.assertEqual(len(sweep_moving_average(self.closes, [5], [len(self.closes)])), 1)
+
+    def test_sweep_endpoint(self):
+        StockData.objects.bulk_create([
+            StockData(symbol='AAPL', date=str(np.datetime64('2020-01-01') + i), close_price=float(close))
+            for i, close in enumerate(self.closes)
+        ])
+        response = self.client.get(reverse('backtest_sweep', kwargs={'symbol': 'AAPL'}), {'short': '10:50:10', 'long': '100,200', 'limit': 3})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['combinations'], 10)
+        self.assertEqual(len(response.json()['results']), 3)
+
+        for params in ({'short': '2:400', 'long': '2:400'}, {'long': '1000'}, {'short': '2:1e12'}):
+            self.assertEqual(self.client.get(reverse('backtest_sweep', kwargs={'symbol': 'AAPL'}), params).status_code, 400)
+
+
+class ModelRegistryTests(TestCase):
+
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir)
+        self.artifact = os.path.join(self.model_dir, f'{DEFAULT_MODEL}.pkl')
+        shutil.copy(os.path.join(MODEL_DIR, f'{DEFAULT_MODEL}.pkl'), self.artifact)
+
+    def test_model_is_loaded_once(self):
+        registry = ModelRegistry(self.model_dir, max_bytes=10 ** 6, hot_reload=True)
+
+        entry = registry.get(DEFAULT_MODEL)
+        self.assertIs(entry, registry.get(DEFAULT_MODEL))
+        self.assertEqual(entry.version, 'default')
+        self.assertEqual(entry.model.predict(np.array([[100.0]])).shape, (1,))
+
+    def test_hot_reload_and_versions(self):
+        registry = ModelRegistry(self.model_dir, max_bytes=10 ** 6, hot_reload=True)
+        entry = registry.get(DEFAULT_MODEL)
+
+        os.utime(self.artifact, ns=(entry.mtime_ns + 10 ** 9, entry.mtime_ns + 10 ** 9))
+        self.assertIsNot(entry, registry.get(DEFAULT_MODEL))
+
+        os.makedirs(os.path.join(self.model_dir, DEFAULT_MODEL))
+        shutil.copy(self.artifact, os.path.join(self.model_dir, DEFAULT_MODEL, 'v2.pkl'))
+        self.assertEqual(registry.versions(DEFAULT_MODEL), ['default', 'v2'])
+        self.assertEqual(registry.get(DEFAULT_MODEL).version, 'v2')
+
+        shutil.copy(self.artifact, os.path.join(self.model_dir, DEFAULT_MODEL, 'v10.pkl'))
+        self.assertEqual(registry.versions(DEFAULT_MODEL), ['default', 'v2', 'v10'])
+        self.assertEqual(registry.get(DEFAULT_MODEL).version, 'v10')
+        self.assertEqual(sorted(['20240102T000000000000', '20231231T235959999999'], key=version_key), ['20231231T235959999999', '20240102T000000000000'])
+
+    def test_lru_eviction(self):
+        os.makedirs(os.path.join(self.model_dir, DEFAULT_MODEL))
+        for version in ('v1', 'v2'):
+            shutil.copy(self.artifact, os.path.join(self.model_dir, DEFAULT_MODEL, f'{version}.pkl'))
+        registry = ModelRegistry(self.model_dir, max_bytes=os.path.getsize(self.artifact), hot_reload=False)
+
+        first = registry.get(DEFAULT_MODEL, 'v1')
+        registry.get(DEFAULT_MODEL, 'v2')
+        self.assertIsNot(first, registry.get(DEFAULT_MODEL, 'v1'))
+
+    def test_invalid_model(self):
+        with open(self.artifact, 'wb') as file:
+            file.write(b'not a model')
+        registry = ModelRegistry(self.model_dir, max_bytes=10 ** 6, hot_reload=True)
+
+        with self.assertRaises(InvalidModelError):
+            registry.get(DEFAULT_MODEL)
+
+    def test_paths_outside_the_model_dir_are_rejected(self):
+        outside_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outside_dir)
+        shutil.copy(self.artifact, os.path.join(outside_dir, 'evil.pkl'))
+        os.makedirs(os.path.join(self.model_dir, DEFAULT_MODEL))
+        registry = ModelRegistry(self.model_dir, max_bytes=10 ** 6, hot_reload=True)
+        traversal = os.path.relpath(os.path.join(outside_dir, 'evil'), self.model_dir)
+
+        with mock.patch.object(registry, '_load') as load:
+            for name, version in ((traversal, DEFAULT_VERSION), (traversal, None), (DEFAULT_MODEL, f'../{traversal}'),
+                                  (os.path.join(outside_dir, 'evil'), DEFAULT_VERSION), ('..', None)):
+                with self.assertRaises(ModelNotFoundError):
+                    registry.get(name, version)
+        load.assert_not_called()
+
+
+def ar_closes(rng, days, phi=0.3):
+    # Closes whose log returns follow an AR(1) process, so the next return is predictable
+    returns = np.zeros(days)
+    shocks = rng.normal(0, 0.01, days)
+    for day in range(1, days):
+        returns[day] = phi * returns[day - 1] + shocks[day]
+    return 100 * np.exp(np.cumsum(returns))
+
+
+class TrainingTests(TestCase):
+
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir)
+
+        rng = np.random.default_rng(5)
+        dates = np.datetime64('2020-01-01') + np.arange(600)
+        for symbol, days in (('AAPL', 600), ('MSFT', 600), ('TINY', 40)):
+            StockData.objects.bulk_create([
+                StockData(symbol=symbol, date=str(day), close_price=close) for day, close in zip(dates[-days:], ar_closes(rng, days).tolist())
+            ])
+
+    def test_features_match_definition(self):
+        closes = 100 + np.arange(40.0) + np.sin(np.arange(40))
+        features = {'lags': 2, 'windows': [3]}
+        X, y, rows = build_features(closes, features)
+        returns = np.diff(np.log(closes), prepend=np.nan)
+
+        self.assertEqual(X.shape, (37, 5))
+        self.assertEqual(rows[0], 3)
+        i = 10
+        row = X[rows.tolist().index(i)]
+        np.testing.assert_allclose(row, [
+            returns[i], returns[i - 1],
+            returns[i - 2:i + 1].mean(), returns[i - 2:i + 1].std(), np.log(closes[i] / closes[i - 2:i + 1].mean()),
+        ])
+        self.assertAlmostEqual(y[rows.tolist().index(i)], returns[i + 1])
+        self.assertTrue(np.isnan(y[-1]))
+
+    def test_walk_forward_splits(self):
+        times = np.repeat(np.arange(60), 2)
+        splits = walk_forward_splits(times, 5)
+
+        self.assertEqual(len(splits), 5)
+        for train, test in splits:
+            self.assertLess(times[train].max(), times[test].min())
+        self.assertEqual(sum(len(test) for _, test in splits), 100)
+
+    def test_train_and_register(self):
+        for mode in ('per_symbol', 'pooled'):
+            model, report = train_return_model(mode=mode, max_workers=1)
+            self.assertEqual(report['skipped_symbols'], ['TINY'])
+            self.assertLess(report['metrics']['rmse'], report['metrics']['baseline_rmse'])
+
+        model, report = train_return_model(['AAPL', 'MSFT'], max_workers=2)
+        self.assertEqual(model.symbols, ['AAPL', 'MSFT'])
+        version, path = save_model(model, report, 'return_model', self.model_dir, mode='per_symbol')
+
+        entry = ModelRegistry(self.model_dir, max_bytes=10 ** 6, hot_reload=False).get('return_model')
+        self.assertEqual(entry.version, version)
+        self.assertEqual(entry.metadata['n_features'], 11)
+        self.assertIn('AAPL', entry.metadata['symbols'])
+
+        X = np.random.default_rng(0).normal(0, 0.01, (3, 11))
+        predictions = entry.model.predict(X, ['AAPL', 'MSFT', 'TINY'])
+        self.assertAlmostEqual(predictions[0], X[0] @ model.coef[0] + model.intercept[0])
+        self.assertAlmostEqual(predictions[2], entry.model.predict(X[2:])[0])
+
+    def test_models_are_written_to_the_configured_directory(self):
+        model, report = train_return_model(['AAPL'], max_workers=1)
+        with override_settings(STOCKS_MODEL_DIR=self.model_dir):
+            version, path = save_model(model, report)
+            registry = ModelRegistry(max_bytes=10 ** 6, hot_reload=False)
+
+        self.assertEqual(path, os.path.join(self.model_dir, 'return_model', f'{version}.pkl'))
+        self.assertEqual(registry.get('return_model').version, version)
+        self.assertFalse(os.path.exists(os.path.join(MODEL_DIR, 'return_model', f'{version}.pkl')))
+
+
+class PredictionTests(TestCase):
+
+    def setUp(self):
+        today = date.today()
+        for symbol, base in (('AAPL', 100.0), ('MSFT', 300.0)):
+            StockData.objects.bulk_create([
+                StockData(symbol=symbol, date=today - timedelta(days=i), close_price=base + i) for i in range(40)
+            ])
+
+    def test_predictions_use_trailing_closes_in_one_batch(self):
+        # The latest dates, then the trailing closes, read per symbol where LIMIT is not allowed in a UNION
+        queries = 2 if connection.features.supports_slicing_ordering_in_compound else 3
+        with mock.patch('stocks.prediction.refresh_symbol') as refresh_symbol, self.assertNumQueries(queries):
+            predictions = predict_many(['AAPL', 'MSFT'])
+
+        refresh_symbol.assert_not_called()
+        dates, values = predictions['MSFT']
+        self.assertEqual(len(dates), 30)
+        self.assertEqual(dates[-1], np.datetime64(date.today(), 'D'))
+        self.assertTrue((np.diff(dates) > np.timedelta64(0, 'D')).all())
+        self.assertEqual(values.shape, (30,))
+        self.assertGreater(values[0], values[-1])
+
+    def test_stale_symbol_is_refreshed(self):
+        StockData.objects.filter(symbol='MSFT', date__gt=date.today() - timedelta(days=10)).delete()
+
+        with mock.patch('stocks.prediction.refresh_symbol') as refresh_symbol:
+            predict_many(['AAPL', 'MSFT'])
+
+        refresh_symbol.assert_called_once_with('MSFT')
+
+    def test_missing_symbol(self):
+        with mock.patch('stocks.prediction.refresh_symbol'):
+            response = self.client.get(reverse('predict_prices', kwargs={'symbol': 'IBM'}))
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_failed_refresh_is_not_a_server_error(self):
+        StockData.objects.filter(symbol='MSFT', date__gt=date.today() - timedelta(days=10)).delete()
+
+        with mock.patch('stocks.prediction.refresh_symbol', side_effect=MarketDataError('Upstream down')):
+            with self.assertLogs('stocks.prediction', 'WARNING'):
+                response = self.client.get(reverse('predict_prices', kwargs={'symbol': 'MSFT'}))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('MSFT', response.json()['error'])
+
+    def test_model_path_traversal_is_rejected(self):
+        url = reverse('predict_prices', kwargs={'symbol': 'AAPL'})
+        with mock.patch('stocks.prediction.refresh_symbol'):
+            for params in ({'model': '../../../../tmp/evil'}, {'version': '../../../tmp/evil'}):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('Invalid', response.json()['error'])
+
+
+
+class ForecastTests(TestCase):
+
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir)
+
+        rng = np.random.default_rng(7)
+        dates = np.busday_offset('2022-01-03', np.arange(300))
+        for symbol in ('AAPL', 'MSFT'):
+            StockData.objects.bulk_create([
+                StockData(symbol=symbol, date=str(day), close_price=close) for day, close in zip(dates, ar_closes(rng, 300).tolist())
+            ])
+        StockData.objects.bulk_create([
+            StockData(symbol='TINY', date=str(day), close_price=100.0 + i) for i, day in enumerate(dates[:10])
+        ])
+
+        model, report = train_return_model(['AAPL', 'MSFT'], max_workers=1)
+        save_model(model, report, 'return_model', self.model_dir)
+        self.registry = ModelRegistry(self.model_dir, max_bytes=10 ** 6, hot_reload=False)
+
+    def test_latest_features_match_build_features(self):
+        closes = ar_closes(np.random.default_rng(1), 2 * 40).reshape(2, 40)
+        features = {'lags': 3, 'windows': [5, 10]}
+        X = latest_features(closes, features)
+
+        for series, row in zip(closes, X):
+            np.testing.assert_allclose(row, build_features(series, features)[0][-1])
+
+    def test_forecasts_are_batched_over_business_days(self):
+        with mock.patch('stocks.prediction.get_registry', return_value=self.registry), \
+                mock.patch.object(self.registry.get('return_model').model, 'predict', wraps=self.registry.get('return_model').model.predict) as predict:
+            result = forecast_many(['AAPL', 'MSFT', 'TINY', 'IBM'], horizon=5, refresh=False)
+
+        self.assertEqual(predict.call_count, 5)
+        self.assertEqual(result['horizon'], 5)
+        self.assertEqual(result['version'], self.registry.versions('return_model')[-1])
+        self.assertEqual(result['missing_symbols'], ['TINY', 'IBM'])
+        forecast = result['forecasts']['AAPL']
+        self.assertEqual(len(forecast['predictions']), 5)
+        self.assertTrue(np.all(np.is_busday(np.array(forecast['dates'], dtype='datetime64[D]'))))
+        self.assertGreater(forecast['dates'][0], forecast['last_date'])
+        self.assertTrue(all(abs(np.log(value / forecast['last_close'])) < 0.1 for value in forecast['predictions']))
+
+    def test_model_path_traversal_is_rejected(self):
+        with mock.patch('stocks.prediction.get_registry', return_value=self.registry):
+            for params in ({'model': '../../../../tmp/evil'}, {'model': 'return_model', 'version': '../../evil'}):
+                response = self.client.get(reverse('forecast_prices'), {'symbols': 'AAPL', 'refresh': '0', **params})
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('Invalid', response.json()['error'])
+
+    def test_legacy_model_is_applied_recursively(self):
+        result = forecast_many(['AAPL'], horizon=3, model_name=DEFAULT_MODEL, refresh=False)
+
+        model = ModelRegistry(MODEL_DIR).get(DEFAULT_MODEL).model
+        forecast = result['forecasts']['AAPL']
+        expected = forecast['last_close']
+        for value in forecast['predictions']:
+            expected = model.predict([[expected]])[0]
+            self.assertAlmostEqual(value, expected)
+
+    def test_forecast_view(self):
+        with mock.patch('stocks.prediction.get_registry', return_value=self.registry):
+            response = self.client.get(reverse('forecast_prices'), {'symbols': 'AAPL,MSFT', 'horizon': '2', 'refresh': '0'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(sorted(response.json()['forecasts']), ['AAPL', 'MSFT'])
+
+            self.assertEqual(self.client.get(reverse('forecast_prices'), {'symbols': 'AAPL', 'horizon': '0', 'refresh': '0'}).status_code, 400)
+            self.assertEqual(self.client.get(reverse('forecast_prices'), {'symbols': ''}).status_code, 400)
+            self.assertEqual(self.client.get(reverse('forecast_prices'), {'symbols': 'IBM', 'refresh': '0'}).status_code, 404)
+            self.assertEqual(self.client.get(reverse('forecast_prices'), {'symbols': 'AAPL', 'model': 'unknown', 'refresh': '0'}).status_code, 404)
+
+            symbols = ','.join(f'S{i}' for i in range(MAX_SYMBOLS + 1))
+            with mock.patch('stocks.prediction.refresh_symbol') as refresh_symbol:
+                self.assertEqual(self.client.get(reverse('forecast_prices'), {'symbols': symbols}).status_code, 400)
+            refresh_symbol.assert_not_called()
+
+    def test_failed_refresh_is_a_missing_symbol(self):
+        def refresh(symbol):
+            if symbol == 'MSFT':
+                raise requests.exceptions.ConnectionError('Upstream down')
+
+        with mock.patch('stocks.prediction.get_registry', return_value=self.registry), \
+                mock.patch('stocks.prediction.refresh_symbol', side_effect=refresh) as refresh_symbol, \
+                self.assertLogs('stocks.prediction', 'WARNING'):
+            response = self.client.get(reverse('forecast_prices'), {'symbols': 'AAPL,MSFT', 'horizon': '2'})
+
+        self.assertEqual(refresh_symbol.call_count, 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()['forecasts']), ['AAPL'])
+        self.assertEqual(response.json()['missing_symbols'], ['MSFT'])
+
+
+
+class BenchmarkTests(TestCase):
+
+    def test_synthetic_prices_are_seeded_per_symbol(self):
+        first = synthetic_market(['AAA', 'BBB'], 1, seed=3)
+        second = synthetic_market(['BBB'], 1, seed=3)
+        ohlcv = first['BBB']
+
+        np.testing.assert_array_equal(ohlcv['close'], second['BBB']['close'])
+        self.assertFalse(np.array_equal(ohlcv['close'], first['AAA']['close']))
+        self.assertEqual(len(ohlcv['close']), 252)
+        self.assertTrue(np.all(np.is_busday(ohlcv['date'])))
+        self.assertTrue(np.all(np.diff(ohlcv['date']).astype(int) > 0))
+        self.assertTrue(np.all(ohlcv['high'] >= np.maximum(ohlcv['open'], ohlcv['close'])))
+        self.assertTrue(np.all(ohlcv['low'] <= np.minimum(ohlcv['open'], ohlcv['close'])))
+
+    def test_synthetic_payload_is_ingested(self):
+        ohlcv = gbm_ohlcv('SYN', 100, end=date.today())
+        counts = ingest_time_series(alpha_vantage_payload(ohlcv), 'SYN')
+
+        self.assertEqual(counts['inserted'], 100)
+        stored = StockData.objects.filter(symbol='SYN').order_by('date').last()
+        self.assertEqual(stored.date, ohlcv['date'][-1].astype(object))
+        self.assertAlmostEqual(stored.close_price, ohlcv['close'][-1], places=3)
+
+    def test_run_benchmarks(self):
+        self.assertEqual(synthetic_symbols(2), ['SYN000', 'SYN001'])
+        self.assertEqual(parse_size('10x2.5'), (10, 2.5))
+        with self.assertRaises(ValueError):
+            parse_size('10')
+
+        results = run_benchmarks(sizes=[(2, 0.5)], repeat=1)
+
+        self.assertEqual(sorted(results['cases']), ['backtest[2x0.5]', 'ingestion[2x0.5]', 'prediction[2x0.5]', 'report[2x0.5]'])
+        backtest = results['cases']['backtest[2x0.5]']
+        self.assertEqual(backtest['rows'], 2 * 126)
+        self.assertEqual(backtest['queries'], 2)
+        self.assertGreater(backtest['peak_bytes'], 0)
+        self.assertEqual(StockData.objects.count(), 2 * 126)
+
+    def test_regressions_are_reported(self):
+        baseline = {'cases': {'backtest[1x2]': {'seconds': 1.0, 'queries': 1, 'peak_bytes': 1000}}}
+        results = {'cases': {
+            'backtest[1x2]': {'seconds': 1.2, 'queries': 1, 'peak_bytes': 1000},
+            'report[1x2]': {'seconds': 9.0, 'queries': 9, 'peak_bytes': 9000},
+        }}
+        self.assertEqual(compare_results(results, baseline), [])
+
+        results['cases']['backtest[1x2]'] = {'seconds': 1.3, 'queries': 2, 'peak_bytes': 2000}
+        self.assertEqual(len(compare_results(results, baseline)), 3)
+        self.assertEqual(compare_results(results, baseline, threshold=1.5), ['backtest[1x2]: 2 queries, baseline 1'])
+
+
+
+class AlphaVantageStubTests(TestCase):
+
+    def stub(self, **kwargs):
+        stub = AlphaVantageStub(**kwargs).start()
+        self.addCleanup(stub.stop)
+        return stub, AlphaVantageClient(stub.url, api_key='test', max_retries=0, cache_ttl=0)
+
+    def test_synthetic_time_series(self):
+        stub, client = self.stub()
+
+        compact = client.get_daily_time_series('AAPL', 'compact')
+        full = client.get_daily_time_series('AAPL', 'full')
+
+        self.assertEqual(len(compact), 100)
+        self.assertEqual(len(full), 504)
+        self.assertEqual(list(compact), sorted(compact, reverse=True))
+        self.assertEqual(compact, {day: full[day] for day in compact})
+        self.assertNotEqual(full, client.get_daily_time_series('MSFT', 'full'))
+        self.assertEqual(stub.stats['served'], 3)
+
+    def test_recorded_time_series(self):
+        data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_dir)
+        with open(os.path.join(data_dir, 'AAPL.json'), 'w') as recorded_file:
+            json.dump(time_series_payload(5), recorded_file)
+        stub, client = self.stub(data_dir=data_dir)
+
+        self.assertEqual(client.get_daily_time_series('AAPL'), time_series_payload(5)['Time Series (Daily)'])
+        with self.assertRaises(MarketDataError):
+            client.get_daily_time_series('MSFT')
+
+    def test_latency_errors_and_rate_limits(self):
+        stub, client = self.stub(latency=0.05)
+        start = time.perf_counter()
+        client.get_daily_time_series('AAPL')
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+
+        stub, client = self.stub(error_rate=1.0)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            client.get_daily_time_series('AAPL')
+
+        stub, client = self.stub(rate_limit=1)
+        client.get_daily_time_series('AAPL')
+        with self.assertRaises(RateLimitError):
+            client.get_daily_time_series('MSFT')
+
+        stub, client = self.stub(rate_limit=1, rate_limit_status=429)
+        client.get_daily_time_series('AAPL')
+        with self.assertRaises(requests.exceptions.HTTPError):
+            client.get_daily_time_series('MSFT')
+        self.assertEqual(stub.stats['rate_limited'], 1)
+
+    def test_load_test(self):
+        self.assertEqual(load_targets(['backtest'], ['AAPL', 'MSFT'], 500), [
+            ('backtest', '/backtest/AAPL/500/'), ('backtest', '/backtest/MSFT/500/'),
+        ])
+        with self.assertRaises(ValueError):
+            load_targets(['unknown'])
+
+        stub, _ = self.stub(latency=0.01, error_rate=0.5)
+        base_url = stub.url[:-len('/query')]
+        targets = [('daily', '/query?function=TIME_SERIES_DAILY&symbol=AAPL'), ('invalid', '/query?function=UNKNOWN')]
+        results = run_load_test(base_url, targets, total_requests=40, concurrency=4)
+
+        self.assertEqual(results['all']['requests'], 40)
+        self.assertEqual(results['endpoints']['daily']['requests'], 20)
+        self.assertEqual(results['all']['errors'], stub.stats['errors'])
+        self.assertEqual(sum(results['statuses'].values()), 40)
+        self.assertGreaterEqual(results['all']['p50_ms'], 10)
+        self.assertLessEqual(results['all']['p50_ms'], results['all']['p95_ms'])
+        self.assertLessEqual(results['all']['p95_ms'], results['all']['p99_ms'])
+
+
+
+def increment_in_child(amount):
+    # Records a request in a forked process and writes its metrics file
+    metrics.REQUESTS.inc(amount, route='child', method='GET', status=200)
+    metrics.flush()
+
+
+def increment_in_pool(amount):
+    # Records a request in a worker process of a pool
+    metrics.REQUESTS.inc(amount, route='pool', method='GET', status=200)
+    return amount * 10
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        dates = np.datetime64('2024-01-01') + np.arange(300)
+        StockData.objects.bulk_create([
+            StockData(symbol='AAPL', date=str(day), close_price=100 + 10 * np.sin(i / 10)) for i, day in enumerate(dates)
+        ])
+
+    def sample(self, text, line_start):
+        return [float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(line_start)]
+
+    def test_requests_and_stages_are_exposed(self):
+        url = reverse('backtest_strategy', kwargs={'symbol': 'AAPL', 'initial_investment': 1000})
+        body = self.client.get(url).content
+        self.client.get(url, {'stream': '1'}).getvalue()
+        self.client.get(url, {'strategy': 'unknown'})
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+
+        self.assertEqual(self.sample(text, 'stocks_http_requests_total{route="backtest_strategy",method="GET",status="200"}'), [2])
+        self.assertEqual(self.sample(text, 'stocks_http_requests_total{route="backtest_strategy",method="GET",status="400"}'), [1])
+        self.assertEqual(self.sample(text, 'stocks_http_request_duration_seconds_count{route="backtest_strategy"}'), [3])
+        self.assertEqual(self.sample(text, 'stocks_http_request_duration_seconds_bucket{route="backtest_strategy",le="+Inf"}'), [3])
+        self.assertGreater(self.sample(text, 'stocks_http_response_bytes_total{route="backtest_strategy"}')[0], len(body))
+        self.assertGreaterEqual(self.sample(text, 'stocks_db_queries_total{route="backtest_strategy"}')[0], 1)
+        self.assertGreaterEqual(self.sample(text, 'stocks_stage_duration_seconds_count{stage="backtest_compute"}')[0], 1)
+        self.assertIn('# TYPE stocks_stage_duration_seconds histogram', text)
+
+    def test_report_stages(self):
+        self.client.get(reverse('generate_backtest_report', kwargs={'symbol': 'AAPL', 'initial_investment': 1000}))
+        text = metrics.render_metrics()
+
+        self.assertEqual(self.sample(text, 'stocks_stage_duration_seconds_count{stage="chart_render"}'), [2])
+        self.assertEqual(self.sample(text, 'stocks_stage_duration_seconds_count{stage="pdf_assembly"}'), [1])
+
+    def test_streamed_download_is_an_upstream_fetch(self):
+        def slow_rows(client, symbol, stop_before=None):
+            for row in parse_time_series(time_series_payload(3)['Time Series (Daily)']):
+                time.sleep(0.1)
+                yield row
+
+        with mock.patch('stocks.views.stream_daily_rows', side_effect=slow_rows):
+            response = self.client.get(reverse('fetch_data', kwargs={'symbol': 'MSFT'}))
+        self.assertEqual(response.json()['inserted'], 3)
+
+        text = metrics.render_metrics()
+        self.assertEqual(self.sample(text, 'stocks_stage_duration_seconds_count{stage="upstream_fetch"}'), [1])
+        self.assertGreaterEqual(self.sample(text, 'stocks_stage_duration_seconds_sum{stage="upstream_fetch"}')[0], 0.3)
+        self.assertLess(self.sample(text, 'stocks_stage_duration_seconds_sum{stage="db_ingest"}')[0], 0.3)
+
+    def test_async_requests_stay_async(self):
+        async def view(request):
+            return HttpResponse(b'async')
+
+        middleware = MetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertEqual(async_to_sync(middleware)(RequestFactory().get('/x')).content, b'async')
+        self.assertEqual(self.sample(metrics.render_metrics(), 'stocks_http_requests_total{route="unmatched",method="GET",status="200"}'), [1])
+
+        # No middleware of the ASGI handler forces the chain into sync mode
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            handler = ASGIHandler()
+        self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+
+    def test_histogram_format(self):
+        histogram = metrics.Histogram('test_duration_seconds', 'Test durations.', ('route',), buckets=(0.1, 1.0, float('inf')))
+        self.addCleanup(metrics.METRICS.pop, 'test_duration_seconds')
+        for value in (0.05, 0.5, 0.7, 5):
+            histogram.observe(value, route='a"b')
+
+        lines = [line for line in metrics.render_metrics().splitlines() if line.startswith('test_duration_seconds')]
+        self.assertEqual(lines, [
+            'test_duration_seconds_bucket{route="a\\"b",le="0.1"} 1',
+            'test_duration_seconds_bucket{route="a\\"b",le="1.0"} 3',
+            'test_duration_seconds_bucket{route="a\\"b",le="+Inf"} 4',
+            'test_duration_seconds_sum{route="a\\"b"} 6.25',
+            'test_duration_seconds_count{route="a\\"b"} 4',
+        ])
+        with self.assertRaises(ValueError):
+            histogram.observe(1.0)
+
+    def test_processes_are_aggregated(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir)
+        with override_settings(STOCKS_METRICS_DIR=metrics_dir):
+            metrics.REQUESTS.inc(1, route='child', method='GET', status=200)
+            context = multiprocessing.get_context('fork')
+            for amount in (2, 3):
+                child = context.Process(target=increment_in_child, args=(amount,))
+                child.start()
+                child.join()
+
+            text = metrics.render_metrics()
+            # The files of the exited children are folded into a single one
+            files = sorted(file for file in os.listdir(metrics_dir) if file.endswith('.json'))
+            self.assertEqual(files, sorted([f'{metrics._process_id}.json', metrics.EXITED_FILE]))
+            self.assertEqual(self.sample(metrics.render_metrics(), 'stocks_http_requests_total{route="child",method="GET",status="200"}'), [6])
+
+            child = context.Process(target=increment_in_child, args=(4,))
+            child.start()
+            child.join()
+            self.assertEqual(self.sample(metrics.render_metrics(), 'stocks_http_requests_total{route="child",method="GET",status="200"}'), [10])
+            self.assertEqual(len([file for file in os.listdir(metrics_dir) if file.endswith('.json')]), 2)
+
+        self.assertEqual(self.sample(text, 'stocks_http_requests_total{route="child",method="GET",status="200"}'), [6])
+
+    def test_pool_tasks_report_to_the_parent(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir)
+        with override_settings(STOCKS_METRICS_DIR=metrics_dir):
+            with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context('fork')) as executor:
+                results = metrics.pool_map(executor, increment_in_pool, [1, 2, 3], chunksize=1)
+            self.assertEqual(results, [10, 20, 30])
+
+            text = metrics.render_metrics()
+            # The workers wrote no file of their own
+            self.assertEqual([file for file in os.listdir(metrics_dir) if file.endswith('.json')], [f'{metrics._process_id}.json'])
+
+        self.assertEqual(self.sample(text, 'stocks_http_requests_total{route="pool",method="GET",status="200"}'), [6])
+
+
+
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        settings_override = override_settings(STOCKS_PROFILING=True, STOCKS_PROFILE_DIR=self.profile_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        dates = np.datetime64('2024-01-01') + np.arange(300)
+        StockData.objects.bulk_create([
+            StockData(symbol='AAPL', date=str(day), close_price=100 + 10 * np.sin(i / 10)) for i, day in enumerate(dates)
+        ])
+        self.url = reverse('generate_backtest_report', kwargs={'symbol': 'AAPL', 'initial_investment': 1000})
+
+    def test_signed_header_profiles_the_request(self):
+        response = self.client.get(self.url, headers={'X-Stocks-Profile': profile_token()})
+
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Stocks-Profile-Id']
+        self.assertIn('generatebacktestreport', profile_id)
+        path = os.path.join(self.profile_dir, profile_id)
+        self.assertEqual(sorted(os.listdir(self.profile_dir)), sorted(f'{profile_id}{ext}' for ext in ('.prof', '.collapsed', '.txt')))
+
+        functions = {(os.path.basename(file), name) for file, _, name in pstats.Stats(f'{path}.prof').stats}
+        self.assertIn(('views.py', 'generate_backtest_report'), functions)
+        self.assertIn(('controller.py', 'compute_backtests'), functions)
+        with open(f'{path}.collapsed') as collapsed_file:
+            lines = collapsed_file.read().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(all(re.match(r'^\S.* \d+$', line) for line in lines))
+        self.assertTrue(any('stocks.views:generate_backtest_report' in line for line in lines))
+        with open(f'{path}.txt') as summary_file:
+            summary = summary_file.read()
+        self.assertIn('allocation sites', summary)
+        self.assertIn('cumulative time', summary)
+
+    def test_requests_are_only_profiled_on_demand(self):
+        self.assertNotIn('X-Stocks-Profile-Id', self.client.get(self.url))
+        self.assertNotIn('X-Stocks-Profile-Id', self.client.get(self.url, headers={'X-Stocks-Profile': 'forged:token'}))
+
+        User.objects.create_user('staff', password='secret', is_staff=True)
+        self.client.login(username='staff', password='secret')
+        self.assertIn('X-Stocks-Profile-Id', self.client.get(self.url, headers={'X-Stocks-Profile': '1'}))
+
+        with override_settings(STOCKS_PROFILING=False):
+            self.assertNotIn('X-Stocks-Profile-Id', self.client_class().get(self.url, headers={'X-Stocks-Profile': profile_token()}))
+        self.assertEqual(len(os.listdir(self.profile_dir)), 3)
+
+    def test_overlapping_profiles(self):
+        # The first profile starts tracing and ends while the second one is still running
+        second_started, first_done = threading.Event(), threading.Event()
+        results = {}
+
+        def second():
+            second_started.set()
+            first_done.wait(10)
+            return 'second'
+
+        thread = threading.Thread(target=lambda: results.update(second=profile_call(second, 'second', self.profile_dir)))
+
+        def first():
+            thread.start()
+            second_started.wait(10)
+            return 'first'
+
+        results['first'] = profile_call(first, 'first', self.profile_dir)
+        self.assertTrue(tracemalloc.is_tracing())
+        first_done.set()
+        thread.join()
+
+        self.assertEqual(results['first'][0], 'first')
+        self.assertEqual(results['second'][0], 'second')
+        self.assertIsNotNone(results['first'][1])
+        self.assertIsNotNone(results['second'][1])
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_profile_errors_keep_the_response(self):
+        blocked_dir = os.path.join(self.profile_dir, 'file')
+        with open(blocked_dir, 'w'):
+            pass
+
+        with override_settings(STOCKS_PROFILE_DIR=blocked_dir), self.assertLogs('stocks.profiling', 'ERROR'):
+            response = self.client.get(self.url, headers={'X-Stocks-Profile': profile_token()})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Stocks-Profile-Id', response)
+
+
+class StartupTests(TestCase):
+
+    def test_heavy_dependencies_load_on_first_use(self):
+        measures = probe_startup(first_use=True)
+
+        self.assertEqual(measures['heavy_modules'], [])
+        self.assertGreater(measures['seconds'], 0)
+        self.assertGreaterEqual(measures['wall_seconds'], measures['seconds'])
+        self.assertGreater(measures['max_rss'], 0)
+        self.assertEqual(set(measures['first_use']), set(LAZY_IMPORTS))
+
+    def test_measure_startup(self):
+        results = measure_startup(repeat=2, first_use=False)
+
+        self.assertEqual(results['runs'], 2)
+        self.assertLessEqual(results['seconds']['min'], results['seconds']['median'])
+        self.assertLessEqual(results['seconds']['median'], results['seconds']['max'])
+        self.assertEqual(results['first_use'], {})
+        self.assertTrue(set(results['heavy_modules']) <= set(HEAVY_MODULES))
+        with self.assertRaises(ValueError):
+            measure_startup(repeat=0)
+
+
+class StubAlphaVantageServer:
+    """
+    Local HTTP server answering Alpha Vantage queries with queued (status, payload, headers) responses.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.queries = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.queries.append(parse_qs(urlparse(self.path).query))
+                status, payload, headers = stub.responses.pop(0) if len(stub.responses) > 1 else stub.responses[0]
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/query'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def time_series_payload(days=5):
+    today = date.today()
+    return {
+        'Meta Data': {},
+        'Time Series (Daily)': {
+            (today - timedelta(days=i)).isoformat(): {
+                '1. open': '10.0', '2. high': '12.0', '3. low': '9.0', '4. close': str(11.0 + i), '5. volume': '1000',
+            }
+            for i in range(days)
+        },
+    }
+
+
+class MarketDataClientTests(TestCase):
+
+    def client_for(self, responses, **kwargs):
+        stub = StubAlphaVantageServer(responses)
+        self.addCleanup(stub.close)
+        options = {'api_key': 'test', 'max_retries': 2, 'backoff': 0.01, 'cache_ttl': 60, 'cache_dir': '', 'sleep': lambda delay: None}
+        options.update(kwargs)
+        return stub, AlphaVantageClient(stub.url, **options)
+
+    def test_responses_are_cached(self):
+        stub, client = self.client_for([(200, time_series_payload(), {})])
+
+        first = client.get_daily_time_series('AAPL', 'compact')
+        second = client.get_daily_time_series('AAPL', 'compact')
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(stub.queries), 1)
+        self.assertEqual(stub.queries[0]['symbol'], ['AAPL'])
+        self.assertEqual(stub.queries[0]['apikey'], ['test'])
+
+    def test_disk_cache_is_shared(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        stub, client = self.client_for([(200, time_series_payload(), {})], cache_dir=cache_dir)
+        client.get_daily_time_series('AAPL', 'compact')
+
+        other_client = AlphaVantageClient(stub.url, api_key='test', cache_ttl=60, cache_dir=cache_dir)
+        self.assertTrue(other_client.get_daily_time_series('AAPL', 'compact'))
+        self.assertEqual(len(stub.queries), 1)
+
+    def test_rate_limits_are_retried_with_backoff(self):
+        delays = []
+        stub, client = self.client_for([
+            (429, {}, {'Retry-After': '3'}),
+            (200, {'Note': 'Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute.'}, {}),
+            (200, time_series_payload(), {}),
+        ], sleep=delays.append)
+
+        self.assertTrue(client.get_daily_time_series('AAPL', 'compact'))
+        self.assertEqual(len(stub.queries), 3)
+        self.assertGreaterEqual(delays[0], 3)
+
+    def test_errors_are_raised(self):
+        stub, client = self.client_for([(200, {'Information': 'Our standard API rate limit is 25 requests per day.'}, {})])
+        with self.assertRaises(RateLimitError):
+            client.get_daily_time_series('AAPL', 'compact')
+        self.assertEqual(len(stub.queries), 3)
+
+        stub, client = self.client_for([(200, {'Error Message': 'Invalid API call.'}, {})])
+        with self.assertRaises(MarketDataError):
+            client.get_daily_time_series('NOPE', 'compact')
+
+    def test_fetch_data_uses_requested_symbol(self):
+        stub = StubAlphaVantageServer([(200, time_series_payload(), {})])
+        self.addCleanup(stub.close)
+
+        with override_settings(ALPHA_VANTAGE_BASE_URL=stub.url):
+            response = self.client.get(reverse('fetch_data', kwargs={'symbol': 'MSFT'}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'symbol': 'MSFT', 'inserted': 5, 'updated': 0, 'skipped': 0})
+        self.assertEqual(stub.queries[0]['symbol'], ['MSFT'])
+
+
+class BulkFetchTests(TestCase):
+
+    def test_token_bucket_limits_rate(self):
+        async def acquire_many(bucket, count):
+            for _ in range(count):
+                await bucket.acquire()
+
+        bucket = TokenBucket(rate_per_minute=3000, capacity=2)
+        start = time.monotonic()
+        asyncio.run(acquire_many(bucket, 7))
+
+        # Two requests from the burst, then one every 20 ms
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_fetch_universe_ingests_each_symbol(self):
+        stub = StubAlphaVantageServer([(200, time_series_payload(3), {})])
+        self.addCleanup(stub.close)
+        completed = []
+
+        with override_settings(ALPHA_VANTAGE_BASE_URL=stub.url, ALPHA_VANTAGE_RATE_BURST=10):
+            results = async_to_sync(fetch_universe)(['AAPL', 'MSFT', 'IBM'], 2, 6000, 'compact', lambda symbol, result: completed.append(symbol))
+
+        self.assertEqual(results['MSFT'], {'inserted': 3, 'updated': 0, 'skipped': 0})
+        self.assertEqual(sorted(completed), ['AAPL', 'IBM', 'MSFT'])
+        self.assertEqual(StockData.objects.count(), 9)
+        self.assertEqual(sorted(query['symbol'][0] for query in stub.queries), ['AAPL', 'IBM', 'MSFT'])
+
+    def test_fetch_many_reports_errors(self):
+        stub = StubAlphaVantageServer([(200, {'Error Message': 'Invalid API call.'}, {})])
+        self.addCleanup(stub.close)
+
+        with override_settings(ALPHA_VANTAGE_BASE_URL=stub.url, ALPHA_VANTAGE_RATE_LIMIT=6000):
+            response = self.client.get(reverse('fetch_many'), {'symbols': 'NOPE'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('error', response.json()['NOPE'])
+
+
+class StreamingParserTests(TestCase):
+
+    def chunks(self, payload, size=1):
+        body = json.dumps(payload, indent=2).encode()
+        return [body[i:i + size] for i in range(0, len(body), size)]
+
+    def test_rows_match_full_parse(self):
+        payload = time_series_payload(20)
+        expected = list(parse_time_series(payload['Time Series (Daily)']))
+
+        for size in (1, 7, 4096):
+            self.assertEqual(list(iter_time_series_rows(self.chunks(payload, size))), expected)
+
+    def test_reading_stops_before_date(self):
+        chunks = iter(self.chunks(time_series_payload(20), 16))
+        rows = list(iter_time_series_rows(chunks, stop_before=date.today() - timedelta(days=4)))
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[-1][0], date.today() - timedelta(days=4))
+        # The rest of the body was never read
+        self.assertTrue(next(chunks, None))
+
+    def test_payload_errors_are_raised(self):
+        with self.assertRaises(RateLimitError):
+            list(iter_time_series_rows(self.chunks({'Note': 'Our standard API call frequency is 5 calls per minute.'})))
+        with self.assertRaises(MarketDataError):
+            list(iter_time_series_rows(self.chunks({'Error Message': 'Invalid API call.'})))
+        with self.assertRaises(LookupError):
+            list(iter_time_series_rows(self.chunks({'Meta Data': {}})))
+
+
 class fetchDataTests(TestCase):
     
     def setUp(self):
      # Clear any existing StockData
         StockData.objects.all().delete()  # Ensure a clean state for each test
+        # Serve Alpha Vantage queries locally
+        stub = AlphaVantageStub().start()
+        self.addCleanup(stub.stop)
+        settings_override = override_settings(ALPHA_VANTAGE_BASE_URL=stub.url, ALPHA_VANTAGE_CACHE_DIR='')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
 
     def test_valid_backtest(self):
         response = self.client.get(reverse('fetch_data', kwargs={'symbol': 'AAPL' }))
@@ -0,0 +1,348 @@
+# stocks/training.py
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from numpy.lib.stride_tricks import sliding_window_view
+from .metrics import pool_map
+from .prices import load_close_prices_many, load_universe
+
+# Training pipeline of the return models. From the closes of a symbol, each day gets a row of
+# features: its last `lags` log returns and, for each rolling window, the mean and standard
+# deviation of the log returns and the log distance of the close to its moving average. The
+# target is the log return of the next day. Models are linear and fitted in closed form, and are
+# validated walk-forward: each fold trains on the days before its test block, never after.
+
+DEFAULT_FEATURES = {'lags': 5, 'windows': [5, 20]}
+RETURN_MODEL = 'return_model'
+MODES = ('per_symbol', 'pooled')
+# Symbols with fewer feature rows are left out of the training
+MIN_ROWS = 60
+
+
+def feature_names(features=DEFAULT_FEATURES):
+    names = [f'return_lag_{lag}' for lag in range(1, features['lags'] + 1)]
+    for window in features['windows']:
+        names += [f'return_mean_{window}', f'return_std_{window}', f'close_to_ma_{window}']
+    return names
+
+
+def first_row(features=DEFAULT_FEATURES):
+    """
+    Returns the index of the first close with a complete row of features.
+    """
+    return max(features['lags'], *features['windows'])
+
+
+def build_features(closes, features=DEFAULT_FEATURES):
+    """
+    Builds the feature matrix of a series of closes.
+
+    Inputs:
+    - closes: 1-D array of closing prices ordered by date.
+    - features: The feature specification, {'lags': int, 'windows': [int, ...]}.
+
+    Outputs:
+    - Returns a tuple (X, y, rows): the float64 feature matrix with one row per close from
+      `first_row(features)` on, the log return of the following day for each row (NaN for the last
+      close, whose next day is unknown), and the index in `closes` of each row.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    start = first_row(features)
+    if len(closes) <= start:
+        return np.empty((0, len(feature_names(features)))), np.empty(0), np.empty(0, dtype=np.int64)
+
+    log_closes = np.log(closes)
+    returns = np.diff(log_closes, prepend=np.nan)  # returns[i] is the log return of day i
+    rows = np.arange(start, len(closes))
+
+    columns = [returns[rows - lag + 1] for lag in range(1, features['lags'] + 1)]
+    for window in features['windows']:
+        # Windows ending at each row
+        return_windows = sliding_window_view(returns[1:], window)[rows - window]
+        close_windows = sliding_window_view(closes, window)[rows - window + 1]
+        columns += [
+            return_windows.mean(axis=1),
+            return_windows.std(axis=1),
+            log_closes[rows] - np.log(close_windows.mean(axis=1)),
+        ]
+
+    y = np.append(returns[rows[:-1] + 1], np.nan)
+    return np.column_stack(columns), y, rows
+
+
+def latest_features(closes, features=DEFAULT_FEATURES):
+    """
+    Builds the feature row of the last day of several series of closes at once.
+
+    Inputs:
+    - closes: 2-D array with one row of trailing closes per series, each with at least
+      `first_row(features) + 1` closes.
+    - features: The feature specification.
+
+    Outputs:
+    - Returns the feature matrix with one row per series, equal to the last row of
+      `build_features` for each series.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    log_closes = np.log(closes)
+    returns = np.diff(log_closes, axis=1)
+
+    columns = [returns[:, -lag] for lag in range(1, features['lags'] + 1)]
+    for window in features['windows']:
+        columns += [
+            returns[:, -window:].mean(axis=1),
+            returns[:, -window:].std(axis=1),
+            log_closes[:, -1] - np.log(closes[:, -window:].mean(axis=1)),
+        ]
+    return np.column_stack(columns)
+
+
+def walk_forward_splits(times, n_splits=5):
+    """
+    Returns the (train, test) index arrays of walk-forward validation folds.
+
+    Inputs:
+    - times: Array of the time of each row (e.g. its date), not necessarily sorted.
+    - n_splits: Number of folds.
+
+    Outputs:
+    - Returns a list of (train, test) pairs. The distinct times are cut into n_splits + 1
+      consecutive blocks; fold k tests on block k and trains on every row before it.
+    """
+    times = np.asarray(times)
+    blocks = np.array_split(np.unique(times), n_splits + 1)
+    splits = []
+    for block in blocks[1:]:
+        if len(block) == 0:
+            continue
+        splits.append((np.flatnonzero(times < block[0]), np.flatnonzero((times >= block[0]) & (times <= block[-1]))))
+    return splits
+
+
+def fit_ridge(X, y, alpha=1.0):
+    """
+    Fits a ridge regression on standardized features in closed form.
+
+    Outputs:
+    - Returns a tuple (coef, intercept) on the scale of the original features.
+    """
+    mean = X.mean(axis=0)
+    scale = X.std(axis=0)
+    scale[scale == 0] = 1.0
+    Z = (X - mean) / scale
+    y_mean = y.mean()
+    coef = np.linalg.solve(Z.T @ Z + alpha * np.eye(X.shape[1]), Z.T @ (y - y_mean)) / scale
+    return coef, y_mean - mean @ coef
+
+
+def out_of_sample(X, y, times, n_splits=5, alpha=1.0):
+    """
+    Returns the (y_true, y_pred) arrays of the walk-forward test predictions of a dataset.
+    """
+    y_true, y_pred = [], []
+    for train, test in walk_forward_splits(times, n_splits):
+        if len(train) < X.shape[1] + 1:
+            continue
+        coef, intercept = fit_ridge(X[train], y[train], alpha)
+        y_true.append(y[test])
+        y_pred.append(X[test] @ coef + intercept)
+    if not y_true:
+        return np.empty(0), np.empty(0)
+    return np.concatenate(y_true), np.concatenate(y_pred)
+
+
+def regression_metrics(y_true, y_pred):
+    """
+    Returns the RMSE, MAE and directional accuracy of return predictions, and the RMSE of
+    predicting no change, which a useful model has to beat.
+    """
+    if len(y_true) == 0:
+        return {'rows': 0}
+    errors = y_pred - y_true
+    return {
+        'rows': int(len(y_true)),
+        'rmse': float(np.sqrt(np.mean(errors ** 2))),
+        'mae': float(np.mean(np.abs(errors))),
+        'directional_accuracy': float(np.mean(np.sign(y_pred) == np.sign(y_true))),
+        'baseline_rmse': float(np.sqrt(np.mean(y_true ** 2))),
+    }
+
+
+def symbol_dataset(closes, dates, features):
+    # Feature rows of a symbol with a known target, and the day number of each row
+    X, y, rows = build_features(closes, features)
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    return X[:-1], y[:-1], days[rows[:-1]]
+
+
+def train_symbol(symbol, dates, closes, features, n_splits, alpha):
+    """
+    Validates and fits the model of one symbol. Database-free entry point for worker processes.
+
+    Outputs:
+    - Returns a dictionary with the symbol, its number of rows, its fitted 'coef' and 'intercept'
+      (None when it has fewer than MIN_ROWS rows) and its walk-forward 'y_true' and 'y_pred'.
+    """
+    X, y, days = symbol_dataset(closes, dates, features)
+    if len(y) < MIN_ROWS:
+        return {'symbol': symbol, 'rows': len(y), 'coef': None, 'intercept': None, 'y_true': np.empty(0), 'y_pred': np.empty(0)}
+    y_true, y_pred = out_of_sample(X, y, days, n_splits, alpha)
+    coef, intercept = fit_ridge(X, y, alpha)
+    return {'symbol': symbol, 'rows': len(y), 'coef': coef, 'intercept': intercept, 'y_true': y_true, 'y_pred': y_pred}
+
+
+def pooled_dataset(symbol, dates, closes, features, n_splits, alpha):
+    """
+    Returns the feature rows of one symbol for a pooled model. Database-free entry point for worker processes.
+    """
+    X, y, days = symbol_dataset(closes, dates, features)
+    return {'symbol': symbol, 'rows': len(y), 'X': X, 'y': y, 'days': days}
+
+
+def _map(function, tasks, max_workers=None):
+    # Fans the tasks out across worker processes, as `portfolio.run_backtests`
+    max_workers = max_workers or os.cpu_count() or 1
+    max_workers = min(max_workers, len(tasks))
+    if max_workers <= 1:
+        return [function(*task) for task in tasks]
+    chunksize = max(1, len(tasks) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return pool_map(executor, function, *zip(*tasks), chunksize=chunksize)
+
+
+class ReturnModel:
+    """
+    Linear model of the next day log return, with per-symbol coefficients and pooled ones.
+
+    `predict(X, symbols)` uses the coefficients of the symbol of each row, and the pooled
+    coefficients for the symbols it was not trained on or when `symbols` is None, in a single
+    vectorized operation whatever the number of symbols.
+    """
+
+    def __init__(self, features, symbols, coef, intercept, pooled_coef, pooled_intercept):
+        self.features = features
+        self.symbols = list(symbols)
+        self.pooled_coef = np.asarray(pooled_coef, dtype=np.float64)
+        self.coef = np.asarray(coef, dtype=np.float64).reshape(len(self.symbols), len(self.pooled_coef))
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.pooled_intercept = float(pooled_intercept)
+        self.n_features_in_ = len(self.pooled_coef)
+        self._index = {symbol: index for index, symbol in enumerate(self.symbols)}
+
+    def predict(self, X, symbols=None):
+        X = np.asarray(X, dtype=np.float64)
+        if symbols is None:
+            return X @ self.pooled_coef + self.pooled_intercept
+        # The pooled coefficients are appended as the last row, for the unknown symbols
+        index = np.array([self._index.get(symbol, -1) for symbol in symbols], dtype=np.int64)
+        coef = np.vstack((self.coef, self.pooled_coef))[index]
+        intercept = np.append(self.intercept, self.pooled_intercept)[index]
+        return np.einsum('ij,ij->i', X, coef) + intercept
+
+
+def train_return_model(symbols=None, mode='per_symbol', features=None, n_splits=5, alpha=1.0, start=None, end=None, max_workers=None):
+    """
+    Trains a return model on the closes stored for many symbols.
+
+    Inputs:
+    - symbols: List of stock symbols (default: every symbol stored in the StockData table).
+    - mode: 'per_symbol' to fit one model per symbol, or 'pooled' to fit one model on the rows
+      of every symbol.
+    - features: The feature specification (default: DEFAULT_FEATURES).
+    - n_splits: Number of walk-forward validation folds.
+    - alpha: Ridge regularization strength, on standardized features.
+    - start, end: Optional first and last dates of the training data (inclusive).
+    - max_workers: Number of worker processes (default: one per CPU).
+
+    Outputs:
+    - Returns a tuple (model, report): the ReturnModel and a dictionary of the walk-forward metrics
+      over all symbols ('metrics'), per symbol ('symbols', per symbol mode only), and the symbols
+      left out for lack of data ('skipped_symbols').
+
+    The closes are read with one query; features, validation and fits run in the worker processes.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {', '.join(MODES)}.")
+    features = features or DEFAULT_FEATURES
+    if features['lags'] < 1 or any(window < 2 for window in features['windows']):
+        raise ValueError('The lags must be positive and the windows at least 2 days.')
+    if symbols is None:
+        symbols = load_universe()
+
+    prices = load_close_prices_many(symbols, start, end)
+    tasks = [(symbol, *prices[symbol], features, n_splits, alpha) for symbol in symbols if symbol in prices]
+
+    if mode == 'per_symbol':
+        results = _map(train_symbol, tasks, max_workers)
+        trained = [result for result in results if result['coef'] is not None]
+        if not trained:
+            raise ValueError('No symbol has enough data to train a model.')
+
+        # The pooled coefficients average those of the symbols, weighted by their rows
+        weights = np.array([result['rows'] for result in trained], dtype=np.float64)
+        coef = np.array([result['coef'] for result in trained])
+        intercept = np.array([result['intercept'] for result in trained])
+        model = ReturnModel(
+            features, [result['symbol'] for result in trained], coef, intercept,
+            weights @ coef / weights.sum(), weights @ intercept / weights.sum(),
+        )
+        y_true = np.concatenate([result['y_true'] for result in trained])
+        y_pred = np.concatenate([result['y_pred'] for result in trained])
+        report = {'symbols': {result['symbol']: regression_metrics(result['y_true'], result['y_pred']) for result in trained}}
+    else:
+        results = _map(pooled_dataset, tasks, max_workers)
+        trained = [result for result in results if result['rows'] >= MIN_ROWS]
+        if not trained:
+            raise ValueError('No symbol has enough data to train a model.')
+
+        X = np.concatenate([result['X'] for result in trained])
+        y = np.concatenate([result['y'] for result in trained])
+        days = np.concatenate([result['days'] for result in trained])
+        y_true, y_pred = out_of_sample(X, y, days, n_splits, alpha)
+        pooled_coef, pooled_intercept = fit_ridge(X, y, alpha)
+        model = ReturnModel(features, [], np.empty((0, X.shape[1])), np.empty(0), pooled_coef, pooled_intercept)
+        report = {}
+
+    trained_symbols = {result['symbol'] for result in trained}
+    report['metrics'] = regression_metrics(y_true, y_pred)
+    report['skipped_symbols'] = [symbol for symbol in symbols if symbol not in trained_symbols]
+    return model, report
+
+
+def save_model(model, report, name=RETURN_MODEL, model_dir=None, **metadata):
+    """
+    Writes a model as a new version of the model registry, with its metadata.
+
+    Inputs:
+    - model: The fitted model.
+    - report: The training report of `train_return_model`.
+    - name: Name of the model in the registry (default: RETURN_MODEL).
+    - model_dir: Directory of the registry (default: settings.STOCKS_MODEL_DIR).
+    - metadata: Other metadata to record, e.g. the training parameters.
+
+    Outputs:
+    - Returns a tuple (version, path). The version is the UTC training time, so the latest
+      version of the registry is the last one trained.
+    """
+    version = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+    path = os.path.join(settings.STOCKS_MODEL_DIR if model_dir is None else model_dir, name, f'{version}.pkl')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    import joblib  # imported on first use, like in `model_registry`
+
+    joblib.dump(model, path)
+    with open(f'{path}.json', 'w') as file:
+        json.dump({
+            **metadata,
+            'n_features': model.n_features_in_,
+            'features': model.features,
+            'feature_names': feature_names(model.features),
+            'target': 'next_log_return',
+            'symbols': model.symbols,
+            'trained_at': timezone.now().isoformat(),
+            **report,
+        }, file, indent=2)
+    return version, path
@@ -1,19 +1,64 @@
 from django.urls import path
 from .views import fetch_data
+from .views import fetch_many
 from .views import backtest_strategy
 from .views import generate_backtest_report
+from .views import batch_backtest_report
+from .views import portfolio_backtest
+from .views import backtest_sweep
+from .views import predict_prices
+from .views import forecast_prices
+from .views import strategy_state
+from .views import submit_report_job, report_job_status, download_report
+from .views import metrics
 
 urlpatterns = [
     path('fetch/<str:symbol>/', fetch_data, name='fetch_data'),
 ]
 
+urlpatterns += [
+    path('fetchmany/', fetch_many, name='fetch_many'),
+]
+
 urlpatterns += [
     path('backtest/<str:symbol>/<int:initial_investment>/', backtest_strategy, name='backtest_strategy'),
 ]
 
+urlpatterns += [
+    path('backtestsweep/<str:symbol>/', backtest_sweep, name='backtest_sweep'),
+]
+
+urlpatterns += [
+    path('portfoliobacktest/<int:initial_investment>/', portfolio_backtest, name='portfolio_backtest'),
+]
+
 urlpatterns += [
     path('generatebacktestreport/<str:symbol>/<int:initial_investment>/', generate_backtest_report, name='generate_backtest_report'),
 ]
 
+urlpatterns += [
+    path('batchbacktestreport/<int:initial_investment>/', batch_backtest_report, name='batch_backtest_report'),
+]
+
+urlpatterns += [
+    path('predict/<str:symbol>/', predict_prices, name='predict_prices'),
+]
+
+urlpatterns += [
+    path('forecast/', forecast_prices, name='forecast_prices'),
+]
+
+urlpatterns += [
+    path('strategystate/<str:symbol>/<int:initial_investment>/', strategy_state, name='strategy_state'),
+]
 
+urlpatterns += [
+    path('reportjobs/<str:symbol>/<int:initial_investment>/', submit_report_job, name='submit_report_job'),
+    path('reportjobs/<int:job_id>/', report_job_status, name='report_job_status'),
+    path('reportjobs/<int:job_id>/download/', download_report, name='download_report'),
+]
 
+urlpatterns += [
+    # Without trailing slash, where Prometheus scrapes by default
+    path('metrics', metrics, name='metrics'),
+]
@@ -1,17 +1,31 @@
 import requests
 from django.conf import settings
 from .controller import *
+from .prices import parse_date
+from .result_cache import cached_backtest
+from .response_formats import FORMAT_QUERY_PARAMS, backtest_response, parse_format_options
+from .backtest_engine import MOVING_AVERAGE_LONG, MOVING_AVERAGE_SHORT
+from .ingestion import ingest_rows, ingest_start_date
+from .streaming import stream_daily_rows
+from .market_data import get_client
+from asgiref.sync import sync_to_async
+from .portfolio import compute_portfolio_backtest
+from .sweep import parse_range, sweep_moving_average
+from .prediction import forecast_many, predict_many
+from .training import RETURN_MODEL
+from .strategies import parse_strategies
+from .strategy_state import get_strategy_state, strategy_state_payload
+from .report_jobs import report_job_payload, submit_report
+from .artifacts import get_artifact_store
+from .models import ReportJob
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics, stage
+from .model_registry import DEFAULT_MODEL, InvalidModelError, ModelNotFoundError
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse, HttpResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
-from matplotlib import pyplot as plt
-from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle , tableofcontents
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
+from django.views.decorators.http import require_POST
 import json
-from reportlab.lib.utils import ImageReader
 
 
 
@@ -24,56 +38,40 @@ def fetch_data(request , symbol):
                       if not provided in the request.
 
     Returns:
-        JsonResponse: A JSON response containing the fetched stock data, including
-                      open, high, low, close prices, and volume, for the last 
-                      two years.
+        JsonResponse: A JSON response containing the symbol and the number of
+                      inserted, updated and skipped rows.
 
     Process:
         1. Retrieve the stock symbol from the request's query parameters, defaulting 
            to 'AAPL' if not provided.
-        2. Construct the API request URL using the specified stock symbol and API key.
-        3. Send a GET request to the Alpha Vantage API to retrieve daily stock data.
-        4. Clear all existing records in the StockData table to ensure fresh data.
-        5. Calculate the cutoff date to filter out data older than two years.
-        6. Iterate over the retrieved daily stock data, storing only data within the 
-           last two years in the StockData table.
-        7. Prepare a filtered dataset for the JSON response, including only the relevant
-           fields for each date.
+        2. Request the daily stock data of the symbol through the shared Alpha Vantage
+           client, which pools connections and retries with backoff.
+        3. Parse the response while it is read, and stop reading at the latest stored
+           date for the symbol, or at two years back for a new symbol.
+        4. Upsert the parsed days in batches. Other symbols are left untouched.
+        5. Report how many rows were inserted, updated and skipped.
 
     Note:
         - Ensure the StockData model is correctly defined and accessible for 
           data storage.
-        - The Alpha Vantage API has usage limits; consider implementing error handling
-          for exceeded limits or connection issues.
+        - The Alpha Vantage API has usage limits; rate limited requests are retried
+          by the client before an error is returned.
     """
 
     try:
-        print("start of fetch_data")
-        base_url = settings.ALPHA_VANTAGE_BASE_URL
-        function = settings.ALPHA_VANTAGE_FUNCTION
         requested_symbol = request.GET.get('symbol') or symbol or 'AAPL'
-        api_key = settings.ALPHA_VANTAGE_API_KEY
-        outputSize = settings.ALPHA_VANTAGE_OUTPUTSIZE
 
-        #url = f'{base_url}?function={function}&symbol={requested_symbol}&apikey={api_key}&outputsize={outputSize}'
-        url = 'https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol=AAPL&apikey=PENHU30WNPYGZVWH&outputsize=full'
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        data = response.json().get('Time Series (Daily)', {})
+        # Stream the response of the pooled Alpha Vantage client, reading only the days to store
+        with stage('upstream_fetch'):
+            rows = list(stream_daily_rows(get_client(), requested_symbol, ingest_start_date(requested_symbol)))
 
-         # Check if the response data is None
-        if data is None:
-            return JsonResponse({'error': 'Received null response from API.'}, status=502)  # Bad Gateway
+        # Store the new days for this symbol only
+        counts = ingest_rows(requested_symbol, rows)
 
-         # Check if data.items() is empty
-        if not data:
-            return JsonResponse({'error': 'No time series data available for the given symbol.'}, status=404)
-
-        # Call the reset function
-        filtered_data = reset_dataBase_with_new_data(data, symbol)
-        
-        return JsonResponse(filtered_data, safe=False)
+        return JsonResponse({'symbol': requested_symbol, **counts})
 
+    except LookupError as not_found_err:
+        return JsonResponse({'error': str(not_found_err)}, status=404)
     except requests.exceptions.HTTPError as http_err:
         return JsonResponse({'error': f'HTTP error occurred: {http_err}'}, status=500)
     except requests.exceptions.RequestException as req_err:
@@ -82,6 +80,62 @@ def fetch_data(request , symbol):
         return JsonResponse({'error': f'An error occurred: {err}'}, status=500)
 
 
+#@ratelimit(key='ip', rate='10/m', method='ALL', block=True)  # Limit to 10 requests per minute per IP
+async def fetch_many(request):
+    """
+    Fetches and stores the stock data of many symbols concurrently.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object. Its query parameters may contain:
+            - symbols: Comma separated list of stock symbols (default: every stored symbol).
+            - concurrency: Maximum number of requests in flight.
+            - rate: Maximum number of requests sent per minute.
+
+    Returns:
+        JsonResponse: A JSON response mapping each symbol to its number of inserted,
+                      updated and skipped rows, or to an error.
+
+    This is an async view: served through `financial_project/asgi.py`, the requests to
+    Alpha Vantage run concurrently without holding a worker thread each.
+    """
+    from .bulk_fetch import fetch_universe  # the processes serving no bulk fetch never load httpx
+
+    try:
+        symbols = request.GET.get('symbols')
+        symbols = [symbol.strip() for symbol in symbols.split(',') if symbol.strip()] if symbols else await sync_to_async(load_universe)()
+        concurrency = int(request.GET['concurrency']) if 'concurrency' in request.GET else None
+        rate = float(request.GET['rate']) if 'rate' in request.GET else None
+
+        if not symbols:
+            return JsonResponse({'error': 'No symbols to fetch.'}, status=400)
+        if (concurrency is not None and concurrency < 1) or (rate is not None and rate <= 0):
+            return JsonResponse({'error': 'The concurrency and rate must be positive.'}, status=400)
+
+        results = await fetch_universe(symbols, concurrency, rate)
+        return JsonResponse(results)
+
+    except ValueError as value_err:
+        return JsonResponse({'error': f'Invalid fetch parameters: {value_err}'}, status=400)
+    except Exception as err:
+        return JsonResponse({'error': f'An error occurred: {err}'}, status=500)
+
+
+# Query parameters of the backtest endpoints that are not strategy parameters
+BACKTEST_QUERY_PARAMS = {'start', 'end', 'strategy'}
+
+
+def backtest_request(request, other_params=()):
+    """
+    Returns the (start, end, strategies) of a backtest request, raising ValueError when invalid.
+
+    The query parameters other than 'start', 'end', 'strategy' and `other_params` are strategy parameters.
+    """
+    start = parse_date(request.GET.get('start'))
+    end = parse_date(request.GET.get('end'))
+    params = {key: value for key, value in request.GET.items() if key not in BACKTEST_QUERY_PARAMS and key not in other_params}
+    return start, end, parse_strategies(request.GET.get('strategy'), params)
+
+
 # Existing backtest code from the user
 #@ratelimit(key='ip', rate='10/m', method='ALL', block=True)  # Limit to 10 requests per minute per IP
 def backtest_strategy(request, symbol='AAPL', initial_investment=1000):
@@ -89,31 +143,260 @@ def backtest_strategy(request, symbol='AAPL', initial_investment=1000):
     Executes a backtest for the specified stock symbol and returns the result.
 
     Inputs:
-    - request: Django HTTP request object, used to track and rate-limit requests.
+    - request: Django HTTP request object. Its query parameters may contain:
+      - start: First date of the backtest, as 'YYYY-MM-DD' (default: the first stored date).
+      - end: Last date of the backtest, as 'YYYY-MM-DD' (default: the last stored date).
+      - strategy: Comma separated names of registered strategies (default: 'moving_average').
+      - Any parameter of the requested strategies, e.g. 'window=10' (default: the strategy defaults).
+      - format, points, precision, stream: The response format options, see
+        `response_formats.parse_format_options`.
     - symbol: The stock symbol for which the backtest is executed (default: 'AAPL').
     - initial_investment: The initial amount of money to invest in the backtest (default: 1000).
 
     Outputs:
-    - Returns a JsonResponse containing the backtest result, which includes:
+    - Returns a JSON response containing the backtest result, which includes:
       - Total return.
       - Maximum drawdown.
       - Total number of trades.
       - Portfolio values over time.
+      With several strategies, these are listed per strategy under 'strategies', and the
+      indicators they share are computed once.
 
-    The function calls the compute_backtest function to perform the backtest and then formats the result as a JSON response.
+    The result is read from the backtest result cache, and only computed by `compute_backtest`
+    when the parameters or the stored data of the symbol changed since the last request. In the
+    default format, the cached JSON encoding is returned as is.
     """
     try:
-        backtest_result = compute_backtest(symbol, initial_investment)
-        if 'error' in backtest_result:
-            return JsonResponse({'error': backtest_result['error']}, status=404)
-        return JsonResponse(backtest_result)
-
+        start, end, strategies = backtest_request(request, other_params=FORMAT_QUERY_PARAMS)
+        options = parse_format_options(request.GET, request.headers.get('Accept', ''))
+
+        content = cached_backtest(symbol, initial_investment, start, end, strategies)
+        if options == parse_format_options({}):
+            return HttpResponse(content, content_type='application/json')
+        return backtest_response(json.loads(content), **options)
+
+    except LookupError as not_found_err:
+        return JsonResponse({'error': str(not_found_err)}, status=404)
+    except ValueError as value_err:
+        return JsonResponse({'error': f'Invalid backtest parameters: {value_err}'}, status=400)
     except Exception as err:
         return JsonResponse({'error': f'An error occurred during backtesting: {err}'}, status=500)
 
 
 
 
+#@ratelimit(key='ip', rate='10/m', method='ALL', block=True)  # Limit to 10 requests per minute per IP
+def backtest_sweep(request, symbol='AAPL'):
+    """
+    Evaluates the moving average strategy over a grid of parameters for one stock symbol.
+
+    Inputs:
+    - request: Django HTTP request object. Its query parameters may contain, as 'start:stop:step'
+      ranges (stop included) or comma separated lists:
+      - short: Windows of the buy moving average (default: '50').
+      - long: Windows of the sell moving average (default: '200').
+      - investment: Initial investments (default: '1000').
+      And also:
+      - order_by: Ranking column, 'total_return', 'Max_Drawdown' or 'total_trades' (default: 'total_return').
+      - limit: Maximum number of ranked results returned (default: all).
+      - start, end: First and last dates of the backtest, as 'YYYY-MM-DD' (default: all stored dates).
+    - symbol: The stock symbol for which the sweep is executed (default: 'AAPL').
+
+    Outputs:
+    - Returns a JsonResponse containing the number of evaluated combinations and the ranked table
+      of total return, maximum drawdown and total number of trades for every combination.
+    """
+    try:
+        short_windows = parse_range(request.GET.get('short', '50'))
+        long_windows = parse_range(request.GET.get('long', '200'))
+        initial_investments = parse_range(request.GET.get('investment', '1000'))
+        order_by = request.GET.get('order_by', 'total_return')
+        limit = int(request.GET['limit']) if 'limit' in request.GET else None
+        start = parse_date(request.GET.get('start'))
+        end = parse_date(request.GET.get('end'))
+
+        dates, closes = load_close_prices(symbol, start, end)
+        if len(closes) == 0:
+            return JsonResponse({'error': 'No data available for the specified symbol.'}, status=404)
+
+        results = sweep_moving_average(closes, short_windows, long_windows, initial_investments, order_by)
+        return JsonResponse({
+            'symbol': symbol,
+            'combinations': len(results),
+            'results': results[:limit],
+        })
+
+    except ValueError as value_err:
+        return JsonResponse({'error': f'Invalid sweep parameters: {value_err}'}, status=400)
+    except Exception as err:
+        return JsonResponse({'error': f'An error occurred during the parameter sweep: {err}'}, status=500)
+
+
+#@ratelimit(key='ip', rate='10/m', method='ALL', block=True)  # Limit to 10 requests per minute per IP
+def portfolio_backtest(request, initial_investment=10000):
+    """
+    Executes a backtest for a portfolio of stock symbols and returns the combined result.
+
+    Inputs:
+    - request: Django HTTP request object. Its query parameters may contain:
+      - symbols: Comma separated list of stock symbols (default: every stored symbol).
+      - weights: Comma separated list of capital weights, one per symbol (default: equal weights).
+      - start, end: First and last dates of the backtest, as 'YYYY-MM-DD' (default: all stored dates).
+    - initial_investment: The total amount of money invested across the portfolio (default: 10000).
+
+    Outputs:
+    - Returns a JsonResponse containing the combined portfolio equity curve, total return,
+      maximum drawdown, total number of trades and the contribution of every symbol.
+
+    The backtests of the symbols run in parallel worker processes, see `compute_portfolio_backtest`.
+    """
+    try:
+        symbols = request.GET.get('symbols')
+        symbols = [symbol.strip() for symbol in symbols.split(',') if symbol.strip()] if symbols else None
+        weights = request.GET.get('weights')
+        weights = [float(weight) for weight in weights.split(',')] if weights else None
+        start = parse_date(request.GET.get('start'))
+        end = parse_date(request.GET.get('end'))
+
+        portfolio_result = compute_portfolio_backtest(symbols, initial_investment, weights, start=start, end=end)
+        if 'error' in portfolio_result:
+            return JsonResponse({'error': portfolio_result['error']}, status=404)
+        return JsonResponse(portfolio_result)
+
+    except ValueError as value_err:
+        return JsonResponse({'error': f'Invalid portfolio parameters: {value_err}'}, status=400)
+    except Exception as err:
+        return JsonResponse({'error': f'An error occurred during portfolio backtesting: {err}'}, status=500)
+
+
+
+
+#@ratelimit(key='ip', rate='10/m', method='ALL', block=True)  # Limit to 10 requests per minute per IP
+def strategy_state(request, symbol, initial_investment=1000):
+    """
+    Returns the live state of the moving average strategy on a stock symbol.
+
+    Inputs:
+    - request: Django HTTP request object. Its query parameters may contain:
+      - short: Window of the buy moving average (default: 50).
+      - long: Window of the sell moving average (default: 200).
+      - curve: '0' to leave the equity curve out of the response (default: '1').
+    - symbol: The stock symbol.
+    - initial_investment: The initial amount of money invested by the strategy.
+
+    Outputs:
+    - Returns a JsonResponse containing the position, cash, shares, value, total return, peak
+      value, maximum drawdown and number of trades at the last stored day, and the equity curve.
+
+    The states of the parameters of settings.STOCKS_STRATEGY_STATES are persisted per symbol and
+    only advanced over the days stored since their last update, see `strategy_state.catch_up`.
+    Other parameters are computed over the whole history on each request, without being saved.
+    """
+    try:
+        ma_short = int(request.GET.get('short', MOVING_AVERAGE_SHORT))
+        ma_long = int(request.GET.get('long', MOVING_AVERAGE_LONG))
+        with_curve = request.GET.get('curve', '1') != '0'
+
+        state = get_strategy_state(symbol, initial_investment, ma_short, ma_long)
+        if state is None:
+            return JsonResponse({'error': 'No data available for the specified symbol.'}, status=404)
+        return JsonResponse(strategy_state_payload(state, with_curve))
+
+    except ValueError as value_err:
+        return JsonResponse({'error': f'Invalid strategy parameters: {value_err}'}, status=400)
+    except Exception as err:
+        return JsonResponse({'error': f'An error occurred while updating the strategy state: {err}'}, status=500)
+
+
+#@ratelimit(key='ip', rate='10/m', method='ALL', block=True)  # Limit to 10 requests per minute per IP
+def predict_prices(request, symbol):
+    """
+    Predicts the next closing prices of a stock symbol with a model of the model registry.
+
+    Inputs:
+    - request: Django HTTP request object. Its query parameters may contain:
+      - model: Name of the model artifact (default: DEFAULT_MODEL).
+      - version: Version of the model artifact (default: the latest version).
+    - symbol: The stock symbol to predict.
+
+    Outputs:
+    - Returns a JsonResponse containing the model name, the dates of the last 30 stored closes and
+      the closing price predicted from each of them.
+
+    The closes are read from the StockData table; the symbol is only fetched from Alpha Vantage
+    when its stored data is stale.
+    """
+    try:
+        model_name = request.GET.get('model', DEFAULT_MODEL)
+        version = request.GET.get('version')
+
+        dates, predictions = predict_many([symbol], model_name, version)[symbol]
+        return JsonResponse({
+            'symbol': symbol,
+            'model': model_name,
+            'dates': dates.astype(str).tolist(),
+            'predictions': predictions.tolist(),
+        })
+
+    except (LookupError, ModelNotFoundError) as not_found_err:
+        return JsonResponse({'error': str(not_found_err)}, status=404)
+    except InvalidModelError as model_err:
+        return JsonResponse({'error': f'Invalid model: {model_err}'}, status=500)
+    except requests.exceptions.RequestException as req_err:
+        return JsonResponse({'error': f'Request error occurred: {req_err}'}, status=500)
+    except Exception as err:
+        return JsonResponse({'error': f'An error occurred during prediction: {err}'}, status=500)
+
+
+
+#@ratelimit(key='ip', rate='10/m', method='ALL', block=True)  # Limit to 10 requests per minute per IP
+def forecast_prices(request):
+    """
+    Forecasts the closing prices of several stock symbols over the next business days.
+
+    Inputs:
+    - request: Django HTTP request object. Its query parameters may contain:
+      - symbols: Comma separated list of stock symbols (required).
+      - horizon: Number of business days forecast (default: 5).
+      - model: Name of the model artifact (default: RETURN_MODEL, trained by `train_models`).
+      - version: Version of the model artifact (default: the latest version).
+      - refresh: '0' to skip fetching the stale symbols from Alpha Vantage (default: '1').
+
+    Outputs:
+    - Returns a JsonResponse containing the model, its version, the horizon and, per symbol, its
+      last stored date and close and the forecast dates and closes, and the symbols without data.
+
+    All the symbols are forecast together, one batched prediction per step, see `prediction.forecast_many`.
+    """
+    try:
+        symbols = [symbol.strip() for symbol in request.GET.get('symbols', '').split(',') if symbol.strip()]
+        if not symbols:
+            return JsonResponse({'error': 'No symbols to forecast.'}, status=400)
+        if len(set(symbols)) != len(symbols):
+            return JsonResponse({'error': 'Each symbol can only appear once.'}, status=400)
+        horizon = int(request.GET.get('horizon', 5))
+        model_name = request.GET.get('model', RETURN_MODEL)
+        version = request.GET.get('version')
+        refresh = request.GET.get('refresh', '1') != '0'
+
+        result = forecast_many(symbols, horizon, model_name, version, refresh)
+        if not result['forecasts']:
+            return JsonResponse({'error': f"No time series data available for {', '.join(result['missing_symbols'])}."}, status=404)
+
+        return JsonResponse(result)
+
+    except ModelNotFoundError as not_found_err:
+        return JsonResponse({'error': str(not_found_err)}, status=404)
+    except InvalidModelError as model_err:
+        return JsonResponse({'error': f'Invalid model: {model_err}'}, status=500)
+    except ValueError as value_err:
+        return JsonResponse({'error': f'Invalid forecast parameters: {value_err}'}, status=400)
+    except requests.exceptions.RequestException as req_err:
+        return JsonResponse({'error': f'Request error occurred: {req_err}'}, status=500)
+    except Exception as err:
+        return JsonResponse({'error': f'An error occurred during forecasting: {err}'}, status=500)
+
+
 #@ratelimit(key='ip', rate='10/m', method='ALL', block=True)  # Limit to 10 requests per minute per IP
 #@csrf_exempt
 def generate_backtest_report(request, symbol='AAPL', initial_investment=1000):
@@ -121,7 +404,8 @@ def generate_backtest_report(request, symbol='AAPL', initial_investment=1000):
     Generates a backtest report as a PDF document.
 
     Parameters:
-    - request: Django HTTP request object, containing information about the request.
+    - request: Django HTTP request object. Its query parameters may contain the 'start' and 'end'
+      dates of the backtest, a single 'strategy' and its parameters, as for `backtest_strategy`.
     - symbol: The stock symbol for which the backtest report is generated (default: 'AAPL').
     - initial_investment: The initial amount of money to invest in the backtest (default: 1000).
 
@@ -132,116 +416,154 @@ def generate_backtest_report(request, symbol='AAPL', initial_investment=1000):
       - Summary table of metrics (total return, max drawdown, total trades).
       - Evaluation summary.
 
-    The function first runs a backtest using the specified symbol and initial investment, parses the
-    backtest results, generates relevant plots, and compiles all of these into a PDF document.
+    The function first gets the backtest of the specified symbol and initial investment from the
+    result cache, generates relevant plots, and compiles all of these into a PDF document. The
+    report is rendered in the request; `submit_report_job` renders it in the report workers.
     """
+    # ReportLab and Matplotlib are loaded by the first report rather than at startup, see `startup`
+    from .reports import build_backtest_report
+
     try:
         # Run backtest
-        response = backtest_strategy(request, symbol, initial_investment)
-        if response.status_code != 200:
-            return response
-
         try:
-            # Parse response JSON
-            backtest_result = json.loads(response.content)
-            portfolio_values = backtest_result.get('compute_data', {}).get('portfolio_values', [])
-            total_return = backtest_result.get('compute_data', {}).get('total_return')
-            max_drawdown = backtest_result.get('compute_data', {}).get('Max_Drawdown')
-            total_trades = backtest_result.get('compute_data', {}).get('total_trades')
-            stock_data = backtest_result.get('stock_data', [])
-        except Exception as err:
-            return JsonResponse({'error': f'Error parsing backtest response data: {err}'}, status=500)
+            start, end, strategies = backtest_request(request)
+            if len(strategies) != 1:
+                raise ValueError('A report covers a single strategy.')
+        except ValueError as value_err:
+            return JsonResponse({'error': f'Invalid backtest parameters: {value_err}'}, status=400)
 
         try:
-            # Generate performance plot for portfolio value
-            plt.figure()
-            plt.plot(portfolio_values, label='Portfolio Value')
-            plt.xlabel('Time')
-            plt.ylabel('Portfolio Value ($)')
-            plt.title(f'Backtest Performance for {symbol}')
-            plt.legend()
-            plt.tight_layout()
-            stock_buf = BytesIO()
-            plt.savefig(stock_buf, format='png')
-            stock_buf.seek(0)
-            plt.close()  # Close the plot to free memory
-        except Exception as err:
-            return JsonResponse({'error': f'Error generating portfolio value plot: {err}'}, status=500)
+            backtest_result = json.loads(cached_backtest(symbol, initial_investment, start, end, strategies))
+        except LookupError as not_found_err:
+            return JsonResponse({'error': str(not_found_err)}, status=404)
 
         try:
-            # Generate stock data plot with reduced x-axis labels
-            plt.figure()
-            stock_dates = [entry['date'] for entry in stock_data]
-            stock_prices = [entry['close_price'] for entry in stock_data]
-            plt.plot(stock_dates, stock_prices, label='Stock Price')
-            plt.xlabel('Date')
-            plt.ylabel('Stock Price ($)')
-            plt.title(f'Stock Data for {symbol}')
-            plt.legend()
-            plt.xticks(ticks=range(0, len(stock_dates), max(1, len(stock_dates) // 20)), rotation=45)  # Show fewer date labels
-            plt.tight_layout()
-            plt_buf = BytesIO()
-            plt.savefig(plt_buf, format='png')
-            plt_buf.seek(0)
-            plt.close()  # Close the plot to free memory
+            pdf = build_backtest_report(symbol, backtest_result)
         except Exception as err:
-            return JsonResponse({'error': f'Error generating stock data plot: {err}'}, status=500)
+            return JsonResponse({'error': f'Error generating the report: {err}'}, status=500)
 
-        # Generate PDF
-        pdf_buf = BytesIO()
-        pdf_canvas = canvas.Canvas(pdf_buf, pagesize=letter)
+        # Return PDF as downloadable file
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{symbol}_backtest_report.pdf"'
+        return response
 
-        # Draw portfolio value plot
-        try:
-            portfolio_image = ImageReader(plt_buf)
-            pdf_canvas.drawImage(portfolio_image, 50, 500, width=500, height=200)
-        except Exception as err:
-            return JsonResponse({'error': f'Error adding portfolio value plot to PDF: {err}'}, status=500)
+    except Exception as err:
+        return JsonResponse({'error': f'An unexpected error occurred during report generation: {err}'}, status=500)
 
-        # Draw stock data plot
-        try:
-            pdf_canvas.drawString(50, 220, f'Stock Data for {symbol}')
-            stock_image = ImageReader(stock_buf)
-            pdf_canvas.drawImage(stock_image, 50, 250, width=500, height=200)
-            
-        except Exception as err:
-            return JsonResponse({'error': f'Error adding stock data plot to PDF: {err}'}, status=500)
 
-        # Draw table of metrics
-        try:
-            data = [['Metric', 'Value'],
-                    ['Total Return', f'{total_return:.2f}%'],
-                    ['Max Drawdown', f'{max_drawdown*100:.2f}%'],
-                    ['Total Trades', total_trades]]
-            table = Table(data, colWidths=[200, 200])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ]))
-            table.wrapOn(pdf_canvas, 50, 200)
-            table.drawOn(pdf_canvas, 50, 100)
-        except Exception as err:
-            return JsonResponse({'error': f'Error adding metrics table to PDF: {err}'}, status=500)
 
 
-        # Finalize PDF
-        pdf_canvas.save()
-        pdf_buf.seek(0)
 
-        # Return PDF as downloadable file
-        response = HttpResponse(pdf_buf, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{symbol}_backtest_report.pdf"'
+def batch_backtest_report(request, initial_investment=1000):
+    """
+    Generates the backtest reports of several stock symbols as one multi-page PDF document.
+
+    Inputs:
+    - request: Django HTTP request object. Its query parameters may contain:
+      - symbols: Comma separated list of stock symbols (default: every stored symbol).
+      - start, end, and a single 'strategy' with its parameters, as for `generate_backtest_report`.
+    - initial_investment: The initial amount of money invested in each symbol.
+
+    Outputs:
+    - Returns an HTTP response with a PDF attachment: a summary table ranking the symbols by total
+      return, then the report page of each symbol. The symbols without data are listed in the
+      'X-Missing-Symbols' header.
+
+    The backtests and charts of the symbols are computed in parallel worker processes, see
+    `batch_reports.build_batch_report`.
+    """
+    from .batch_reports import build_batch_report
+
+    try:
+        symbols = request.GET.get('symbols')
+        symbols = [symbol.strip() for symbol in symbols.split(',') if symbol.strip()] if symbols else None
+        start, end, strategies = backtest_request(request, other_params={'symbols'})
+        if len(strategies) != 1:
+            raise ValueError('A report covers a single strategy.')
+
+        batch_result = build_batch_report(symbols, initial_investment, start, end, *strategies[0])
+        if 'error' in batch_result:
+            return JsonResponse({'error': batch_result['error']}, status=404)
+
+        response = HttpResponse(batch_result['pdf'], content_type='application/pdf')
+        response['Content-Disposition'] = 'attachment; filename="batch_backtest_report.pdf"'
+        response['X-Missing-Symbols'] = ','.join(batch_result['missing_symbols'])
         return response
 
+    except ValueError as value_err:
+        return JsonResponse({'error': f'Invalid backtest parameters: {value_err}'}, status=400)
     except Exception as err:
         return JsonResponse({'error': f'An unexpected error occurred during report generation: {err}'}, status=500)
 
 
+def report_job_response(job, status=200):
+    payload = report_job_payload(job)
+    payload['status_url'] = reverse('report_job_status', kwargs={'job_id': job.pk})
+    payload['download_url'] = reverse('download_report', kwargs={'job_id': job.pk}) if job.status == ReportJob.DONE else None
+    return JsonResponse(payload, status=status)
+
+
+@csrf_exempt
+@require_POST
+def submit_report_job(request, symbol='AAPL', initial_investment=1000):
+    """
+    Submits the generation of a backtest report to the report workers.
+
+    Inputs:
+    - request: Django HTTP POST request. Its query parameters may contain the 'start' and 'end'
+      dates of the backtest, a single 'strategy' and its parameters, as for `generate_backtest_report`.
+    - symbol: The stock symbol of the report.
+    - initial_investment: The initial amount of money to invest in the backtest.
+
+    Outputs:
+    - Returns a JsonResponse with the job status and the URL to poll, with status 202 while the
+      report is being generated and 200 once it can be downloaded.
+
+    Identical reports on the same data share one job, see `report_jobs.submit_report`.
+    """
+    try:
+        start, end, strategies = backtest_request(request)
+        job, _ = submit_report(symbol, initial_investment, start, end, strategies)
+        return report_job_response(job, status=200 if job.status == ReportJob.DONE else 202)
+
+    except ValueError as value_err:
+        return JsonResponse({'error': f'Invalid backtest parameters: {value_err}'}, status=400)
+    except Exception as err:
+        return JsonResponse({'error': f'An error occurred while submitting the report: {err}'}, status=500)
+
+
+def report_job_status(request, job_id):
+    """
+    Returns the status of a report job: 'queued', 'running', 'done' (with its download URL) or 'failed' (with its error).
+    """
+    try:
+        return report_job_response(ReportJob.objects.get(pk=job_id))
+    except ReportJob.DoesNotExist:
+        return JsonResponse({'error': 'Unknown report job.'}, status=404)
+
+
+def download_report(request, job_id):
+    """
+    Returns the PDF of a finished report job.
+
+    The PDF is served from the content-addressed artifact store; its digest is the ETag of the
+    response, and the response is final, since a stored artifact never changes.
+    """
+    try:
+        job = ReportJob.objects.get(pk=job_id)
+    except ReportJob.DoesNotExist:
+        return JsonResponse({'error': 'Unknown report job.'}, status=404)
+    if job.status != ReportJob.DONE:
+        return JsonResponse({'error': f'The report is not available, its job is {job.status}.'}, status=409)
+
+    try:
+        response = FileResponse(get_artifact_store().open(job.artifact), content_type='application/pdf', as_attachment=True, filename=f'{job.symbol}_backtest_report.pdf')
+    except FileNotFoundError:
+        return JsonResponse({'error': 'The report was removed, submit it again.'}, status=410)
+    response['ETag'] = f'"{job.artifact}"'
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
 
 #Obsolate has we can use backtest_strategy
 #@csrf_exempt
@@ -256,4 +578,16 @@ def generate_json_report(request, symbol='AAPL', initial_investment=1000):
         return JsonResponse(backtest_result, status=200)
 
     except Exception as err:
-        return JsonResponse({'error': f'An error occurred during report generation: {err}'}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': f'An error occurred during report generation: {err}'}, status=500)
+
+
+def metrics(request):
+    """
+    Returns the metrics of the service in the Prometheus text exposition format.
+
+    The metrics count the requests, their durations, response bytes and SQL queries by route, and
+    the durations of the stages of the requests and jobs: upstream fetch, database ingestion,
+    backtest computation, chart rendering and PDF assembly. With STOCKS_METRICS_DIR set, they are
+    summed over every process of the service, see `stocks.metrics`.
+    """
+    return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)